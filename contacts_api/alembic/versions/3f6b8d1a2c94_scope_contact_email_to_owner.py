@@ -0,0 +1,28 @@
+"""Make contact emails unique per owner instead of globally
+
+Revision ID: 3f6b8d1a2c94
+Revises: e2a9d6b4f371
+Create Date: 2026-10-18 15:06:27.903144
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6b8d1a2c94'
+down_revision: Union[str, None] = 'e2a9d6b4f371'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('uq_contacts_user_id_email', 'contacts', ['user_id', 'email'], unique=True)
+    op.drop_index(op.f('ix_contacts_email'), table_name='contacts')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_contacts_email'), 'contacts', ['email'], unique=True)
+    op.drop_index('uq_contacts_user_id_email', table_name='contacts')
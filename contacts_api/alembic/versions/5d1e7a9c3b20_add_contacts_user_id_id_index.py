@@ -0,0 +1,26 @@
+"""Add (user_id, id) index to contacts for keyset pagination
+
+Revision ID: 5d1e7a9c3b20
+Revises: 1368347c4c0c
+Create Date: 2026-10-18 09:12:04.381526
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1e7a9c3b20'
+down_revision: Union[str, None] = '1368347c4c0c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
@@ -0,0 +1,36 @@
+"""Add generated birth_md column and (user_id, birth_md) index to contacts
+
+Revision ID: 8b3f4c2e9d17
+Revises: 5d1e7a9c3b20
+Create Date: 2026-10-18 10:03:51.774210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f4c2e9d17'
+down_revision: Union[str, None] = '5d1e7a9c3b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column(
+        'birth_md',
+        sa.SmallInteger(),
+        sa.Computed(
+            "CAST(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) AS SMALLINT)",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    op.create_index('ix_contacts_user_id_birth_md', 'contacts', ['user_id', 'birth_md'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birth_md', table_name='contacts')
+    op.drop_column('contacts', 'birth_md')
@@ -0,0 +1,46 @@
+"""Add trigram (PostgreSQL) and FTS5 (SQLite) search indexes for contacts
+
+Revision ID: c47a2e81f6d5
+Revises: 8b3f4c2e9d17
+Create Date: 2026-10-18 11:26:40.118392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.models import CONTACTS_FTS_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a2e81f6d5'
+down_revision: Union[str, None] = '8b3f4c2e9d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_COLUMNS = ('first_name', 'last_name', 'email')
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in TRIGRAM_COLUMNS:
+            op.create_index(f'ix_contacts_{column}_trgm', 'contacts', [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    elif dialect == 'sqlite':
+        for statement in CONTACTS_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for column in TRIGRAM_COLUMNS:
+            op.drop_index(f'ix_contacts_{column}_trgm', table_name='contacts')
+    elif dialect == 'sqlite':
+        for trigger in ('contacts_fts_ai', 'contacts_fts_ad', 'contacts_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS contacts_fts')
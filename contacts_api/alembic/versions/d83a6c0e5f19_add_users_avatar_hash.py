@@ -0,0 +1,26 @@
+"""Add users.avatar_hash for locally processed avatars
+
+Revision ID: d83a6c0e5f19
+Revises: 9c5e1f7a4b62
+Create Date: 2026-10-18 16:48:12.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83a6c0e5f19'
+down_revision: Union[str, None] = '9c5e1f7a4b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'avatar_hash')
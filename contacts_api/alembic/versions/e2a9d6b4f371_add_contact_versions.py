@@ -0,0 +1,28 @@
+"""Add users.contacts_version and contacts.version for conditional GETs
+
+Revision ID: e2a9d6b4f371
+Revises: c47a2e81f6d5
+Create Date: 2026-10-18 13:42:08.512306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a9d6b4f371'
+down_revision: Union[str, None] = 'c47a2e81f6d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('contacts_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('contacts', 'version')
+    op.drop_column('users', 'contacts_version')
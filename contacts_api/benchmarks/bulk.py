@@ -0,0 +1,54 @@
+"""
+Compares per-item contact updates and deletions with one bulk request.
+
+Usage::
+
+    python -m benchmarks.bulk --url sqlite:///bench_bulk.db --items 500
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy.orm import Session
+
+from benchmarks.common import make_engine, seed_contacts
+from src.database.models import Contact, User
+from src.repository.repository import bulk_mutate_contacts, delete_contact, update_contact
+
+
+def run(engine, items: int, bulk: bool) -> float:
+    user_id = seed_contacts(engine, items * 2, users=1, seed=int(time.time() * 1000) % 10 ** 6)[0]
+    with Session(engine, expire_on_commit=False) as db:
+        user = db.get(User, user_id)
+        ids = [row[0] for row in db.query(Contact.id).filter(Contact.user_id == user_id).order_by(Contact.id)]
+        to_update, to_delete = ids[:items], ids[items:]
+        started = time.perf_counter()
+        if bulk:
+            bulk_mutate_contacts(db, user, updates=[(i, {"last_name": "Bulk"}) for i in to_update], deletes=to_delete)
+        else:
+            for contact_id in to_update:
+                update_contact(db, contact_id, {"last_name": "Single"}, user)
+            for contact_id in to_delete:
+                delete_contact(db, contact_id, user)
+        return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite:///bench_bulk.db")
+    parser.add_argument("--items", type=int, default=500,
+                        help="updates and deletions per run (each; together at most MAX_BULK_OPERATIONS)")
+    args = parser.parse_args()
+
+    if args.url.startswith("sqlite:///") and os.path.exists(args.url[len("sqlite:///"):]):
+        os.remove(args.url[len("sqlite:///"):])
+    engine = make_engine(args.url)
+    per_item = run(engine, args.items, bulk=False)
+    bulk = run(engine, args.items, bulk=True)
+    print(f"{args.items} updates + {args.items} deletes")
+    print(f"{'per-item':>10}: {per_item:.1f} ms")
+    print(f"{'bulk':>10}: {bulk:.1f} ms ({per_item / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
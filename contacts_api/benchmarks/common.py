@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User
+
+FIRST_NAMES = ["John", "Anna", "Olena", "Taras", "Maria", "Petro", "Iryna", "Mark", "Sofia", "Andrii"]
+LAST_NAMES = ["Doe", "Smith", "Kovalenko", "Shevchenko", "Bondarenko", "Tkachenko", "Melnyk", "Brown"]
+
+
+def make_engine(url: str) -> Engine:
+    """
+    Creates an engine for a benchmark database and makes sure the schema exists.
+
+    An in-memory SQLite URL gets a single connection shared by all threads, so the data outlives the
+    connection that inserted it.
+
+    :param url: The SQLAlchemy database URL.
+    :type url: str
+    :return: The engine.
+    :rtype: Engine
+    """
+    if url == "sqlite://":
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def seed_contacts(engine: Engine, contacts: int, users: int = 100, seed: int = 42, batch: int = 10000) -> List[int]:
+    """
+    Inserts users and deterministically generated contacts spread evenly across them.
+
+    :param engine: The engine of the benchmark database.
+    :type engine: Engine
+    :param contacts: The total number of contacts to insert.
+    :type contacts: int
+    :param users: The number of users owning the contacts.
+    :type users: int
+    :param seed: The random seed, so repeated runs produce the same data.
+    :type seed: int
+    :param batch: The number of rows per INSERT.
+    :type batch: int
+    :return: The IDs of the inserted users.
+    :rtype: List[int]
+    """
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        user_ids = [
+            conn.execute(insert(User).values(email=f"bench{seed}-{i}@example.com", password="x",
+                                             is_verified=True).returning(User.id)).scalar_one()
+            for i in range(users)
+        ]
+        rows = []
+        for i in range(contacts):
+            rows.append({
+                "first_name": rng.choice(FIRST_NAMES) + str(rng.randrange(1000)),
+                "last_name": rng.choice(LAST_NAMES),
+                "email": f"contact{seed}-{i}@example.com",
+                "phone_number": f"+380{rng.randrange(10 ** 9):09d}",
+                "birthday": date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 60)),
+                "user_id": user_ids[i % users],
+            })
+            if len(rows) == batch:
+                conn.execute(insert(Contact), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(Contact), rows)
+    return user_ids
+
+
+def measure(func: Callable, repeat: int = 20) -> Dict[str, float]:
+    """
+    Calls a function repeatedly and summarises its latency in milliseconds.
+
+    :param func: The function to time.
+    :type func: Callable
+    :param repeat: The number of timed calls.
+    :type repeat: int
+    :return: Median, p95 and maximum latency in milliseconds.
+    :rtype: Dict[str, float]
+    """
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max_ms": samples[-1],
+    }
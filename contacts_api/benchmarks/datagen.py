@@ -0,0 +1,266 @@
+"""
+Fills a database with synthetic users and contacts shaped like production data.
+
+Contacts per user follow a Zipf distribution, names mix Latin, Cyrillic, Greek and CJK scripts, birthdays
+cluster around a few dates and some contacts carry several kilobytes of ``additional_info``. Contacts are
+loaded with ``COPY`` on PostgreSQL (psycopg2) and with batched ``executemany`` in one transaction elsewhere.
+The contact indexes are dropped during the load and built once afterwards, and on SQLite the FTS5 index is
+rebuilt once instead of being maintained row by row.
+
+Usage::
+
+    python -m benchmarks.datagen --url sqlite:///bench_data.db --contacts 1000000 --users 10000
+    python -m benchmarks.datagen --url postgresql+psycopg2://postgres:pw@localhost/bench --contacts 5000000
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, inspect
+from sqlalchemy.engine import Engine
+
+from benchmarks.common import make_engine
+from src.database.models import CONTACTS_FTS_DDL, Contact, User
+
+FIRST_NAMES = [
+    "John", "Anna", "Mark", "Sofia", "Maria", "Peter", "Emma", "Liam", "Zoë", "José", "Chloé", "Łukasz",
+    "Søren", "Ömer", "Ángel", "Françoise", "Jürgen", "Olena", "Тарас", "Олена", "Ярослав", "Ґанна", "Їжак",
+    "Андрій", "Ірина", "Дмитро", "Ελένη", "Γιώργος", "伟", "芳", "秀英", "太郎", "さくら", "민준", "Aïsha",
+]
+LAST_NAMES = [
+    "Smith", "Doe", "Brown", "García", "Müller", "Nowak", "Øster", "Çelik", "Kovalenko", "Shevchenko",
+    "Коваленко", "Шевченко", "Бондаренко", "Ткаченко", "Мельник", "Гнатюк", "Παπαδόπουλος", "王", "李", "张",
+    "佐藤", "김", "O'Brien", "van der Berg", "Nguyễn", "Ibáñez", "Dvořák", "Żółć",
+]
+EMAIL_PREFIXES = ["john", "anna", "olena", "taras", "maria", "petro", "info", "work", "home", "me", "x"]
+EMAIL_DOMAINS = ["example.com", "example.org", "mail.example.net", "example.com.ua", "corp.example.io"]
+# Birthdays pile up around New Year, the default date of many forms, and a few late-summer weeks.
+BIRTHDAY_CLUSTERS = [((1, 1), 0.3, 0.25), ((9, 10), 12.0, 0.3), ((7, 20), 10.0, 0.15), ((12, 25), 4.0, 0.1)]
+BIRTHDAY_UNIFORM = 0.2
+BIRTHDAY_MISSING = 0.1
+INFO_WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt "
+              "зустріч у понеділок дзвонити після обіду café naïve 会議 ☎ résumé").split()
+CONTACT_COLUMNS = ("first_name", "last_name", "email", "phone_number", "birthday", "additional_info", "user_id")
+POOL_SIZE = 4096
+
+
+@dataclass
+class Dataset:
+    """
+    What was generated.
+
+    :param user_ids: The IDs of the users, the one owning the most contacts first.
+    :type user_ids: List[int]
+    :param contacts_per_user: The number of contacts of each user, in the order of ``user_ids``.
+    :type contacts_per_user: List[int]
+    """
+    user_ids: List[int]
+    contacts_per_user: List[int]
+
+    def user_at(self, quantile: float) -> Tuple[int, int]:
+        """
+        Returns a user by how many contacts they own, 0.0 being the heaviest and 1.0 the lightest.
+
+        :return: The user ID and their number of contacts.
+        :rtype: Tuple[int, int]
+        """
+        index = min(len(self.user_ids) - 1, int(len(self.user_ids) * quantile))
+        return self.user_ids[index], self.contacts_per_user[index]
+
+
+def zipf_counts(total: int, users: int, skew: float) -> List[int]:
+    """
+    Splits ``total`` contacts among users with weights ``1 / rank ** skew``.
+
+    :param total: The number of contacts.
+    :type total: int
+    :param users: The number of users.
+    :type users: int
+    :param skew: The Zipf exponent; ``0`` spreads contacts evenly.
+    :type skew: float
+    :return: The number of contacts of each user, largest first.
+    :rtype: List[int]
+    """
+    weights = [1 / rank ** skew for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in range(total - sum(counts)):
+        counts[index % users] += 1
+    return counts
+
+
+def birthday_pool(rng: random.Random) -> List[Optional[date]]:
+    pool = []
+    for _ in range(POOL_SIZE):
+        year = rng.randrange(1950, 2010)
+        roll = rng.random()
+        if roll < BIRTHDAY_MISSING:
+            pool.append(None)
+            continue
+        if roll < BIRTHDAY_MISSING + BIRTHDAY_UNIFORM:
+            pool.append(date(year, 1, 1) + timedelta(days=rng.randrange(365)))
+            continue
+        (month, day), spread, _ = rng.choices(BIRTHDAY_CLUSTERS, weights=[c[2] for c in BIRTHDAY_CLUSTERS])[0]
+        pool.append(date(year, month, day) + timedelta(days=round(rng.gauss(0, spread))))
+    return pool
+
+
+def info_pool(rng: random.Random) -> List[Optional[str]]:
+    pool = []
+    for _ in range(POOL_SIZE):
+        roll = rng.random()
+        if roll < 0.6:
+            pool.append(None)
+        elif roll < 0.98:
+            pool.append(" ".join(rng.choices(INFO_WORDS, k=rng.randrange(3, 12))))
+        else:
+            pool.append(" ".join(rng.choices(INFO_WORDS, k=rng.randrange(150, 1200))))
+    return pool
+
+
+def contact_rows(user_ids: Sequence[int], counts: Sequence[int], seed: int,
+                 chunk: int) -> Iterator[List[tuple]]:
+    """
+    Yields the contact rows in chunks, as tuples in the order of ``CONTACT_COLUMNS``.
+
+    Rows of different users are interleaved, as they would be in a table filled over time.
+
+    :param user_ids: The owners.
+    :type user_ids: Sequence[int]
+    :param counts: The number of contacts of each owner.
+    :type counts: Sequence[int]
+    :param seed: The random seed.
+    :type seed: int
+    :param chunk: The number of rows per chunk.
+    :type chunk: int
+    :return: Lists of at most ``chunk`` rows.
+    :rtype: Iterator[List[tuple]]
+    """
+    rng = random.Random(seed)
+    birthdays, infos = birthday_pool(rng), info_pool(rng)
+    owners = [user_id for user_id, count in zip(user_ids, counts) for _ in range(count)]
+    rng.shuffle(owners)
+    for start in range(0, len(owners), chunk):
+        size = min(chunk, len(owners) - start)
+        prefixes = rng.choices(EMAIL_PREFIXES, k=size)
+        domains = rng.choices(EMAIL_DOMAINS, k=size)
+        yield list(zip(
+            rng.choices(FIRST_NAMES, k=size),
+            rng.choices(LAST_NAMES, k=size),
+            [f"{prefix}{start + i}@{domain}" for i, (prefix, domain) in enumerate(zip(prefixes, domains))],
+            [f"+380{(start + i) * 2654435761 % 10 ** 9:09d}" for i in range(size)],
+            rng.choices(birthdays, k=size),
+            rng.choices(infos, k=size),
+            owners[start:start + size],
+        ))
+
+
+def insert_users(engine: Engine, users: int, seed: int) -> List[int]:
+    rows = [{"email": f"user{seed}-{i}@example.com", "username": f"user{i}", "password": "x", "is_verified": True}
+            for i in range(users)]
+    with engine.begin() as conn:
+        return list(conn.execute(insert(User).returning(User.id, sort_by_parameter_order=True), rows).scalars())
+
+
+def copy_contacts(engine: Engine, chunks: Iterator[List[tuple]]):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        statement = f"COPY contacts ({', '.join(CONTACT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        for rows in chunks:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(statement, buffer)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def insert_contacts(engine: Engine, chunks: Iterator[List[tuple]]):
+    sqlite = engine.dialect.name == "sqlite"
+    placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+    statement = (f"INSERT INTO contacts ({', '.join(CONTACT_COLUMNS)}) "
+                 f"VALUES ({', '.join([placeholder] * len(CONTACT_COLUMNS))})")
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if sqlite:
+            cursor.execute("PRAGMA cache_size = -262144")
+            cursor.execute("DROP TRIGGER IF EXISTS contacts_fts_ai")
+        for rows in chunks:
+            cursor.executemany(statement, rows)
+        if sqlite:
+            cursor.execute(CONTACTS_FTS_DDL[1])
+            cursor.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def generate(engine: Engine, contacts: int, users: int, seed: int = 42, skew: float = 1.0,
+             chunk: int = 50_000) -> Dataset:
+    """
+    Inserts ``users`` users and ``contacts`` contacts spread across them.
+
+    The same arguments always produce the same data.
+
+    :param engine: The engine of a database whose schema exists.
+    :type engine: Engine
+    :param contacts: The number of contacts.
+    :type contacts: int
+    :param users: The number of users.
+    :type users: int
+    :param seed: The random seed.
+    :type seed: int
+    :param skew: The Zipf exponent of contacts per user; ``0`` gives every user the same number.
+    :type skew: float
+    :param chunk: The number of rows generated and sent at once.
+    :type chunk: int
+    :return: The users and how many contacts each owns.
+    :rtype: Dataset
+    """
+    user_ids = insert_users(engine, users, seed)
+    counts = zipf_counts(contacts, users, skew)
+    chunks = contact_rows(user_ids, counts, seed, chunk)
+    existing = {index["name"] for index in inspect(engine).get_indexes(Contact.__tablename__)}
+    indexes = [index for index in Contact.__table__.indexes if index.name in existing]
+    with engine.begin() as conn:
+        for index in indexes:
+            index.drop(conn)
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        copy_contacts(engine, chunks)
+    else:
+        insert_contacts(engine, chunks)
+    with engine.begin() as conn:
+        for index in indexes:
+            index.create(conn)
+    return Dataset(user_ids, counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite:///bench_data.db")
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    started = time.perf_counter()
+    dataset = generate(engine, args.contacts, args.users, args.seed, args.skew)
+    elapsed = time.perf_counter() - started
+    heaviest, median = dataset.user_at(0.0), dataset.user_at(0.5)
+    print(f"{args.contacts} contacts for {args.users} users in {elapsed:.1f}s "
+          f"({args.contacts / elapsed:,.0f} rows/s); heaviest user {heaviest[0]} owns {heaviest[1]}, "
+          f"median user {median[0]} owns {median[1]}")
+
+
+if __name__ == "__main__":
+    main()
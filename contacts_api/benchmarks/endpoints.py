@@ -0,0 +1,449 @@
+"""
+Drives every route of the application through an in-process ASGI client and records latency percentiles,
+throughput, allocations and SQL statements per request, then compares runs against tracked baselines.
+
+Each run seeds a fresh database deterministically, so results taken at the same size are comparable.
+SQL statements and allocations are measured on sequential probe requests; latency and throughput on the
+timed requests that follow.
+
+Usage::
+
+    python -m benchmarks.endpoints run --contacts 10000
+    python -m benchmarks.endpoints run --contacts 100000 --users 1000 --output benchmarks/baselines/endpoints-100000.json
+    python -m benchmarks.endpoints compare benchmarks/baselines/endpoints-10000.json benchmarks/results/endpoints-10000.json
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import httpx
+from PIL import Image
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import make_engine, seed_contacts
+from src.auths.auth import create_access_token, create_verification_token, decode_refresh_token
+from src.auths.hashing import hash_password, password_hasher
+from src.auths.sessions import session_manager
+from src.conf.config import settings
+from src.database.db import get_db
+from src.database.models import Contact, User
+from src.services.avatars import avatar_pipeline
+from main import app
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+PASSWORD = "benchmark"
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "alloc_peak_kib")
+
+
+@dataclass
+class BenchContext:
+    """
+    What the request builders need to know about the seeded database.
+
+    :param session_factory: Opens sessions on the benchmark database.
+    :type session_factory: sessionmaker
+    :param user_id: The ID of the user the authenticated requests are made as.
+    :type user_id: int
+    :param email: The email of that user.
+    :type email: str
+    :param headers: Authorization headers carrying an access token of that user.
+    :type headers: Dict[str, str]
+    :param contact_ids: IDs of contacts owned by that user.
+    :type contact_ids: List[int]
+    :param avatar_url: The URL of one stored avatar variant of that user.
+    :type avatar_url: str
+    """
+    session_factory: sessionmaker
+    user_id: int
+    email: str
+    headers: Dict[str, str]
+    contact_ids: List[int]
+    avatar_url: str = ""
+    counter: itertools.count = field(default_factory=itertools.count)
+
+    def unique(self) -> int:
+        return next(self.counter)
+
+    def contact_id(self) -> int:
+        return self.contact_ids[self.unique() % len(self.contact_ids)]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    How to exercise one route.
+
+    :param method: The HTTP method.
+    :type method: str
+    :param path: The route path as it appears in the OpenAPI schema.
+    :type path: str
+    :param build: Returns the ``httpx`` request arguments, including ``url``, for one request. It runs before
+        the request is timed, so it may prepare data the request consumes.
+    :type build: Callable[[BenchContext], dict]
+    :param slow: Whether the route is dominated by deliberate work, such as bcrypt, and is timed with fewer
+        requests.
+    :type slow: bool
+    """
+    method: str
+    path: str
+    build: Callable[[BenchContext], dict]
+    slow: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+
+def png(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (seed % 256, seed // 256 % 256, seed // 65536 % 256)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def new_contact(ctx: BenchContext) -> int:
+    with ctx.session_factory() as db:
+        contact_id = db.execute(insert(Contact).values(
+            first_name="Temp", last_name="Contact", email=f"temp{ctx.unique()}@example.com",
+            phone_number="+380000000000", user_id=ctx.user_id,
+        ).returning(Contact.id)).scalar_one()
+        db.commit()
+    return contact_id
+
+
+def new_verification_token(ctx: BenchContext) -> str:
+    email = f"unverified{ctx.unique()}@example.com"
+    with ctx.session_factory() as db:
+        db.execute(insert(User).values(email=email, password="x", is_verified=False))
+        db.commit()
+    return create_verification_token(email)
+
+
+def new_refresh_token(ctx: BenchContext) -> str:
+    with ctx.session_factory() as db:
+        return session_manager.open(db, ctx.user_id, ctx.email, "benchmark")
+
+
+def new_session_family(ctx: BenchContext) -> str:
+    return decode_refresh_token(new_refresh_token(ctx))["fam"]
+
+
+def contact_body(ctx: BenchContext) -> dict:
+    n = ctx.unique()
+    return {"first_name": "Bench", "last_name": f"Contact{n}", "email": f"bench{n}@example.com",
+            "phone_number": f"+380{n:09d}", "birthday": date(1990, 1 + n % 12, 1 + n % 28).isoformat()}
+
+
+def import_body(ctx: BenchContext) -> bytes:
+    n = ctx.unique()
+    rows = [f"Imported,Row{i},import{n}-{i}@example.com,+380{i:09d}" for i in range(10)]
+    return ("first_name,last_name,email,phone_number\n" + "\n".join(rows) + "\n").encode()
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("GET", "/", lambda ctx: {"url": "/"}),
+    Scenario("GET", "/secret", lambda ctx: {"url": "/secret", "headers": ctx.headers}),
+    Scenario("POST", "/login", lambda ctx: {"url": "/login", "data": {"username": ctx.email, "password": PASSWORD}},
+             slow=True),
+    Scenario("GET", "/refresh_token",
+             lambda ctx: {"url": "/refresh_token", "headers": {"Authorization": f"Bearer {new_refresh_token(ctx)}"}}),
+    Scenario("GET", "/sessions", lambda ctx: {"url": "/sessions", "headers": ctx.headers}),
+    Scenario("DELETE", "/sessions/{family}",
+             lambda ctx: {"url": f"/sessions/{new_session_family(ctx)}", "headers": ctx.headers}),
+    Scenario("POST", "/signup",
+             lambda ctx: {"url": "/signup", "json": {"username": f"main{ctx.unique()}@example.com",
+                                                     "password": "secret1"}}, slow=True),
+    Scenario("POST", "/signup/",
+             lambda ctx: {"url": "/signup/", "json": {"username": f"bench{ctx.unique():06d}",
+                                                      "email": f"router{ctx.unique()}@example.com",
+                                                      "password": "secret1"}}, slow=True),
+    Scenario("GET", "/verify-email",
+             lambda ctx: {"url": "/verify-email", "params": {"token": new_verification_token(ctx)}}),
+    Scenario("GET", "/verify-email/",
+             lambda ctx: {"url": "/verify-email/", "params": {"token": new_verification_token(ctx)}}),
+    Scenario("POST", "/send-email",
+             lambda ctx: {"url": "/send-email", "json": {"recipient_email": ctx.email,
+                                                         "verification_link": "http://127.0.0.1:8000/verify"}}),
+    Scenario("POST", "/reset-password/", lambda ctx: {"url": "/reset-password/", "params": {"email": ctx.email}}),
+    Scenario("POST", "/contacts/", lambda ctx: {"url": "/contacts/", "json": contact_body(ctx), "headers": ctx.headers}),
+    Scenario("GET", "/contacts/", lambda ctx: {"url": "/contacts/", "headers": ctx.headers}),
+    Scenario("GET", "/contacts/search/",
+             lambda ctx: {"url": "/contacts/search/", "params": {"name": "anna"}, "headers": ctx.headers}),
+    Scenario("GET", "/contacts/birthday/",
+             lambda ctx: {"url": "/contacts/birthday/", "params": {"days": 30}, "headers": ctx.headers}),
+    Scenario("GET", "/contacts/export",
+             lambda ctx: {"url": "/contacts/export", "params": {"format": "ndjson"}, "headers": ctx.headers}),
+    Scenario("POST", "/contacts/import",
+             lambda ctx: {"url": "/contacts/import", "content": import_body(ctx),
+                          "headers": {**ctx.headers, "Content-Type": "text/csv"}}),
+    Scenario("POST", "/contacts/bulk",
+             lambda ctx: {"url": "/contacts/bulk", "headers": ctx.headers, "json": {
+                 "update": [{"id": ctx.contact_id(), "changes": {"additional_info": "bulk"}} for _ in range(10)]}}),
+    Scenario("GET", "/contacts/{contact_id}",
+             lambda ctx: {"url": f"/contacts/{ctx.contact_id()}", "headers": ctx.headers}),
+    Scenario("PUT", "/contacts/{contact_id}",
+             lambda ctx: {"url": f"/contacts/{new_contact(ctx)}", "json": contact_body(ctx), "headers": ctx.headers}),
+    Scenario("PATCH", "/contacts/{contact_id}",
+             lambda ctx: {"url": f"/contacts/{ctx.contact_id()}", "json": {"additional_info": f"patch{ctx.unique()}"},
+                          "headers": ctx.headers}),
+    Scenario("DELETE", "/contacts/{contact_id}",
+             lambda ctx: {"url": f"/contacts/{new_contact(ctx)}", "headers": ctx.headers}),
+    Scenario("PUT", "/users/me/avatar",
+             lambda ctx: {"url": "/users/me/avatar", "headers": ctx.headers,
+                          "files": {"file": ("avatar.png", png(ctx.unique() + 1), "image/png")}}, slow=True),
+    Scenario("GET", "/users/{user_id}/avatar", lambda ctx: {"url": f"/users/{ctx.user_id}/avatar"}),
+    Scenario("GET", settings.avatar_base_url.rstrip("/") + "/{shard}/{subshard}/{digest}/{size}.webp",
+             lambda ctx: {"url": ctx.avatar_url}),
+    Scenario("GET", "/stats/hashing", lambda ctx: {"url": "/stats/hashing"}),
+    Scenario("GET", "/stats/db-pool", lambda ctx: {"url": "/stats/db-pool"}),
+    Scenario("GET", "/stats/outbox", lambda ctx: {"url": "/stats/outbox"}),
+    Scenario("GET", "/stats/avatars", lambda ctx: {"url": "/stats/avatars"}),
+    Scenario("GET", "/stats/rate-limit", lambda ctx: {"url": "/stats/rate-limit"}),
+]
+
+
+def application_routes() -> List[str]:
+    """
+    Lists every route of the application as ``"METHOD /path"``.
+
+    :return: The routes in the OpenAPI schema.
+    :rtype: List[str]
+    """
+    return sorted(f"{method.upper()} {path}" for path, operations in app.openapi()["paths"].items()
+                  for method in operations)
+
+
+class StatementCounter:
+    """
+    Counts the SQL statements an engine executes.
+
+    :param engine: The engine to watch.
+    :type engine: Engine
+    """
+
+    def __init__(self, engine: Engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def prepare(client: httpx.AsyncClient, engine: Engine, contacts: int, users: int) -> BenchContext:
+    user_ids = seed_contacts(engine, contacts, users)
+    session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    with session_factory() as db:
+        user = db.get(User, user_ids[0])
+        user.password = hash_password(PASSWORD)
+        db.commit()
+        contact_ids = [row[0] for row in db.query(Contact.id).filter(Contact.user_id == user.id)
+                       .order_by(Contact.id).limit(100)]
+    ctx = BenchContext(session_factory, user.id, user.email,
+                       {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}, contact_ids)
+    response = await client.put("/users/me/avatar", headers=ctx.headers,
+                                files={"file": ("avatar.png", png(0), "image/png")})
+    response.raise_for_status()
+    ctx.avatar_url = response.json()["avatar_url"]
+    return ctx
+
+
+async def probe(client: httpx.AsyncClient, counter: StatementCounter, scenario: Scenario, ctx: BenchContext,
+                samples: int) -> dict:
+    statements, peaks = [], []
+    for _ in range(samples):
+        request = scenario.build(ctx)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        executed = counter.count
+        await client.request(scenario.method, **request)
+        statements.append(counter.count - executed)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    return {"sql_statements": round(statistics.mean(statements), 2),
+            "alloc_peak_kib": round(statistics.mean(peaks) / 1024, 1)}
+
+
+async def time_requests(client: httpx.AsyncClient, scenario: Scenario, ctx: BenchContext, requests: int,
+                        concurrency: int) -> dict:
+    pending = [scenario.build(ctx) for _ in range(requests)]
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            request = pending.pop()
+            started = time.perf_counter()
+            response = await client.request(scenario.method, **request)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+
+async def run(args) -> dict:
+    engine = make_engine(args.url)
+    counter = StatementCounter(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    settings.rate_limit_enabled = False
+    app.dependency_overrides[get_db] = override_get_db
+    selected = [s for s in SCENARIOS if not args.route or any(part in s.name for part in args.route)]
+    routes = {}
+    with tempfile.TemporaryDirectory() as media_dir:
+        avatar_pipeline.storage.root = Path(media_dir)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            ctx = await prepare(client, engine, args.contacts, args.users)
+            for scenario in selected:
+                tracemalloc.start()
+                try:
+                    probed = await probe(client, counter, scenario, ctx, args.probes)
+                finally:
+                    tracemalloc.stop()
+                requests = min(args.requests, args.slow_requests) if scenario.slow else args.requests
+                routes[scenario.name] = {**await time_requests(client, scenario, ctx, requests, args.concurrency),
+                                         **probed}
+                print(format_result(scenario.name, routes[scenario.name]), flush=True)
+    password_hasher.shutdown()
+    avatar_pipeline.shutdown()
+
+    uncovered = sorted(set(application_routes()) - {s.name for s in SCENARIOS})
+    if uncovered:
+        print("routes without a scenario: " + ", ".join(uncovered), file=sys.stderr)
+    return {
+        "meta": {
+            "contacts": args.contacts,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "dialect": engine.dialect.name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "uncovered": uncovered,
+        },
+        "routes": routes,
+    }
+
+
+def format_result(name: str, result: dict) -> str:
+    return (f"{name:<62} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+            f"p99={result['p99_ms']:>8.2f}ms {result['throughput_rps']:>8.1f}/s "
+            f"sql={result['sql_statements']:>5.1f} alloc={result['alloc_peak_kib']:>8.1f}KiB"
+            + (f" errors={result['errors']}" if result["errors"] else ""))
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_ms: float) -> List[str]:
+    """
+    Lists the regressions of a run against a baseline.
+
+    Latency and allocations regress when they grow by more than ``threshold``, latency only if also by more
+    than ``min_ms``; throughput when it drops by more than ``threshold``. Any extra SQL statement or error
+    is a regression, as those do not depend on the machine. Routes missing from either run are skipped, so a
+    run limited with ``--route`` can be checked against a full baseline.
+
+    :param baseline: The baseline results.
+    :type baseline: dict
+    :param current: The results to check.
+    :type current: dict
+    :param threshold: The tolerated relative change, e.g. ``0.2`` for 20%.
+    :type threshold: float
+    :param min_ms: The smallest latency increase, in milliseconds, reported as a regression.
+    :type min_ms: float
+    :return: One line per regression.
+    :rtype: List[str]
+    """
+    regressions = []
+    for name, base in baseline["routes"].items():
+        result = current["routes"].get(name)
+        if result is None:
+            continue
+        for metric in LOWER_IS_BETTER:
+            grown = result[metric] - base[metric]
+            if grown > base[metric] * threshold and (not metric.endswith("_ms") or grown > min_ms):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput_rps {base['throughput_rps']} -> {result['throughput_rps']}")
+        if result["sql_statements"] > base["sql_statements"]:
+            regressions.append(f"{name}: sql_statements {base['sql_statements']} -> {result['sql_statements']}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark the routes and write the results as JSON")
+    run_parser.add_argument("--url", default="sqlite://", help="database to seed; in-memory SQLite by default")
+    run_parser.add_argument("--contacts", type=int, default=10_000)
+    run_parser.add_argument("--users", type=int, default=100)
+    run_parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    run_parser.add_argument("--slow-requests", type=int, default=10, help="timed requests per bcrypt-bound route")
+    run_parser.add_argument("--probes", type=int, default=5, help="requests per route counting SQL and allocations")
+    run_parser.add_argument("--concurrency", type=int, default=1)
+    run_parser.add_argument("--route", action="append", help="only run routes whose name contains this text")
+    run_parser.add_argument("--output", help="defaults to benchmarks/results/endpoints-<contacts>.json")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions of a run against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--min-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline, current = (json.loads(Path(path).read_text()) for path in (args.baseline, args.current))
+        if baseline["meta"]["contacts"] != current["meta"]["contacts"] or \
+                baseline["meta"]["dialect"] != current["meta"]["dialect"]:
+            print("warning: the runs used different data sizes or databases", file=sys.stderr)
+        regressions = compare(baseline, current, args.threshold, args.min_ms)
+        print("\n".join(regressions) if regressions else "no regressions")
+        sys.exit(1 if regressions else 0)
+
+    if args.url == "sqlite://" and args.concurrency > 1:
+        parser.error("in-memory SQLite shares one connection; use a file or server database with --concurrency")
+    output = Path(args.output) if args.output else RESULTS_DIR / f"endpoints-{args.contacts}.json"
+    results = asyncio.run(run(args))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measures messages per second against a local SMTP server, opening a connection per message versus
+reusing pooled connections.
+
+Usage::
+
+    python -m benchmarks.mail --messages 500 --pool-size 4
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtplib import SMTP
+
+from src.services.mail import Mailer, SMTPPool
+
+
+class Sink:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+async def connection_per_message(mailer: Mailer, messages: list):
+    for message in messages:
+        client = SMTP(hostname=mailer.pool.hostname, port=mailer.pool.port)
+        await client.connect()
+        await client.send_message(message)
+        await client.quit()
+
+
+async def pooled_sequential(mailer: Mailer, messages: list):
+    for message in messages:
+        await mailer.pool.send(message)
+
+
+async def pooled_concurrent(mailer: Mailer, messages: list):
+    await mailer.send_many(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    controller = Controller(Sink(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        for label, strategy in (("connection_per_message", connection_per_message),
+                                ("pooled_sequential", pooled_sequential),
+                                ("pooled_concurrent", pooled_concurrent)):
+            mailer = Mailer(SMTPPool("127.0.0.1", port, size=args.pool_size), sender="bench@example.com")
+            messages = [mailer.render("verify_email", f"user{i}@example.com", link=f"http://localhost/{i}")
+                        for i in range(args.messages)]
+
+            async def run():
+                started = time.perf_counter()
+                await strategy(mailer, messages)
+                elapsed = time.perf_counter() - started
+                await mailer.close()
+                return elapsed
+
+            elapsed = asyncio.run(run())
+            print(f"{label:>24}: {args.messages / elapsed:8.1f} msg/s  "
+                  f"connections={mailer.pool.stats()['connections_opened'] or args.messages}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
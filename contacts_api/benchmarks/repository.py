@@ -0,0 +1,97 @@
+"""
+Times repository functions directly at several data sizes and reports how their cost grows.
+
+Each size gets a freshly generated dataset from :mod:`benchmarks.datagen`. Read functions are timed for the
+user owning the most contacts and for the median user, since contacts per user are skewed. The growth column
+is the exponent ``k`` in ``time ~ size ** k`` between the smallest and the largest size: about 0 for index
+lookups, about 1 for work proportional to the table.
+
+Usage::
+
+    python -m benchmarks.repository --sizes 10000,100000,1000000
+    python -m benchmarks.repository --url postgresql+psycopg2://postgres:pw@localhost/bench_scratch
+
+A server URL must point to a scratch database: its tables are dropped and recreated for every size.
+"""
+import argparse
+import itertools
+import math
+from datetime import date
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session
+
+from benchmarks.common import make_engine, measure
+from benchmarks.datagen import generate
+from src.database.models import Base, User
+from src.repository import repository
+from src.schemas import ContactCreate
+
+# Inside the early-September birthday cluster of the generated data.
+BIRTHDAY_TODAY = date(2026, 9, 1)
+
+
+def cases(db: Session, heavy: User, median: User, term: str) -> Dict[str, Callable]:
+    serial = itertools.count()
+
+    def create():
+        n = next(serial)
+        repository.create_contact(ContactCreate(first_name="Bench", last_name="Create", email=f"create{n}@example.com",
+                                                phone_number="+380000000000"), db, heavy)
+
+    return {
+        "get_contacts[heavy]": lambda: repository.get_contacts(db, heavy),
+        "get_contacts[median]": lambda: repository.get_contacts(db, median),
+        "get_contacts[heavy,skip=5000]": lambda: repository.get_contacts(db, heavy, skip=5000),
+        "get_contacts_page[heavy]": lambda: repository.get_contacts_page(db, heavy),
+        "search_contacts[heavy]": lambda: repository.search_contacts(db, heavy, name=term),
+        "search_contacts[median]": lambda: repository.search_contacts(db, median, name=term),
+        "get_contacts_birthday_soon[heavy]":
+            lambda: repository.get_contacts_birthday_soon(db, heavy, days=7, today=BIRTHDAY_TODAY),
+        "get_contacts_birthday_soon[median]":
+            lambda: repository.get_contacts_birthday_soon(db, median, days=7, today=BIRTHDAY_TODAY),
+        "create_contact[heavy]": create,
+    }
+
+
+def growth(sizes: List[int], timings: List[float]) -> float:
+    if len(sizes) < 2 or timings[0] <= 0:
+        return float("nan")
+    return math.log(timings[-1] / timings[0]) / math.log(sizes[-1] / sizes[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated contact counts")
+    parser.add_argument("--users-per-contact", type=float, default=0.01)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--term", default="олен")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results: Dict[str, List[float]] = {}
+    for size in sizes:
+        engine = make_engine(args.url)
+        if args.url != "sqlite://":
+            Base.metadata.drop_all(engine)
+            Base.metadata.create_all(engine)
+        dataset = generate(engine, size, max(1, int(size * args.users_per_contact)), skew=args.skew)
+        with Session(engine, expire_on_commit=False) as db:
+            heavy, median = (db.get(User, dataset.user_at(quantile)[0]) for quantile in (0.0, 0.5))
+            print(f"{size} contacts: heavy user owns {dataset.user_at(0.0)[1]}, "
+                  f"median user owns {dataset.user_at(0.5)[1]}", flush=True)
+            for label, func in cases(db, heavy, median, args.term).items():
+                results.setdefault(label, []).append(measure(func, args.repeat)["p50_ms"])
+        engine.dispose()
+
+    header = "".join(f"{size:>12}" for size in sizes)
+    print(f"\n{'p50 ms':<38}{header}{'growth':>10}")
+    for label, timings in results.items():
+        print(f"{label:<38}" + "".join(f"{timing:>12.3f}" for timing in timings)
+              + f"{growth(sizes, timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares the legacy leading-wildcard ILIKE search with the indexed search engine.
+
+Usage::
+
+    python -m benchmarks.search --url sqlite:///bench_search.db --contacts 1000000
+"""
+import argparse
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from benchmarks.common import make_engine, measure, seed_contacts
+from src.database.models import Contact
+from src.repository.search import contact_search_statement
+
+
+def legacy_statement(name: str):
+    return select(Contact).where(Contact.first_name.ilike(f"%{name}%") | Contact.last_name.ilike(f"%{name}%"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite:///bench_search.db")
+    parser.add_argument("--contacts", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--term", default="kovalen")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    with Session(engine) as db:
+        if db.query(Contact.id).first() is None:
+            seed_contacts(engine, args.contacts, args.users)
+        user_id = db.query(Contact.user_id).first()[0]
+        dialect = engine.dialect.name
+        results = {
+            "legacy_ilike_all_users": measure(lambda: db.scalars(legacy_statement(args.term)).all(), args.repeat),
+            "indexed_search": measure(
+                lambda: db.execute(contact_search_statement(dialect, user_id, name=args.term)).all(), args.repeat),
+        }
+    for label, stats in results.items():
+        print(f"{label:>24}: " + "  ".join(f"{key}={value:.2f}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the ORM + ``response_model`` serialization path with the column projection + orjson path
+for one page of contacts.
+
+Usage::
+
+    python -m benchmarks.serialization --rows 1000
+"""
+import argparse
+import json
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from benchmarks.common import make_engine, measure, seed_contacts
+from src.database.models import Contact
+from src.repository.projection import CONTACT_RESPONSE_COLUMNS, contact_records
+from src.routes.responses import FastJSONResponse
+from src.schemas import ContactResponse
+
+response_adapter = TypeAdapter(List[ContactResponse])
+
+
+def legacy_body(contacts: list) -> bytes:
+    # What FastAPI does for a response_model: validate from attributes, dump to JSON types, then json.dumps.
+    validated = response_adapter.validate_python(contacts, from_attributes=True)
+    return json.dumps(response_adapter.dump_python(validated, mode="json")).encode()
+
+
+def fast_body(rows: list) -> bytes:
+    return FastJSONResponse(contact_records(rows)).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    user_id = seed_contacts(engine, args.rows, users=1)[0]
+    with Session(engine) as db:
+        def load_entities():
+            db.expunge_all()
+            return db.query(Contact).filter(Contact.user_id == user_id).limit(args.rows).all()
+
+        def load_rows():
+            return db.query(*CONTACT_RESPONSE_COLUMNS).filter(Contact.user_id == user_id).limit(args.rows).all()
+
+        entities, rows = load_entities(), load_rows()
+        assert json.loads(legacy_body(entities)) == json.loads(fast_body(rows))
+        results = {
+            "serialize_response_model": measure(lambda: legacy_body(entities), args.repeat),
+            "serialize_orjson_rows": measure(lambda: fast_body(rows), args.repeat),
+            "load+serialize_orm": measure(lambda: legacy_body(load_entities()), args.repeat),
+            "load+serialize_rows": measure(lambda: fast_body(load_rows()), args.repeat),
+        }
+    for label, stats in results.items():
+        print(f"{label:>26}: " + "  ".join(f"{key}={value:.2f}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
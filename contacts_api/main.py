@@ -1,40 +1,61 @@
+from contextlib import asynccontextmanager
 from datetime import timedelta
-from fastapi import Request, FastAPI, Depends, HTTPException, status, Security, BackgroundTasks
-from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, OAuth2PasswordBearer
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from typing import List
+from fastapi import Request, FastAPI, Depends, HTTPException, status, Security
+from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 
-from src.schemas import EmailRequest
-from src.auths.auth import create_access_token, create_refresh_token, get_email_from_refresh_token, get_current_user, \
-    Hash, get_email_from_access_token
+from src.schemas import EmailRequest, SessionResponse
+from src.auths.auth import create_access_token, get_current_user, Hash, get_email_from_access_token
+from src.auths.hashing import password_hasher
+from src.auths.principal_cache import Principal
+from src.auths.sessions import session_manager
+from src.conf.config import settings
 from src.database.db import get_db
+from src.database.instrumentation import QueryStatsMiddleware
 from src.database.models import User
-from src.routes.router import router, hash_handler
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from src.repository.outbox import email_message, queue_messages
+from src.repository.repository import get_user_by_email, create_user
+from src.routes.avatars import router as avatars_router
+from src.routes.metrics import router as metrics_router
+from src.routes.router import router
+from src.routes.stats import router as stats_router
+from src.services.avatars import AvatarUploadLimitMiddleware, avatar_pipeline
+from src.services.metrics import MetricsMiddleware
+from src.services.profiling import ProfilingMiddleware
+from src.services.rate_limit import login_rate_limit, send_email_rate_limit, signup_rate_limit
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-conf = ConnectionConfig(
-    MAIL_USERNAME="example@meta.ua",
-    MAIL_PASSWORD="secretPassword",
-    MAIL_FROM="example@meta.ua",
-    MAIL_PORT=465,
-    MAIL_SERVER="smtp.meta.ua",
-    MAIL_FROM_NAME="Example email",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Manages resources that live for the whole application run.
+
+    :param app: The FastAPI application.
+    :type app: FastAPI
+    """
+    yield
+    password_hasher.shutdown()
+    avatar_pipeline.shutdown()
 
-app = FastAPI()
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
+app = FastAPI(lifespan=lifespan)
+if settings.profiling_token or settings.profiling_sample_rate:
+    app.add_middleware(ProfilingMiddleware, token=settings.profiling_token,
+                       sample_rate=settings.profiling_sample_rate, directory=settings.profiling_dir,
+                       keep=settings.profiling_keep, interval=settings.profiling_interval)
+app.add_middleware(AvatarUploadLimitMiddleware, pipeline=avatar_pipeline, path="/users/me/avatar")
+app.add_middleware(QueryStatsMiddleware, warn_statements=settings.sql_warn_statements)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
 
 app.include_router(router)
+app.include_router(stats_router)
+app.include_router(avatars_router)
+app.include_router(metrics_router)
 
 class UserModel(BaseModel):
     """
@@ -48,66 +69,44 @@ class UserModel(BaseModel):
     username: str
     password: str
 
-fm = FastMail(conf)
-
-@app.post("/send-email")
-def send_email(request: EmailRequest):
+@app.post("/send-email", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(send_email_rate_limit)])
+async def send_email(request: EmailRequest, db: Session = Depends(get_db)):
     """
-    Sends an email to the specified recipient.
+    Queues an email to the specified recipient for the outbox dispatcher.
 
     :param request: The email request data.
     :type request: EmailRequest
-    :return: A message indicating the result of the email sending.
+    :param db: The database session.
+    :type db: Session
+    :return: A message confirming that the email was queued.
     :rtype: dict
-    :raises HTTPException: If there is an error in sending the email.
     """
-    message = MessageSchema(
-        subject="Email Verification",
-        recipients=[request.recipient_email],
-        body=f"Click on the link to verify your email: {request.verification_link}",
-        subtype="plain"
-    )
-    try:
-        fm.send_message(message)
-        return {"message": "Email sent successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    message = email_message("verify_email", request.recipient_email, link=request.verification_link)
+    await run_in_threadpool(queue_messages, db, [message])
+    return {"message": "Email queued for delivery"}
 
-@app.post("/signup", status_code=status.HTTP_201_CREATED)
-def signup(body: UserModel, db: Session = Depends(get_db), background_tasks: BackgroundTasks = None):
+@app.post("/signup", status_code=status.HTTP_201_CREATED, dependencies=[Depends(signup_rate_limit)])
+async def signup(body: UserModel, db: Session = Depends(get_db)):
     """
-    Registers a new user and sends a verification email.
+    Registers a new user and queues a verification email in the same transaction.
 
     :param body: The user's signup data.
     :type body: UserModel
     :param db: The database session.
     :type db: Session
-    :param background_tasks: Background tasks for handling async email sending.
-    :type background_tasks: BackgroundTasks, optional
     :return: The email of the new user and a message indicating registration success.
     :rtype: dict
-    :raises HTTPException: If the user already exists or there is an error in email sending.
+    :raises HTTPException: If the user already exists.
     """
-    exist_user = db.query(User).filter(User.email == body.username).first()
+    exist_user = await run_in_threadpool(get_user_by_email, db, body.username)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
 
-    new_user = User(email=body.username, password=hash_handler.get_password_hash(body.password))
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    verification_token = create_access_token(data={"sub": new_user.email}, expires_delta=timedelta(hours=24))
+    hashed_password = await password_hasher.hash(body.password)
+    verification_token = create_access_token(data={"sub": body.username}, expires_delta=timedelta(hours=24))
     verification_link = f"http://localhost/verify-email?token={verification_token}"
-
-    message = MessageSchema(
-        subject="Email Verification",
-        recipients=[new_user.email],
-        body=f"Please verify your email: {verification_link}",
-        subtype=MessageType.plain
-    )
-    fm = FastMail(conf)
-    background_tasks.add_task(fm.send_message, message)
+    new_user = await run_in_threadpool(create_user, db, body.username, hashed_password,
+                                       outbox=[email_message("verify_email", body.username, link=verification_link)])
 
     return {"email": new_user.email,
             "message": "User registered successfully. Please check your email to verify your account."}
@@ -139,11 +138,15 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
     return {"message": "Email verified successfully"}
 
-@app.post("/login")
-def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@app.post("/login", dependencies=[Depends(login_rate_limit)])
+async def login(request: Request, body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Authenticates a user and returns access and refresh tokens.
 
+    Every login opens its own refresh session, so each device can refresh and log out independently.
+
+    :param request: The incoming request, whose ``User-Agent`` names the device.
+    :type request: Request
     :param body: The login data.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
@@ -152,47 +155,68 @@ def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get
     :rtype: dict
     :raises HTTPException: If the email or password is invalid, or the email is not verified.
     """
-    user = db.query(User).filter(User.email == body.username).first()
-    if not user or not hash_handler.verify_password(body.password, user.password):
+    user = await run_in_threadpool(get_user_by_email, db, body.username)
+    if not user or not await password_hasher.verify(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
     if not user.is_verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not verified")
 
     access_token = create_access_token(data={"sub": user.email})
-    refresh_token = create_refresh_token(data={"sub": user.email})
-    user.refresh_token = refresh_token
-    db.commit()
+    refresh_token = await run_in_threadpool(session_manager.open, db, user.id, user.email,
+                                            request.headers.get("user-agent"))
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @app.get('/refresh_token')
-def refresh_token(credentials: HTTPAuthorizationCredentials = Security(oauth2_scheme), db: Session = Depends(get_db)):
+def refresh_token(token: str = Security(oauth2_scheme), db: Session = Depends(get_db)):
     """
     Generates a new access token using the refresh token.
 
-    :param credentials: The current user's refresh token.
-    :type credentials: HTTPAuthorizationCredentials
+    The refresh token is rotated within its session; presenting a token that was already rotated revokes the
+    session, since only a copied token can be used twice.
+
+    :param token: The current refresh token.
+    :type token: str
     :param db: The database session.
     :type db: Session
     :return: A new access token, refresh token, and token type.
     :rtype: dict
-    :raises HTTPException: If the refresh token is invalid or does not match.
+    :raises HTTPException: If the refresh token is invalid, expired, revoked or already used.
     """
-    token = credentials.credentials
-    email = get_email_from_refresh_token(token)
-    user = db.query(User).filter(User.email == email).first()
-
-    if user.refresh_token != token:
-        user.refresh_token = None
-        db.commit()
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-
+    email, refresh_token = session_manager.rotate(db, token)
     access_token = create_access_token(data={"sub": email})
-    refresh_token = create_refresh_token(data={"sub": email})
-    user.refresh_token = refresh_token
-    db.commit()
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
+@app.get("/sessions", response_model=List[SessionResponse])
+def list_sessions(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Lists the devices logged in to the current user's account.
+
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :param db: The database session.
+    :type db: Session
+    :return: The open sessions, oldest first.
+    :rtype: List[SessionInfo]
+    """
+    return session_manager.list(db, current_user.id)
+
+@app.delete("/sessions/{family}", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_session(family: str, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Logs one device out; its refresh token stops working immediately.
+
+    :param family: The ID of the session.
+    :type family: str
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :param db: The database session.
+    :type db: Session
+    :raises HTTPException: If the user has no open session with this ID.
+    """
+    if not session_manager.revoke(db, current_user.id, family):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+
 @app.get("/")
 def root():
     """
@@ -204,12 +228,12 @@ def root():
     return {"message": "Hello World"}
 
 @app.get("/secret")
-def read_item(current_user: User = Depends(get_current_user)):
+def read_item(current_user: Principal = Depends(get_current_user)):
     """
     Secret route accessible only to authenticated users.
 
     :param current_user: The currently authenticated user.
-    :type current_user: User
+    :type current_user: Principal
     :return: A message and the email of the current user.
     :rtype: dict
     """
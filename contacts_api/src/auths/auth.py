@@ -1,19 +1,21 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from starlette import status
 
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from src.auths.hashing import hash_password, pwd_context, verify_password
+from src.auths.principal_cache import Principal, principal_cache
 from src.database.db import get_db
 from src.database.models import User
+from src.services.mail import mailer
+from src.services.metrics import JWT_DECODE, JWT_DECODE_FAILURES, JWT_ENCODE
+from src.services.profiling import charge
 
 
 class TokenData(BaseModel):
@@ -36,7 +38,7 @@ def get_email_from_access_token(token: str) -> Optional[str]:
     :rtype: Optional[str]
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             return None
@@ -54,7 +56,7 @@ class Hash:
         verify_password(plain_password, hashed_password): Verifies if the plain and hashed passwords match.
         get_password_hash(password: str): Generates a hash for the given password.
     """
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -67,7 +69,7 @@ class Hash:
         :return: True if passwords match, otherwise False.
         :rtype: bool
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return verify_password(plain_password, hashed_password)
 
     def get_password_hash(self, password: str):
         """
@@ -78,7 +80,7 @@ class Hash:
         :return: The hashed password.
         :rtype: str
         """
-        return self.pwd_context.hash(password)
+        return hash_password(password)
 
 
 SECRET_KEY = "secret_key"
@@ -87,6 +89,45 @@ ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 
+def encode_token(payload: dict) -> str:
+    """
+    Signs a payload with the application key, recording the time it took.
+
+    :param payload: The claims.
+    :type payload: dict
+    :return: The JWT.
+    :rtype: str
+    """
+    started = time.perf_counter()
+    token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    elapsed = time.perf_counter() - started
+    JWT_ENCODE.observe(elapsed)
+    charge("jwt", elapsed)
+    return token
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verifies a JWT signed with the application key, recording the time it took and counting rejections.
+
+    :param token: The JWT.
+    :type token: str
+    :return: The claims.
+    :rtype: dict
+    :raises JWTError: If the token is malformed, forged or expired.
+    """
+    started = time.perf_counter()
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        JWT_DECODE_FAILURES.inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        JWT_DECODE.observe(elapsed)
+        charge("jwt", elapsed)
+
+
 def create_verification_token(email: str):
     """
     Creates a token for email verification.
@@ -100,44 +141,21 @@ def create_verification_token(email: str):
         "sub": email,
         "exp": datetime.utcnow() + timedelta(hours=24)
     }
-    token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    token = encode_token(payload)
     return token
 
 
-def send_verification_email(email: str, token: str):
+async def send_verification_email(email: str, token: str):
     """
-    Sends a verification email with a verification link.
+    Sends a verification email with a verification link over the pooled SMTP connections.
 
     :param email: The recipient's email address.
     :type email: str
     :param token: The verification token to include in the email.
     :type token: str
+    :raises SMTPException: If the message could not be delivered.
     """
-    sender_email = "your_email@example.com"
-    receiver_email = email
-    password = "your_email_password"
-
-    message = MIMEMultipart("alternative")
-    message["Subject"] = "Email Verification"
-    message["From"] = sender_email
-    message["To"] = receiver_email
-
-    verification_link = f"http://your-domain.com/verify-email/?token={token}"
-    html = f"""
-    <html>
-    <body>
-        <p>Thank you for registering! Please verify your email by clicking the link below:</p>
-        <a href="{verification_link}">Verify Email</a>
-    </body>
-    </html>
-    """
-
-    part = MIMEText(html, "html")
-    message.attach(part)
-
-    with smtplib.SMTP_SSL("smtp.example.com", 465) as server:
-        server.login(sender_email, password)
-        server.sendmail(sender_email, receiver_email, message.as_string())
+    await mailer.send("verify_email", email, link=f"http://your-domain.com/verify-email/?token={token}")
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -156,8 +174,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(hours=1)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm="HS256")
+    to_encode.update({"exp": expire, "scope": "access_token"})
+    encoded_jwt = encode_token(to_encode)
     return encoded_jwt
 
 
@@ -178,10 +196,29 @@ def create_refresh_token(data: dict, expires_delta: Optional[float] = None):
     else:
         expire = datetime.utcnow() + timedelta(days=7)
     to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-    encoded_refresh_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_refresh_token = encode_token(to_encode)
     return encoded_refresh_token
 
 
+def decode_refresh_token(refresh_token: str) -> dict:
+    """
+    Verifies a refresh token and returns its claims.
+
+    :param refresh_token: The JWT refresh token.
+    :type refresh_token: str
+    :return: The token payload.
+    :rtype: dict
+    :raises HTTPException: If the token has an invalid scope or cannot be validated.
+    """
+    try:
+        payload = decode_token(refresh_token)
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
+    if payload.get('scope') != 'refresh_token':
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
+    return payload
+
+
 def get_email_from_refresh_token(refresh_token: str):
     """
     Retrieves the email from the refresh token.
@@ -192,28 +229,28 @@ def get_email_from_refresh_token(refresh_token: str):
     :rtype: str
     :raises HTTPException: If the token has an invalid scope or cannot be validated.
     """
-    try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload['scope'] == 'refresh_token':
-            email = payload['sub']
-            return email
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid scope for token')
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
+    return decode_refresh_token(refresh_token)['sub']
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     """
     Retrieves the current user from the access token.
 
+    Tokens that were already verified are answered from :data:`principal_cache` without decoding the
+    token or querying the database.
+
     :param token: The JWT access token.
     :type token: str
     :param db: The database session.
     :type db: Session
-    :return: The user if the token is valid and the user exists in the database.
-    :rtype: User
+    :return: The principal if the token is valid and the user exists in the database.
+    :rtype: Principal
     :raises HTTPException: If the credentials are invalid or the user is not found.
     """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -221,8 +258,8 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload['scope'] == 'access_token':
+        payload = decode_token(token)
+        if payload.get('scope') == 'access_token':
             email = payload["sub"]
             if email is None:
                 raise credentials_exception
@@ -234,4 +271,6 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     user: User = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload["exp"])
+    return principal
@@ -0,0 +1,190 @@
+import asyncio
+import multiprocessing
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+from src.services.metrics import PASSWORD_HASH, PASSWORD_VERIFY
+from src.services.profiling import charge
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _bcrypt(operation: str, *args):
+    """
+    Runs one bcrypt operation and times it, wherever it runs.
+
+    Pool workers return the time instead of recording it, so it is recorded by the process serving metrics.
+
+    :param operation: ``hash`` or ``verify``.
+    :type operation: str
+    :return: The result of the operation and the seconds it took.
+    :rtype: tuple
+    """
+    started = time.perf_counter()
+    result = pwd_context.hash(*args) if operation == "hash" else pwd_context.verify(*args)
+    return result, time.perf_counter() - started
+
+
+def hash_password(password: str) -> str:
+    """
+    Hashes a password with bcrypt in the calling process.
+
+    :param password: The plain password to hash.
+    :type password: str
+    :return: The hashed password.
+    :rtype: str
+    """
+    hashed, elapsed = _bcrypt("hash", password)
+    PASSWORD_HASH.observe(elapsed)
+    charge("bcrypt", elapsed)
+    return hashed
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies a password against a bcrypt hash in the calling process.
+
+    :param plain_password: The plain password to check.
+    :type plain_password: str
+    :param hashed_password: The hashed password to compare against.
+    :type hashed_password: str
+    :return: True if passwords match, otherwise False.
+    :rtype: bool
+    """
+    matches, elapsed = _bcrypt("verify", plain_password, hashed_password)
+    PASSWORD_VERIFY.observe(elapsed)
+    charge("bcrypt", elapsed)
+    return matches
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a bounded process pool.
+
+    Jobs are submitted from the event loop and awaited, so request workers never burn CPU on bcrypt.
+    At most ``queue_limit`` jobs may be running or waiting at once; further calls are rejected with 503
+    so a login burst cannot build an unbounded backlog.
+
+    :param workers: Number of worker processes. ``0`` runs jobs in the default thread pool instead.
+    :type workers: int
+    :param queue_limit: Maximum number of jobs running or waiting in the pool.
+    :type queue_limit: int
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latency_total_ms = 0.0
+        self._latency_max_ms = 0.0
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _run(self, operation: str, *args):
+        if self._pending >= self.queue_limit:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._get_executor(), _bcrypt, operation, *args)
+            (PASSWORD_HASH if operation == "hash" else PASSWORD_VERIFY).observe(elapsed)
+            return result
+        finally:
+            self._pending -= 1
+            waited = time.perf_counter() - started
+            self._record(waited * 1000)
+            charge("bcrypt", waited)
+
+    def _record(self, elapsed_ms: float):
+        self._completed += 1
+        self._latency_total_ms += elapsed_ms
+        self._latency_max_ms = max(self._latency_max_ms, elapsed_ms)
+        self._latency_buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password in the pool.
+
+        :param password: The plain password to hash.
+        :type password: str
+        :return: The hashed password.
+        :rtype: str
+        :raises HTTPException: If the pool queue is full.
+        """
+        return await self._run("hash", password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verifies a password against a hash in the pool.
+
+        :param plain_password: The plain password to check.
+        :type plain_password: str
+        :param hashed_password: The hashed password to compare against.
+        :type hashed_password: str
+        :return: True if passwords match, otherwise False.
+        :rtype: bool
+        :raises HTTPException: If the pool queue is full.
+        """
+        return await self._run("verify", plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """
+        Returns pool depth and latency figures for this worker.
+
+        :return: Pending, running and queued job counts plus a latency histogram in milliseconds.
+        :rtype: dict
+        """
+        running = min(self._pending, self.workers) if self.workers > 0 else self._pending
+        buckets = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self._latency_buckets)}
+        buckets["le_inf"] = self._latency_buckets[-1]
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+            "running": running,
+            "queued": self._pending - running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "latency_ms": {
+                "avg": self._latency_total_ms / self._completed if self._completed else 0.0,
+                "max": self._latency_max_ms,
+                "buckets": buckets,
+            },
+        }
+
+    def shutdown(self):
+        """
+        Stops the worker processes, waiting for running jobs to finish.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.hash_pool_workers, settings.hash_queue_limit)
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+from src.conf.config import settings
+from src.database.models import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The authenticated caller, reduced to what request handlers need.
+
+    :param id: The ID of the user.
+    :type id: int
+    :param email: The email of the user.
+    :type email: str
+    :param is_verified: Whether the user's email is verified.
+    :type is_verified: bool
+    """
+    id: int
+    email: str
+    is_verified: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, is_verified=bool(user.is_verified))
+
+
+def token_signature(token: str) -> str:
+    """
+    Returns the signature segment of a JWT, used as the cache key.
+
+    :param token: The encoded JWT.
+    :type token: str
+    :return: The signature segment of the token.
+    :rtype: str
+    """
+    return token.rpartition(".")[2]
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache mapping verified access tokens to principals.
+
+    Entries expire at the token's ``exp`` claim or after ``max_ttl`` seconds, whichever comes first,
+    and can be dropped per user when the user row changes.
+
+    :param maxsize: Maximum number of cached tokens.
+    :type maxsize: int
+    :param max_ttl: Upper bound on how long an entry is trusted, in seconds.
+    :type max_ttl: float
+    """
+
+    def __init__(self, maxsize: int, max_ttl: float):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        """
+        Returns the cached principal for a token, if present and not expired.
+
+        :param token: The encoded access token.
+        :type token: str
+        :return: The principal, or None on a miss.
+        :rtype: Optional[Principal]
+        """
+        key = token_signature(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, token: str, principal: Principal, exp: float):
+        """
+        Caches the principal for a verified token.
+
+        :param token: The encoded access token.
+        :type token: str
+        :param principal: The principal the token resolved to.
+        :type principal: Principal
+        :param exp: The token's ``exp`` claim as a UNIX timestamp.
+        :type exp: float
+        """
+        if self.maxsize <= 0:
+            return
+        key = token_signature(token)
+        expires_at = min(exp, time.time() + self.max_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (principal, expires_at)
+            self._by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """
+        Drops every cached token belonging to a user.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        """
+        with self._lock:
+            for key in self._by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        principal, _ = self._entries.pop(key)
+        keys = self._by_user.get(principal.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[principal.id]
+
+
+principal_cache = PrincipalCache(settings.principal_cache_size, settings.principal_cache_ttl)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User):
+    principal_cache.invalidate_user(target.id)
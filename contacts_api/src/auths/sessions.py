@@ -0,0 +1,358 @@
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import redis
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from src.auths.auth import create_refresh_token, decode_refresh_token
+from src.conf.config import settings
+from src.database.cache import redis_client
+from src.database.models import RefreshSession, User
+
+ROTATED = "rotated"
+REUSED = "reused"
+UNKNOWN = "unknown"
+
+REDIS = "redis"
+DATABASE = "database"
+
+# Swaps the family's current token ID for ARGV[2] if it is still ARGV[1]. Any other token ID is a replay of
+# a token that was already rotated, so the whole family is dropped.
+_ROTATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'jti')
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', KEYS[2], ARGV[5])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2], 'used', ARGV[4])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+redis.call('PEXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+_ROTATE_RESULTS = {1: ROTATED, 0: UNKNOWN, -1: REUSED}
+
+
+def new_token_id() -> str:
+    return secrets.token_hex(16)
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    """
+    One logged-in device of a user.
+
+    :param family: The ID of the refresh token family.
+    :type family: str
+    :param device: The client that logged in.
+    :type device: str, optional
+    :param created_at: When the session was opened, in UTC.
+    :type created_at: datetime
+    :param last_used_at: When the session was last refreshed, in UTC.
+    :type last_used_at: datetime
+    """
+    family: str
+    device: Optional[str]
+    created_at: datetime
+    last_used_at: datetime
+
+
+def _from_timestamp(value) -> datetime:
+    return datetime.fromtimestamp(float(value), timezone.utc).replace(tzinfo=None)
+
+
+class RedisSessionStore:
+    """
+    Refresh token families kept in Redis.
+
+    Each family is a hash holding its current token ID and expiring with it; a set per user lists the
+    families so devices can be shown and logged out. A refresh is one script call on the family hash.
+
+    :param client: The Redis client.
+    :type client: redis.Redis
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._rotate = client.register_script(_ROTATE_SCRIPT)
+
+    @staticmethod
+    def family_key(family: str) -> str:
+        return f"session:{family}"
+
+    @staticmethod
+    def user_key(user_id: int) -> str:
+        return f"sessions:{user_id}"
+
+    def open(self, user_id: int, family: str, jti: str, device: Optional[str], ttl: int):
+        """
+        Stores a new family whose current token is ``jti``.
+
+        :raises RedisError: If Redis is unreachable.
+        """
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hset(self.family_key(family), mapping={
+            "uid": user_id, "jti": jti, "device": device or "", "created": now, "used": now,
+        })
+        pipe.expire(self.family_key(family), ttl)
+        pipe.sadd(self.user_key(user_id), family)
+        pipe.expire(self.user_key(user_id), ttl)
+        pipe.execute()
+
+    def rotate(self, user_id: int, family: str, jti: str, new_jti: str, ttl: int) -> str:
+        """
+        Replaces the current token of a family.
+
+        :return: :data:`ROTATED`, :data:`REUSED` if ``jti`` was already rotated, or :data:`UNKNOWN` if the
+            family expired or was revoked.
+        :rtype: str
+        :raises RedisError: If Redis is unreachable.
+        """
+        result = self._rotate(keys=[self.family_key(family), self.user_key(user_id)],
+                              args=[jti, new_jti, ttl * 1000, time.time(), family])
+        return _ROTATE_RESULTS[int(result)]
+
+    def list(self, user_id: int) -> List[SessionInfo]:
+        families = sorted(member.decode() for member in self.client.smembers(self.user_key(user_id)))
+        pipe = self.client.pipeline()
+        for family in families:
+            pipe.hgetall(self.family_key(family))
+        sessions, expired = [], []
+        for family, fields in zip(families, pipe.execute()):
+            if not fields:
+                expired.append(family)
+                continue
+            device = fields[b"device"].decode() or None
+            sessions.append(SessionInfo(family, device, _from_timestamp(fields[b"created"]),
+                                        _from_timestamp(fields[b"used"])))
+        if expired:
+            self.client.srem(self.user_key(user_id), *expired)
+        return sessions
+
+    def revoke(self, user_id: int, family: str) -> bool:
+        if not self.client.srem(self.user_key(user_id), family):
+            return False
+        self.client.delete(self.family_key(family))
+        return True
+
+
+class DatabaseSessionStore:
+    """
+    Refresh token families kept in the ``refresh_sessions`` table.
+
+    A refresh is one conditional UPDATE of the family's row by primary key; the ``users`` row is never
+    written. Each login deletes the user's expired and revoked families, so lapsed rows do not pile up.
+    """
+
+    def open(self, db: Session, user_id: int, family: str, jti: str, device: Optional[str], ttl: int):
+        now = datetime.utcnow()
+        db.execute(
+            delete(RefreshSession)
+            .where(RefreshSession.user_id == user_id,
+                   or_(RefreshSession.revoked_at.is_not(None), RefreshSession.expires_at <= now))
+            .execution_options(synchronize_session=False)
+        )
+        db.add(RefreshSession(family=family, user_id=user_id, jti=jti, device=device, created_at=now,
+                              last_used_at=now, expires_at=now + timedelta(seconds=ttl)))
+        db.commit()
+
+    def rotate(self, db: Session, family: str, jti: str, new_jti: str, ttl: int) -> str:
+        """
+        Replaces the current token of a family.
+
+        :return: :data:`ROTATED`, :data:`REUSED` if ``jti`` was already rotated, or :data:`UNKNOWN` if the
+            family expired or was revoked.
+        :rtype: str
+        """
+        now = datetime.utcnow()
+        swapped = db.execute(
+            update(RefreshSession)
+            .where(RefreshSession.family == family, RefreshSession.jti == jti,
+                   RefreshSession.revoked_at.is_(None), RefreshSession.expires_at > now)
+            .values(jti=new_jti, last_used_at=now, expires_at=now + timedelta(seconds=ttl))
+        )
+        if swapped.rowcount == 1:
+            db.commit()
+            return ROTATED
+        row = db.execute(
+            select(RefreshSession.revoked_at, RefreshSession.expires_at).where(RefreshSession.family == family)
+        ).first()
+        if row is None or row.revoked_at is not None or row.expires_at <= now:
+            db.rollback()
+            return UNKNOWN
+        db.execute(update(RefreshSession).where(RefreshSession.family == family).values(revoked_at=now))
+        db.commit()
+        return REUSED
+
+    def list(self, db: Session, user_id: int) -> List[SessionInfo]:
+        rows = db.execute(
+            select(RefreshSession.family, RefreshSession.device, RefreshSession.created_at,
+                   RefreshSession.last_used_at)
+            .where(RefreshSession.user_id == user_id, RefreshSession.revoked_at.is_(None),
+                   RefreshSession.expires_at > datetime.utcnow())
+            .order_by(RefreshSession.family)
+        ).all()
+        return [SessionInfo(*row) for row in rows]
+
+    def revoke(self, db: Session, user_id: int, family: str) -> bool:
+        revoked = db.execute(
+            update(RefreshSession)
+            .where(RefreshSession.family == family, RefreshSession.user_id == user_id,
+                   RefreshSession.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        db.commit()
+        return revoked.rowcount == 1
+
+
+class SessionManager:
+    """
+    Issues and rotates refresh tokens, one token family per login.
+
+    Refresh tokens carry their family (``fam``), their own ID (``jti``), the user (``uid``) and the store
+    holding the family (``sst``). Families are opened in Redis when ``backend`` is ``"redis"`` and in the
+    database otherwise or while Redis is unreachable; a family is always rotated in the store that opened it,
+    so a refresh is a single compare-and-swap and only reads the ``users`` table to check that the user still
+    exists.
+
+    :param redis_store: The Redis store.
+    :type redis_store: RedisSessionStore
+    :param database_store: The database store.
+    :type database_store: DatabaseSessionStore
+    :param backend: The preferred store, ``"redis"`` or ``"database"``.
+    :type backend: str
+    :param ttl: Seconds a refresh token stays valid.
+    :type ttl: int
+    """
+
+    def __init__(self, redis_store: RedisSessionStore, database_store: DatabaseSessionStore, backend: str,
+                 ttl: int):
+        self.redis_store = redis_store
+        self.database_store = database_store
+        self.backend = backend
+        self.ttl = ttl
+
+    def _token(self, email: str, user_id: int, family: str, jti: str, store: str) -> str:
+        return create_refresh_token(data={"sub": email, "uid": user_id, "fam": family, "jti": jti, "sst": store},
+                                    expires_delta=self.ttl)
+
+    def open(self, db: Session, user_id: int, email: str, device: Optional[str]) -> str:
+        """
+        Opens a session for a new login.
+
+        :param db: The database session.
+        :type db: Session
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param email: The email of the user, kept as the token subject.
+        :type email: str
+        :param device: The client that logged in.
+        :type device: str, optional
+        :return: The refresh token of the new family.
+        :rtype: str
+        """
+        family, jti = new_token_id(), new_token_id()
+        device = device[:255] if device else None
+        store = DATABASE
+        if self.backend == REDIS:
+            try:
+                self.redis_store.open(user_id, family, jti, device, self.ttl)
+                store = REDIS
+            except RedisError:
+                pass
+        if store == DATABASE:
+            self.database_store.open(db, user_id, family, jti, device, self.ttl)
+        return self._token(email, user_id, family, jti, store)
+
+    def rotate(self, db: Session, refresh_token: str) -> Tuple[str, str]:
+        """
+        Exchanges a refresh token for the next one of its family.
+
+        :param db: The database session.
+        :type db: Session
+        :param refresh_token: The presented refresh token.
+        :type refresh_token: str
+        :return: The email of the user and the new refresh token.
+        :rtype: Tuple[str, str]
+        :raises HTTPException: 401 if the token is invalid, expired, revoked or already used, in which case
+            its family is revoked, or if its user was deleted or changed email; 503 if the family is kept in
+            Redis and Redis is unreachable.
+        """
+        claims = decode_refresh_token(refresh_token)
+        try:
+            email, user_id, family, jti, store = (claims[key] for key in ("sub", "uid", "fam", "jti", "sst"))
+        except KeyError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        if db.scalar(select(User.id).where(User.id == user_id, User.email == email)) is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        new_jti = new_token_id()
+        if store == REDIS:
+            try:
+                result = self.redis_store.rotate(user_id, family, jti, new_jti, self.ttl)
+            except RedisError:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Session store unavailable, please retry", headers={"Retry-After": "1"})
+        else:
+            result = self.database_store.rotate(db, family, jti, new_jti, self.ttl)
+        if result == REUSED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                detail="Refresh token reuse detected, the session was revoked")
+        if result != ROTATED:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        return email, self._token(email, user_id, family, new_jti, store)
+
+    def list(self, db: Session, user_id: int) -> List[SessionInfo]:
+        """
+        Lists the open sessions of a user in both stores.
+
+        A Redis outage hides the sessions kept there rather than failing the request.
+
+        :param db: The database session.
+        :type db: Session
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The sessions, oldest first.
+        :rtype: List[SessionInfo]
+        """
+        sessions = self.database_store.list(db, user_id)
+        try:
+            sessions += self.redis_store.list(user_id)
+        except RedisError:
+            pass
+        return sorted(sessions, key=lambda session: session.created_at)
+
+    def revoke(self, db: Session, user_id: int, family: str) -> bool:
+        """
+        Logs one device out by revoking its token family.
+
+        :param db: The database session.
+        :type db: Session
+        :param user_id: The ID of the user owning the family.
+        :type user_id: int
+        :param family: The ID of the family.
+        :type family: str
+        :return: Whether an open session was revoked.
+        :rtype: bool
+        :raises HTTPException: 503 if the family may be kept in Redis and Redis is unreachable.
+        """
+        if self.database_store.revoke(db, user_id, family):
+            return True
+        try:
+            return self.redis_store.revoke(user_id, family)
+        except RedisError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Session store unavailable, please retry", headers={"Retry-After": "1"})
+
+
+session_manager = SessionManager(RedisSessionStore(redis_client), DatabaseSessionStore(), settings.session_backend,
+                                 settings.refresh_token_ttl)
@@ -0,0 +1,123 @@
+import time
+
+import redis
+import redis.asyncio
+import redis.asyncio.client
+import redis.client
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+from src.conf.config import settings
+from src.services.metrics import observe_redis
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """
+    Pipeline that records its round trip as one ``PIPELINE`` command.
+    """
+
+    def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            result = super().execute(raise_on_error)
+        except redis.RedisError:
+            observe_redis("PIPELINE", started, True)
+            raise
+        observe_redis("PIPELINE", started, False)
+        return result
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client that records the latency and failures of every command it sends.
+    """
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result = super().execute_command(*args, **options)
+        except redis.RedisError:
+            observe_redis(args[0], started, True)
+            raise
+        observe_redis(args[0], started, False)
+        return result
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedAsyncPipeline(redis.asyncio.client.Pipeline):
+    """
+    Asyncio pipeline that records its round trip as one ``PIPELINE`` command.
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            result = await super().execute(raise_on_error)
+        except redis.RedisError:
+            observe_redis("PIPELINE", started, True)
+            raise
+        observe_redis("PIPELINE", started, False)
+        return result
+
+
+class InstrumentedAsyncRedis(redis.asyncio.Redis):
+    """
+    Asyncio Redis client that records the latency and failures of every command it sends.
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result = await super().execute_command(*args, **options)
+        except redis.RedisError:
+            observe_redis(args[0], started, True)
+            raise
+        observe_redis(args[0], started, False)
+        return result
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedAsyncPipeline:
+        return InstrumentedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def create_redis_client(url: str) -> redis.Redis:
+    """
+    Creates a Redis client suited to caching in the request path.
+
+    Calls fail within ``settings.redis_timeout`` and are retried once without backoff, so an unavailable
+    Redis costs a request milliseconds rather than the client's default multi-second retry schedule.
+
+    :param url: The Redis URL.
+    :type url: str
+    :return: The client.
+    :rtype: redis.Redis
+    """
+    return InstrumentedRedis.from_url(
+        url,
+        socket_timeout=settings.redis_timeout,
+        socket_connect_timeout=settings.redis_timeout,
+        retry=Retry(NoBackoff(), 1),
+    )
+
+
+def create_async_redis_client(url: str) -> redis.asyncio.Redis:
+    """
+    Creates an asyncio Redis client with the same fail-fast settings as :func:`create_redis_client`.
+
+    :param url: The Redis URL.
+    :type url: str
+    :return: The client.
+    :rtype: redis.asyncio.Redis
+    """
+    return InstrumentedAsyncRedis.from_url(
+        url,
+        socket_timeout=settings.redis_timeout,
+        socket_connect_timeout=settings.redis_timeout,
+        retry=AsyncRetry(NoBackoff(), 1),
+    )
+
+
+redis_client = create_redis_client(settings.redis_url)
+async_redis_client = create_async_redis_client(settings.redis_url)
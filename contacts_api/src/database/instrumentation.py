@@ -0,0 +1,179 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """
+    The SQL executed on behalf of one request.
+
+    :param statements: The number of statements executed.
+    :type statements: int
+    :param rows: The rows the driver reported: affected rows, plus returned rows on drivers that buffer
+        results, such as psycopg2.
+    :type rows: int
+    :param duration: Seconds spent executing the statements.
+    :type duration: float
+    :param sql: The statements themselves, only kept when capturing.
+    :type sql: List[str], optional
+    """
+    statements: int = 0
+    rows: int = 0
+    duration: float = 0.0
+    sql: Optional[List[str]] = field(default=None, repr=False)
+
+    def record(self, statement: str, rows: int, duration: float):
+        self.statements += 1
+        self.rows += max(rows, 0)
+        self.duration += duration
+        if self.sql is not None:
+            self.sql.append(statement)
+
+    def server_timing(self) -> str:
+        """
+        Formats the statistics as a ``Server-Timing`` metric.
+
+        :return: The header value.
+        :rtype: str
+        """
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.statements} queries, {self.rows} rows"'
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, cursor.rowcount, time.perf_counter() - started)
+
+
+def instrument_engines():
+    """
+    Counts the statements of every engine, including async engines and those created later, into the
+    statistics of the current request.
+
+    Outside a request the listeners only read a context variable.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """
+    Returns the statistics of the request being handled.
+
+    Worker threads started with ``run_in_threadpool`` share the request's statistics, since they run in a
+    copy of its context.
+
+    :return: The statistics, or None outside a tracked request.
+    :rtype: Optional[QueryStats]
+    """
+    return _current.get()
+
+
+@contextmanager
+def track_queries(capture: bool = False) -> Iterator[QueryStats]:
+    """
+    Collects the statements executed in the current context.
+
+    :param capture: Whether to keep the SQL of each statement.
+    :type capture: bool
+    :return: The statistics, filled in as statements run.
+    :rtype: Iterator[QueryStats]
+    """
+    stats = QueryStats(sql=[] if capture else None)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Fails if the block executes more than ``limit`` statements on any engine.
+
+    Unlike :func:`track_queries` it counts statements from every thread and event loop, so requests made
+    through a ``TestClient`` are included. Blocks must not overlap.
+
+    :param limit: The statement budget.
+    :type limit: int
+    :return: The statistics of the block.
+    :rtype: Iterator[QueryStats]
+    :raises AssertionError: If the block exceeds the budget; the message lists the statements.
+    """
+    stats = QueryStats(sql=[])
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        stats.record(statement, cursor.rowcount, 0.0)
+
+    event.listen(Engine, "after_cursor_execute", count)
+    try:
+        yield stats
+    finally:
+        event.remove(Engine, "after_cursor_execute", count)
+    if stats.statements > limit:
+        raise AssertionError(f"{stats.statements} statements executed, the budget is {limit}:\n"
+                             + "\n".join(f"  {sql}" for sql in stats.sql))
+
+
+class QueryStatsMiddleware:
+    """
+    Tracks the SQL of each HTTP request, reports it in a ``Server-Timing`` header and logs it.
+
+    The header covers the statements executed before the response started; the log line, written when the
+    request finishes, also covers streamed bodies and background tasks. Requests above ``warn_statements``
+    statements are logged as warnings, since they usually mean a query runs once per row.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    :param warn_statements: The statement count above which a request is logged as a warning.
+    :type warn_statements: int
+    """
+
+    def __init__(self, app: ASGIApp, warn_statements: int):
+        self.app = app
+        self.warn_statements = warn_statements
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                level = logging.WARNING if stats.statements > self.warn_statements else logging.DEBUG
+                if logger.isEnabledFor(level):
+                    logger.log(level, "%s %s %s: %d queries, %d rows, %.2f ms in the database",
+                               scope["method"], scope["path"], status_code, stats.statements, stats.rows,
+                               stats.duration * 1000)
@@ -1,12 +1,37 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, func
+from datetime import datetime
+
+from sqlalchemy import Column, Computed, DDL, Integer, JSON, SmallInteger, String, ForeignKey, Date, Index, event, func
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy import Boolean
 
 Base = declarative_base()
 
 
+class month_day(FunctionElement):
+    """
+    SQL expression for the month and day of a date encoded as ``month * 100 + day`` (e.g. 1231 for Dec 31).
+    """
+    type = SmallInteger()
+    name = "month_day"
+    inherit_cache = True
+
+
+@compiles(month_day)
+def _compile_month_day(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    return f"CAST(EXTRACT(MONTH FROM {value}) * 100 + EXTRACT(DAY FROM {value}) AS SMALLINT)"
+
+
+@compiles(month_day, "sqlite")
+def _compile_month_day_sqlite(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    return f"CAST(strftime('%m%d', {value}) AS INTEGER)"
+
+
 class Contact(Base):
     """
     Represents a contact entry in the database.
@@ -15,24 +40,66 @@ class Contact(Base):
         id (int): The primary key for the contact.
         first_name (str): The first name of the contact.
         last_name (str): The last name of the contact.
-        email (str): The email address of the contact, must be unique.
+        email (str): The email address of the contact, unique among the owner's contacts.
         phone_number (str): The phone number of the contact.
         birthday (date, optional): The birthday of the contact.
+        birth_md (int, optional): Generated from ``birthday`` as ``month * 100 + day``, for upcoming-birthday lookups.
         additional_info (str, optional): Any additional information about the contact.
         user_id (int): Foreign key referencing the User associated with this contact.
+        version (int): Incremented on every update of the row; used for the contact's ETag.
         user (User): Relationship to the User model, linking contacts to a specific user.
     """
     __tablename__ = "contacts"
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, index=True)
     last_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
+    email = Column(String)
     phone_number = Column(String)
     birthday = Column(Date, nullable=True)
+    birth_md = Column(SmallInteger, Computed(month_day(birthday), persisted=True), nullable=True)
     additional_info = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey('users.id'))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     user = relationship("User", back_populates="contacts")
 
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("uq_contacts_user_id_email", "user_id", "email", unique=True),
+        Index("ix_contacts_user_id_birth_md", "user_id", "birth_md"),
+        Index("ix_contacts_first_name_trgm", "first_name", postgresql_using="gin",
+              postgresql_ops={"first_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_last_name_trgm", "last_name", postgresql_using="gin",
+              postgresql_ops={"last_name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_contacts_email_trgm", "email", postgresql_using="gin",
+              postgresql_ops={"email": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+
+CONTACTS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+)
+
+# SQLite keeps an FTS5 index of the searchable contact columns, synced by triggers.
+for _statement in CONTACTS_FTS_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "before_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
+# PostgreSQL needs pg_trgm before the trigram GIN indexes can be created.
+event.listen(Contact.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
 
 class User(Base):
     """
@@ -46,7 +113,9 @@ class User(Base):
         password (str): The hashed password for the user, must not be nullable.
         created_at (datetime): The timestamp when the user was created, defaults to current time.
         avatar_url (str, optional): URL to the user's avatar image.
-        refresh_token (str, optional): The refresh token associated with the user.
+        avatar_hash (str, optional): SHA-256 of the uploaded avatar whose variants are stored locally.
+        refresh_token (str, optional): No longer written; refresh sessions are kept by ``RefreshSession``.
+        contacts_version (int): Incremented whenever one of the user's contacts is created, changed or deleted.
         contacts (list[Contact]): Relationship to the Contact model, linking users to their contacts.
     """
     __tablename__ = "users"
@@ -57,5 +126,70 @@ class User(Base):
     password = Column(String(255), nullable=False)
     created_at = Column('created_at', DateTime, default=func.now())
     avatar_url = Column(String, nullable=True)
+    avatar_hash = Column(String(64), nullable=True)
     refresh_token = Column(String(255), nullable=True)
+    contacts_version = Column(Integer, nullable=False, default=0, server_default="0")
     contacts = relationship("Contact", back_populates="user")
+
+
+class OutboxMessage(Base):
+    """
+    A side effect, such as an email, recorded in the same transaction as the change that caused it.
+
+    The dispatcher process claims due rows, performs them and records the outcome, so web workers never
+    talk to external services.
+
+    Attributes:
+        id (int): The primary key for the message.
+        kind (str): What to do with the payload, e.g. ``"email"``.
+        payload (dict): The arguments of the side effect, emptied once the message is sent.
+        status (str): ``"pending"``, ``"sent"`` or ``"failed"``.
+        attempts (int): The number of delivery attempts made so far.
+        available_at (datetime): When the message is next due, in UTC. Claiming pushes it forward by a lease,
+            so a message claimed by a dispatcher that dies becomes due again.
+        created_at (datetime): When the message was recorded, in UTC.
+        sent_at (datetime, optional): When the message was delivered, in UTC.
+        last_error (str, optional): The error of the last failed attempt.
+    """
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_status_available_at", "status", "available_at"),
+    )
+
+
+class RefreshSession(Base):
+    """
+    The database copy of a refresh token family, used when Redis is not the session store.
+
+    A family starts at login on one device and follows every rotation of its refresh token; only the
+    newest token ID is accepted, so presenting an older one reveals a stolen token and revokes the family.
+
+    Attributes:
+        family (str): The random ID of the token family, carried in the ``fam`` claim.
+        user_id (int): The ID of the user the session belongs to.
+        jti (str): The ID of the only refresh token of the family that may still be used.
+        device (str, optional): The client that logged in, taken from its ``User-Agent``.
+        created_at (datetime): When the session was opened, in UTC.
+        last_used_at (datetime): When the session was last refreshed, in UTC.
+        expires_at (datetime): When the current refresh token expires, in UTC.
+        revoked_at (datetime, optional): When the session was logged out or revoked after reuse, in UTC.
+    """
+    __tablename__ = "refresh_sessions"
+    family = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    jti = Column(String(32), nullable=False)
+    device = Column(String(255), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from src.services.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS
+
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolStats:
+    """
+    Checkout wait-time histogram and timeout counter for one connection pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)}
+            buckets["le_inf"] = self.wait_buckets[-1]
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "wait_ms": {
+                    "avg": self.wait_total_ms / self.checkouts if self.checkouts else 0.0,
+                    "max": self.wait_max_ms,
+                    "buckets": buckets,
+                },
+            }
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times how long each checkout waits for a free connection and counts checkout timeouts.
+
+    Both are also exported as metrics labelled with ``engine_label``.
+    """
+    engine_label = "sync"
+
+    @property
+    def stats(self) -> PoolStats:
+        stats = self.__dict__.get("_stats")
+        if stats is None:
+            stats = self.__dict__.setdefault("_stats", PoolStats())
+        return stats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            DB_POOL_TIMEOUTS.labels(self.engine_label).inc()
+            raise
+        waited = time.perf_counter() - started
+        self.stats.record_wait(waited * 1000)
+        DB_POOL_WAIT_SECONDS.labels(self.engine_label).observe(waited)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """
+    ``QueuePool`` that records checkout wait times.
+    """
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """
+    ``AsyncAdaptedQueuePool`` that records checkout wait times.
+    """
+    engine_label = "async"
+
+
+def pool_status(pool) -> dict:
+    """
+    Describes the current state of a connection pool in this worker process.
+
+    :param pool: The pool of an engine.
+    :type pool: sqlalchemy.pool.Pool
+    :return: Configured size, checked-out and overflow connections, plus wait statistics when available.
+    :rtype: dict
+    """
+    status = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _InstrumentedPoolMixin):
+        status.update(pool.stats.snapshot())
+    return status
@@ -0,0 +1,446 @@
+from datetime import date
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from src.database.models import Contact, OutboxMessage, User
+from src.repository.repository import (
+    CONTACTS_VERSIONS_INFO_KEY,
+    MAX_PAGE_SIZE,
+    bulk_delete_statement,
+    bulk_update_statements,
+    contact_changes,
+    contact_create_statement,
+    contact_update_statement,
+    contact_values,
+    contacts_insert_statement,
+    contacts_version_bump_statement,
+    decode_cursor,
+    encode_cursor,
+    finish_bulk_results,
+    owned_contact_ids_statement,
+    plan_bulk_operations,
+    upcoming_birthday_window,
+)
+from src.repository.projection import CONTACT_RESPONSE_COLUMNS
+from src.repository.search import DEFAULT_SEARCH_LIMIT, contact_search_statement
+from src.schemas import ContactCreate
+
+
+async def run_repository(sync_fn: Callable, async_fn: Callable, db, **kwargs) -> Any:
+    """
+    Calls the repository function matching the type of the session.
+
+    Async sessions are awaited on the event loop; sync sessions run in the threadpool so async routes
+    never block on a sync driver. Arguments are passed by keyword because the position of ``db`` differs
+    between repository functions.
+
+    :param sync_fn: The function from :mod:`src.repository.repository`.
+    :type sync_fn: Callable
+    :param async_fn: The equivalent function from this module.
+    :type async_fn: Callable
+    :param db: The database session, sync or async.
+    :type db: Session | AsyncSession
+    :param kwargs: The remaining keyword arguments of the repository function.
+    :return: Whatever the repository function returns.
+    :rtype: Any
+    """
+    if isinstance(db, AsyncSession):
+        return await async_fn(db=db, **kwargs)
+    return await run_in_threadpool(sync_fn, db=db, **kwargs)
+
+
+async def create_contact(contact_data: ContactCreate, db: AsyncSession, current_user: User) -> Contact:
+    """
+    Creates a new contact for a user.
+
+    :param contact_data: Data required to create a new contact.
+    :type contact_data: ContactCreate
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user who owns the new contact.
+    :type current_user: User
+    :return: The newly created contact.
+    :rtype: Contact
+    :raises HTTPException: If the user already has a contact with the same email or if there is a failure in creating the contact.
+
+    """
+    statement = contact_create_statement(db.bind.dialect.name, contact_values(contact_data, current_user.id))
+    try:
+        new_contact = (await db.scalars(statement)).first()
+        if new_contact is None:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+        await bump_contacts_version(db, current_user.id)
+        await db.commit()
+    except HTTPException:
+        raise
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to create contact.")
+    return new_contact
+
+
+async def get_contacts(db: AsyncSession, current_user: User, skip: int = 0, limit: int = 100) -> List[Row]:
+    """
+    Retrieves a list of contacts for the current user.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user whose contacts are to be retrieved.
+    :type current_user: User
+    :param skip: The number of records to skip (pagination).
+    :type skip: int, optional
+    :param limit: The maximum number of records to return.
+    :type limit: int, optional
+    :return: A list of contact rows for the current user.
+    :rtype: List[Row]
+
+    """
+    result = await db.execute(
+        select(*CONTACT_RESPONSE_COLUMNS).where(Contact.user_id == current_user.id).offset(skip).limit(limit)
+    )
+    return list(result.all())
+
+
+async def get_contacts_page(db: AsyncSession, current_user: User, after: str = "",
+                            limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+    """
+    Retrieves one page of the current user's contacts using keyset pagination.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user whose contacts are to be retrieved.
+    :type current_user: User
+    :param after: The cursor returned with the previous page, or an empty string for the first page.
+    :type after: str, optional
+    :param limit: The maximum number of records to return, capped at ``MAX_PAGE_SIZE``.
+    :type limit: int, optional
+    :return: The contact rows on the page, ending with their ``id``, and the cursor for the next page, or
+        None on the last page.
+    :rtype: Tuple[List[Row], Optional[str]]
+
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = select(*CONTACT_RESPONSE_COLUMNS, Contact.id).where(Contact.user_id == current_user.id)
+    after_id = decode_cursor(after)
+    if after_id is not None:
+        query = query.where(Contact.id > after_id)
+    contacts = list((await db.execute(query.order_by(Contact.id).limit(limit + 1))).all())
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        return contacts, encode_cursor(contacts[-1].id)
+    return contacts, None
+
+
+async def get_contact(db: AsyncSession, contact_id: int, current_user: User) -> Optional[Contact]:
+    """
+    Retrieves a specific contact by ID for the current user.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param contact_id: The ID of the contact to retrieve.
+    :type contact_id: int
+    :param current_user: The user whose contact is to be retrieved.
+    :type current_user: User
+    :return: The contact if found, otherwise None.
+    :rtype: Optional[Contact]
+
+    """
+    return await db.scalar(
+        select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id).limit(1)
+    )
+
+
+async def update_contact(db: AsyncSession, contact_id: int, contact_data: dict,
+                         current_user: User) -> Optional[Contact]:
+    """
+    Updates the given fields of an existing contact.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param contact_data: The fields to change; fields left out are kept.
+    :type contact_data: dict
+    :param current_user: The user whose contact is to be updated.
+    :type current_user: User
+    :return: The updated contact if found, otherwise None.
+    :rtype: Optional[Contact]
+    :raises HTTPException: If the new email is taken by another of the user's contacts or the birthday is invalid.
+
+    """
+    changes = contact_changes(contact_data)
+    if not changes:
+        return await get_contact(db, contact_id, current_user)
+    try:
+        contact = (await db.scalars(contact_update_statement(contact_id, current_user.id, changes))).first()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+    if contact is None:
+        await db.rollback()
+        return await get_contact(db, contact_id, current_user)
+    await bump_contacts_version(db, current_user.id)
+    await db.commit()
+    return contact
+
+
+async def delete_contact(db: AsyncSession, contact_id: int, current_user: User):
+    """
+    Deletes a specific contact by ID for the current user.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param contact_id: The ID of the contact to delete.
+    :type contact_id: int
+    :param current_user: The user whose contact is to be deleted.
+    :type current_user: User
+    :return: The deleted contact if found.
+    :rtype: Contact
+    :raises HTTPException: If the contact is not found or if the user is not authorized to delete the contact.
+
+    """
+    db_contact = await db.get(Contact, contact_id)
+    if not db_contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    if db_contact.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to delete this contact")
+    await db.delete(db_contact)
+    await bump_contacts_version(db, current_user.id)
+    await db.commit()
+    return db_contact
+
+
+async def bulk_mutate_contacts(db: AsyncSession, current_user: User, updates: List[Tuple[int, dict]],
+                               deletes: List[int]) -> List[dict]:
+    """
+    Applies a batch of contact updates and deletions in one transaction.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user whose contacts are changed.
+    :type current_user: User
+    :param updates: Pairs of contact ID and the fields to change.
+    :type updates: List[Tuple[int, dict]]
+    :param deletes: The IDs of contacts to delete.
+    :type deletes: List[int]
+    :return: One result per requested item.
+    :rtype: List[dict]
+    :raises HTTPException: If an update would duplicate an email.
+    """
+    results, changes_by_id, delete_ids = plan_bulk_operations(updates, deletes)
+    updated, deleted = set(), set()
+    try:
+        if changes_by_id:
+            owned = set(await db.scalars(owned_contact_ids_statement(current_user.id, list(changes_by_id))))
+            owned_changes = {contact_id: changes_by_id[contact_id] for contact_id in owned}
+            for statement, params in bulk_update_statements(current_user.id, owned_changes):
+                await db.execute(statement, params)
+            updated = owned
+        if delete_ids:
+            deleted = set(await db.scalars(bulk_delete_statement(current_user.id, delete_ids)))
+        if updated or deleted:
+            await bump_contacts_version(db, current_user.id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+    return finish_bulk_results(results, updated, deleted)
+
+
+async def search_contacts(db: AsyncSession, current_user: User, name: Optional[str] = None,
+                          email: Optional[str] = None, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Row]:
+    """
+    Searches the current user's contacts by name or email, best match first.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user whose contacts are searched.
+    :type current_user: User
+    :param name: The name to search for (first or last).
+    :type name: str, optional
+    :param email: The email to search for.
+    :type email: str, optional
+    :param limit: The maximum number of contacts to return.
+    :type limit: int, optional
+    :return: A list of contact rows that match the search criteria.
+    :rtype: List[Row]
+
+    """
+    query = contact_search_statement(db.bind.dialect.name, current_user.id, name, email, limit)
+    return list((await db.execute(query)).all())
+
+
+async def get_contacts_birthday_soon(db: AsyncSession, current_user: User, days: int = 7,
+                                     today: Optional[date] = None) -> List[Row]:
+    """
+    Retrieves the current user's contacts with birthdays within a specified number of days.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param current_user: The user whose contacts are to be retrieved.
+    :type current_user: User
+    :param days: The number of days within which to search for upcoming birthdays.
+    :type days: int, optional
+    :param today: The first day of the window, defaults to today.
+    :type today: date, optional
+    :return: A list of contact rows with upcoming birthdays, nearest first.
+    :rtype: List[Row]
+
+    """
+    condition, ordering = upcoming_birthday_window(days, today)
+    result = await db.execute(
+        select(*CONTACT_RESPONSE_COLUMNS).where(Contact.user_id == current_user.id, condition).order_by(*ordering)
+    )
+    return list(result.all())
+
+
+async def insert_contacts_batch(db: AsyncSession, rows: List[dict]) -> Set[str]:
+    """
+    Inserts a batch of validated contacts and commits.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param rows: Column values of the contacts to insert, all with the same ``user_id``.
+    :type rows: List[dict]
+    :return: The emails of the contacts that were inserted; conflicting rows are left out.
+    :rtype: Set[str]
+    """
+    if not rows:
+        return set()
+    inserted = set(await db.scalars(contacts_insert_statement(db.bind.dialect.name, rows)))
+    if inserted:
+        await bump_contacts_version(db, rows[0]["user_id"])
+    await db.commit()
+    return inserted
+
+
+async def find_existing_emails(db: AsyncSession, user_id: int, emails: List[str]) -> Set[str]:
+    """
+    Returns which of the given emails already belong to one of a user's contacts.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param emails: The emails to check.
+    :type emails: List[str]
+    :return: The emails that are already taken.
+    :rtype: Set[str]
+    """
+    if not emails:
+        return set()
+    return set(await db.scalars(
+        select(Contact.email).where(Contact.user_id == user_id, Contact.email.in_(emails))
+    ))
+
+
+async def bump_contacts_version(db: AsyncSession, user_id: int) -> Optional[int]:
+    """
+    Increments a user's contact collection version inside the current transaction.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param user_id: The ID of the user whose contacts changed.
+    :type user_id: int
+    :return: The new version, or None if the user does not exist.
+    :rtype: Optional[int]
+    """
+    version = (await db.execute(contacts_version_bump_statement(user_id))).scalar()
+    if version is not None:
+        db.info.setdefault(CONTACTS_VERSIONS_INFO_KEY, {})[user_id] = version
+    return version
+
+
+async def get_contacts_version(db: AsyncSession, user_id: int) -> int:
+    """
+    Reads a user's contact collection version.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The version, or 0 if the user does not exist.
+    :rtype: int
+    """
+    return await db.scalar(select(User.contacts_version).where(User.id == user_id)) or 0
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """
+    Retrieves a user by email address.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param email: The email address of the user.
+    :type email: str
+    :return: The user if found, otherwise None.
+    :rtype: Optional[User]
+
+    """
+    return await db.scalar(select(User).where(User.email == email).limit(1))
+
+
+async def create_user(db: AsyncSession, email: str, hashed_password: str, username: Optional[str] = None,
+                      outbox: Iterable[OutboxMessage] = ()) -> User:
+    """
+    Creates a new user with an already hashed password.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param email: The email address of the user.
+    :type email: str
+    :param hashed_password: The bcrypt hash of the user's password.
+    :type hashed_password: str
+    :param username: The username of the user.
+    :type username: str, optional
+    :param outbox: Messages, such as the verification email, committed in the same transaction as the user.
+    :type outbox: Iterable[OutboxMessage]
+    :return: The newly created user.
+    :rtype: User
+
+    """
+    new_user = User(username=username, email=email, password=hashed_password)
+    db.add(new_user)
+    db.add_all(outbox)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+async def get_user_avatar_hash(db: AsyncSession, user_id: int) -> Optional[str]:
+    """
+    Returns the digest of a user's avatar without loading the user.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The SHA-256 of the avatar, or None if the user has no processed avatar or does not exist.
+    :rtype: Optional[str]
+    """
+    return await db.scalar(select(User.avatar_hash).where(User.id == user_id))
+
+
+async def set_user_avatar(db: AsyncSession, user_id: int, avatar_hash: str, avatar_url: str):
+    """
+    Points a user's avatar at stored variants with a single UPDATE.
+
+    :param db: The async database session.
+    :type db: AsyncSession
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param avatar_hash: The SHA-256 of the uploaded avatar.
+    :type avatar_hash: str
+    :param avatar_url: The URL of the avatar.
+    :type avatar_url: str
+    """
+    await db.execute(update(User).where(User.id == user_id).values(avatar_hash=avatar_hash, avatar_url=avatar_url)
+                     .execution_options(synchronize_session=False))
+    await db.commit()
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Iterator, Sequence
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from src.database.models import Contact
+
+EXPORT_COLUMNS = ("first_name", "last_name", "email", "phone_number", "birthday", "additional_info")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_BATCH_SIZE = 1000
+
+
+def contact_export_statement(user_id: int) -> Select:
+    """
+    Builds the query for a full export of a user's contacts.
+
+    Only the exported columns are selected, in ID order so the ``(user_id, id)`` index serves the scan.
+
+    :param user_id: The ID of the user whose contacts are exported.
+    :type user_id: int
+    :return: The select statement returning one tuple per contact.
+    :rtype: Select
+    """
+    columns = [getattr(Contact, name) for name in EXPORT_COLUMNS]
+    return select(*columns).where(Contact.user_id == user_id).order_by(Contact.id)
+
+
+def _encode_ndjson(rows: Sequence[tuple]) -> bytes:
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record["birthday"] is not None:
+            record["birthday"] = record["birthday"].isoformat()
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _encode_csv(rows: Sequence[tuple], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def iter_export(engine, user_id: int, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Streams a user's contacts from a sync engine as encoded chunks.
+
+    The rows are read through a server-side cursor ``batch_size`` at a time on a connection of its own,
+    so the export neither holds the request session nor keeps more than one batch in memory.
+
+    :param engine: The sync engine to read from.
+    :type engine: sqlalchemy.engine.Engine
+    :param user_id: The ID of the user whose contacts are exported.
+    :type user_id: int
+    :param fmt: The output format, ``ndjson`` or ``csv``.
+    :type fmt: str
+    :param batch_size: The number of rows fetched and encoded at a time.
+    :type batch_size: int, optional
+    :return: The encoded body, one chunk per batch.
+    :rtype: Iterator[bytes]
+    """
+    encode = _encode_ndjson if fmt == "ndjson" else _encode_csv
+    if fmt == "csv":
+        yield _encode_csv([], header=True)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            contact_export_statement(user_id)
+        )
+        for rows in result.partitions():
+            yield encode(rows)
+
+
+async def aiter_export(engine: AsyncEngine, user_id: int, fmt: str,
+                       batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Streams a user's contacts from an async engine as encoded chunks.
+
+    :param engine: The async engine to read from.
+    :type engine: AsyncEngine
+    :param user_id: The ID of the user whose contacts are exported.
+    :type user_id: int
+    :param fmt: The output format, ``ndjson`` or ``csv``.
+    :type fmt: str
+    :param batch_size: The number of rows fetched and encoded at a time.
+    :type batch_size: int, optional
+    :return: The encoded body, one chunk per batch.
+    :rtype: AsyncIterator[bytes]
+    """
+    encode = _encode_ndjson if fmt == "ndjson" else _encode_csv
+    if fmt == "csv":
+        yield _encode_csv([], header=True)
+    async with engine.connect() as conn:
+        result = await conn.stream(contact_export_statement(user_id).execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield encode(rows)
+
+
+def export_contacts(db, user_id: int, fmt: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Returns the export stream matching the type of the session.
+
+    :param db: The request's database session, sync or async; only its engine is used.
+    :type db: Session | AsyncSession
+    :param user_id: The ID of the user whose contacts are exported.
+    :type user_id: int
+    :param fmt: The output format, ``ndjson`` or ``csv``.
+    :type fmt: str
+    :param batch_size: The number of rows fetched and encoded at a time.
+    :type batch_size: int, optional
+    :return: An iterator of encoded chunks suitable for ``StreamingResponse``.
+    :rtype: Iterator[bytes] | AsyncIterator[bytes]
+    """
+    if isinstance(db, AsyncSession):
+        return aiter_export(db.bind, user_id, fmt, batch_size)
+    return iter_export(db.get_bind(), user_id, fmt, batch_size)
@@ -0,0 +1,248 @@
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.repository import async_repository, repository
+from src.repository.async_repository import run_repository
+from src.repository.versions import run_contacts_write
+from src.schemas import ContactCreate, ContactImportError, ContactImportResult
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+MAX_RECORD_LENGTH = 64 * 1024
+
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Decodes a stream of UTF-8 byte chunks into lines without buffering the whole body.
+
+    Only the text a chunk adds is searched for line breaks. A line longer than ``MAX_RECORD_LENGTH`` characters
+    is dropped as it arrives and yielded as None.
+
+    :param chunks: The raw body chunks.
+    :type chunks: AsyncIterator[bytes]
+    :return: The lines of the body, without line terminators, or None for each line that was too long.
+    :rtype: AsyncIterator[Optional[str]]
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    parts: List[str] = []
+    length = 0
+    async for chunk in chunks:
+        *lines, tail = decoder.decode(chunk).split("\n")
+        for line in lines:
+            length += len(line)
+            yield None if length > MAX_RECORD_LENGTH else ("".join(parts) + line).rstrip("\r")
+            parts, length = [], 0
+        length += len(tail)
+        if length <= MAX_RECORD_LENGTH:
+            parts.append(tail)
+        else:
+            parts = []
+    tail = decoder.decode(b"", final=True)
+    length += len(tail)
+    if length > MAX_RECORD_LENGTH:
+        yield None
+    elif length:
+        yield ("".join(parts) + tail).rstrip("\r")
+
+
+async def iter_csv_records(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[Record]:
+    """
+    Parses CSV lines into records keyed by the header row.
+
+    Quoted fields spanning several lines are joined before parsing. A record longer than ``MAX_RECORD_LENGTH``
+    characters is reported as an error without being kept; a line :func:`iter_lines` dropped for its length
+    ends the record it belongs to, since its quotes are unknown.
+
+    :param lines: The lines of the CSV body.
+    :type lines: AsyncIterator[Optional[str]]
+    :return: Tuples of the starting line number, the record and a parse error, one of which is None.
+    :rtype: AsyncIterator[Record]
+    """
+    header = None
+    pending: Optional[List[str]] = None
+    start = line_no = quotes = length = 0
+    async for line in lines:
+        line_no += 1
+        if pending is None:
+            pending, start, quotes, length = [], line_no, 0, 0
+        if line is None:
+            pending = None
+            yield start, None, f"Record is longer than {MAX_RECORD_LENGTH} characters"
+            continue
+        quotes += line.count('"')
+        length += len(line) + 1
+        if length <= MAX_RECORD_LENGTH:
+            pending.append(line)
+        else:
+            pending.clear()
+        if quotes % 2:
+            continue
+        record_lines, pending = pending, None
+        if length > MAX_RECORD_LENGTH:
+            yield start, None, f"Record is longer than {MAX_RECORD_LENGTH} characters"
+            continue
+        text = "\n".join(record_lines)
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield start, None, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield start, dict(zip(header, values)), None
+    if pending is not None:
+        yield start, None, "Unterminated quoted field"
+
+
+async def iter_ndjson_records(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[Record]:
+    """
+    Parses newline-delimited JSON objects.
+
+    :param lines: The lines of the NDJSON body, None for a line that was too long.
+    :type lines: AsyncIterator[Optional[str]]
+    :return: Tuples of the line number, the record and a parse error, one of which is None.
+    :rtype: AsyncIterator[Record]
+    """
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if line is None:
+            yield line_no, None, f"Record is longer than {MAX_RECORD_LENGTH} characters"
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(record, dict):
+            yield line_no, record, None
+        else:
+            yield line_no, None, "Expected a JSON object"
+
+
+def contact_row(record: dict, user_id: int) -> dict:
+    """
+    Validates an imported record and converts it into contact column values.
+
+    :param record: The parsed record.
+    :type record: dict
+    :param user_id: The ID of the user who owns the imported contacts.
+    :type user_id: int
+    :return: Column values for the ``contacts`` table.
+    :rtype: dict
+    :raises ValueError: If the record does not describe a valid contact.
+    """
+    record = {key: (None if value == "" else value) for key, value in record.items()}
+    contact = ContactCreate.model_validate(record)
+    birthday = None
+    if contact.birthday:
+        try:
+            birthday = datetime.strptime(contact.birthday, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError("birthday: Invalid date format. Use YYYY-MM-DD.")
+    return {
+        "first_name": contact.first_name,
+        "last_name": contact.last_name,
+        "email": contact.email,
+        "phone_number": contact.phone_number,
+        "birthday": birthday,
+        "additional_info": contact.additional_info,
+        "user_id": user_id,
+    }
+
+
+def _describe_error(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        location = ".".join(str(part) for part in first["loc"])
+        return f"{location}: {first['msg']}" if location else first["msg"]
+    return str(error)
+
+
+class _ImportReport:
+    def __init__(self, user_id: int, dry_run: bool):
+        self.user_id = user_id
+        self.result = ContactImportResult(dry_run=dry_run)
+
+    def fail(self, line: int, error: str):
+        self.result.failed += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(ContactImportError(line=line, error=error))
+
+
+async def _flush(db, batch: List[Tuple[int, dict]], report: _ImportReport):
+    unique, seen = [], set()
+    for line, row in batch:
+        if row["email"] in seen:
+            report.fail(line, "Duplicate email in this import")
+        else:
+            seen.add(row["email"])
+            unique.append((line, row))
+    rows = [row for _, row in unique]
+    if report.result.dry_run:
+        existing = await run_repository(repository.find_existing_emails, async_repository.find_existing_emails, db,
+                                        user_id=report.user_id, emails=[row["email"] for row in rows])
+        accepted = {row["email"] for row in rows} - existing
+    else:
+        accepted = await run_contacts_write(repository.insert_contacts_batch, async_repository.insert_contacts_batch,
+                                            db, rows=rows)
+    for line, row in unique:
+        if row["email"] in accepted:
+            report.result.inserted += 1
+        else:
+            report.fail(line, "Contact with this email already exists.")
+
+
+async def import_contacts(chunks: AsyncIterator[bytes], fmt: str, db, user_id: int, dry_run: bool = False,
+                          batch_size: int = IMPORT_BATCH_SIZE) -> ContactImportResult:
+    """
+    Streams contacts from a CSV or NDJSON body into the database in batches.
+
+    Rows are parsed and validated one at a time and written ``batch_size`` at a time, each batch as a single
+    INSERT committed on its own, so memory use does not depend on the size of the upload. In dry-run mode
+    rows are validated and checked against existing emails, but nothing is written.
+
+    :param chunks: The raw body chunks.
+    :type chunks: AsyncIterator[bytes]
+    :param fmt: The body format, ``csv`` or ``ndjson``.
+    :type fmt: str
+    :param db: The database session, sync or async.
+    :type db: Session | AsyncSession
+    :param user_id: The ID of the user who owns the imported contacts.
+    :type user_id: int
+    :param dry_run: Whether to only validate the rows.
+    :type dry_run: bool, optional
+    :param batch_size: The number of rows written per INSERT.
+    :type batch_size: int, optional
+    :return: Counts of processed, inserted and failed rows and the first per-row errors.
+    :rtype: ContactImportResult
+    """
+    parse = iter_csv_records if fmt == "csv" else iter_ndjson_records
+    report = _ImportReport(user_id, dry_run)
+    batch: List[Tuple[int, dict]] = []
+    async for line, record, error in parse(iter_lines(chunks)):
+        report.result.processed += 1
+        if error is None:
+            try:
+                batch.append((line, contact_row(record, user_id)))
+            except ValueError as e:
+                error = _describe_error(e)
+        if error is not None:
+            report.fail(line, error)
+        if len(batch) >= batch_size:
+            await _flush(db, batch, report)
+            batch = []
+    if batch:
+        await _flush(db, batch, report)
+    return report.result
@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Row, and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from src.database.models import OutboxMessage
+
+
+def email_message(template: str, recipient: str, **context) -> OutboxMessage:
+    """
+    Builds an outbox row that makes the dispatcher send a templated email.
+
+    :param template: The name of a template in :data:`src.services.mail.MAIL_TEMPLATES`.
+    :type template: str
+    :param recipient: The recipient address.
+    :type recipient: str
+    :param context: The template variables; they must be JSON serializable.
+    :return: The pending outbox row, not yet added to a session.
+    :rtype: OutboxMessage
+    """
+    return OutboxMessage(kind="email", payload={"template": template, "recipient": recipient, "context": context})
+
+
+def queue_messages(db: Session, messages: Iterable[OutboxMessage]):
+    """
+    Records outbox messages in their own transaction.
+
+    Use this only when nothing else has to be committed with them; otherwise add the messages to the session
+    that writes the change, so both are committed or neither is.
+
+    :param db: The database session.
+    :type db: Session
+    :param messages: The messages to record.
+    :type messages: Iterable[OutboxMessage]
+    """
+    db.add_all(messages)
+    db.commit()
+
+
+def claim_outbox_batch(db: Session, limit: int, lease: float, now: Optional[datetime] = None) -> List[Row]:
+    """
+    Claims up to ``limit`` due messages for this dispatcher and commits the claim.
+
+    The due rows are locked with ``FOR UPDATE SKIP LOCKED``, so concurrent dispatchers claim disjoint
+    batches without waiting on each other. Claiming counts an attempt and pushes ``available_at`` forward by
+    ``lease`` seconds; if the dispatcher dies before recording the outcome, the messages become due again.
+
+    :param db: The database session.
+    :type db: Session
+    :param limit: The maximum number of messages to claim.
+    :type limit: int
+    :param lease: Seconds the dispatcher has to deliver the batch before it may be claimed again.
+    :type lease: float
+    :param now: The current UTC time.
+    :type now: datetime, optional
+    :return: ``(id, kind, payload, attempts)`` rows of the claimed messages.
+    :rtype: List[Row]
+    """
+    now = now or datetime.utcnow()
+    due = (
+        select(OutboxMessage.id)
+        .where(OutboxMessage.status == "pending", OutboxMessage.available_at <= now)
+        .order_by(OutboxMessage.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(due.scalar_subquery()))
+        .values(available_at=now + timedelta(seconds=lease), attempts=OutboxMessage.attempts + 1)
+        .returning(OutboxMessage.id, OutboxMessage.kind, OutboxMessage.payload, OutboxMessage.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return rows
+
+
+def mark_sent(db: Session, message_ids: List[int], now: Optional[datetime] = None):
+    """
+    Records delivered messages and empties their payloads, which may carry tokens. The caller commits.
+
+    :param db: The database session.
+    :type db: Session
+    :param message_ids: The IDs of the delivered messages.
+    :type message_ids: List[int]
+    :param now: The current UTC time.
+    :type now: datetime, optional
+    """
+    if message_ids:
+        db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(message_ids))
+            .values(status="sent", sent_at=now or datetime.utcnow(), payload={}, last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def mark_failed(db: Session, message_id: int, error: str, retry_at: Optional[datetime] = None):
+    """
+    Records a failed attempt. The caller commits.
+
+    :param db: The database session.
+    :type db: Session
+    :param message_id: The ID of the message.
+    :type message_id: int
+    :param error: A description of the error.
+    :type error: str
+    :param retry_at: When to try again, in UTC; None gives the message up.
+    :type retry_at: datetime, optional
+    """
+    values = {"last_error": error[:1000]}
+    if retry_at is None:
+        values["status"] = "failed"
+    else:
+        values["available_at"] = retry_at
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id == message_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def purge_outbox(db: Session, before: datetime, limit: int = 1000) -> int:
+    """
+    Deletes sent messages delivered before ``before`` and failed messages given up before it.
+
+    Rows are deleted ``limit`` at a time, each batch in its own transaction, so the purge never holds many
+    locks at once.
+
+    :param db: The database session.
+    :type db: Session
+    :param before: The UTC time before which finished messages are deleted.
+    :type before: datetime
+    :param limit: The number of rows deleted per transaction.
+    :type limit: int
+    :return: The number of deleted messages.
+    :rtype: int
+    """
+    finished = or_(
+        and_(OutboxMessage.status == "sent", OutboxMessage.sent_at < before),
+        and_(OutboxMessage.status == "failed", OutboxMessage.available_at < before),
+    )
+    deleted = 0
+    while True:
+        batch = select(OutboxMessage.id).where(finished).limit(limit)
+        count = db.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.id.in_(batch.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        deleted += count
+        if count < limit:
+            return deleted
+
+
+def outbox_status(db: Session, now: Optional[datetime] = None) -> dict:
+    """
+    Counts pending outbox messages and measures the dispatch lag.
+
+    Only pending messages are counted; they are found through the status index, so the cost does not grow
+    with the delivered history.
+
+    :param db: The database session.
+    :type db: Session
+    :param now: The current UTC time.
+    :type now: datetime, optional
+    :return: The number of pending messages, how many of them are due, and the age, in seconds, of the
+        oldest due one.
+    :rtype: dict
+    """
+    now = now or datetime.utcnow()
+    pending, due, oldest = db.execute(
+        select(
+            func.count(),
+            func.count().filter(OutboxMessage.available_at <= now),
+            func.min(OutboxMessage.created_at).filter(OutboxMessage.available_at <= now),
+        ).where(OutboxMessage.status == "pending")
+    ).one()
+    return {
+        "pending": pending,
+        "due": due,
+        "oldest_due_age_s": (now - oldest).total_seconds() if oldest else 0.0,
+    }
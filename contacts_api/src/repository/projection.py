@@ -0,0 +1,28 @@
+from typing import Iterable, List
+
+from src.database.models import Contact
+
+CONTACT_RESPONSE_COLUMNS = (
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone_number,
+    Contact.birthday,
+    Contact.additional_info,
+)
+CONTACT_RESPONSE_FIELDS = tuple(column.key for column in CONTACT_RESPONSE_COLUMNS)
+
+
+def contact_records(rows: Iterable[tuple]) -> List[dict]:
+    """
+    Turns rows selected with ``CONTACT_RESPONSE_COLUMNS`` into ``ContactResponse``-shaped dicts.
+
+    The rows come straight from the database, so they are not validated again. Columns selected after
+    the response columns, such as the ID used for cursors, are dropped.
+
+    :param rows: Rows whose leading columns are ``CONTACT_RESPONSE_COLUMNS``.
+    :type rows: Iterable[tuple]
+    :return: One dict per row; ``birthday`` stays a ``date`` for the JSON encoder.
+    :rtype: List[dict]
+    """
+    return [dict(zip(CONTACT_RESPONSE_FIELDS, row)) for row in rows]
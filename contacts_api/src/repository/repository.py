@@ -1,61 +1,116 @@
-from typing import Optional, List
+from typing import Iterable, Optional, List, Set, Tuple
 from datetime import datetime, timedelta, date
+import base64
+import binascii
+import json
+from collections import Counter
 from fastapi import HTTPException
+from sqlalchemy import bindparam, case, delete, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from src.schemas import ContactCreate
-from src.database.models import Contact, User
+from src.database.models import Contact, OutboxMessage, User
+from src.repository.projection import CONTACT_RESPONSE_COLUMNS
+from src.repository.search import DEFAULT_SEARCH_LIMIT, contact_search_statement
 
+MAX_PAGE_SIZE = 500
+CONTACTS_VERSIONS_INFO_KEY = "contacts_versions"
 
-def create_contact(contact_data: ContactCreate, db: Session) -> Contact:
+
+def contact_values(contact_data: ContactCreate, user_id: int) -> dict:
     """
-    Creates a new contact entry in the database.
+    Converts validated contact data into column values.
 
     :param contact_data: Data required to create a new contact.
     :type contact_data: ContactCreate
-    :param db: The database session.
-    :type db: Session
-    :return: The newly created contact.
-    :rtype: Contact
-    :raises HTTPException: If a contact with the same email already exists or if there is a failure in creating the contact.
+    :param user_id: The ID of the user who owns the contact.
+    :type user_id: int
+    :return: Column values for the ``contacts`` table.
+    :rtype: dict
+    :raises HTTPException: If the birthday is not a valid YYYY-MM-DD date.
 
     """
-    existing_contact = db.query(Contact).filter(Contact.email == contact_data.email).first()
-    if existing_contact:
-        raise HTTPException(status_code=400, detail="Contact with this email already exists.")
-
     birthday = None
     if contact_data.birthday:
         try:
             birthday = datetime.strptime(contact_data.birthday, '%Y-%m-%d').date()
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+    return {
+        "first_name": contact_data.first_name,
+        "last_name": contact_data.last_name,
+        "email": contact_data.email,
+        "phone_number": contact_data.phone_number,
+        "birthday": birthday,
+        "additional_info": contact_data.additional_info,
+        "user_id": user_id,
+    }
+
+
+def contact_create_statement(dialect_name: str, values: dict):
+    """
+    Builds the single statement that creates a contact unless the owner already has one with that email.
 
-    new_contact = Contact(
-        first_name=contact_data.first_name,
-        last_name=contact_data.last_name,
-        email=contact_data.email,
-        phone_number=contact_data.phone_number,
-        birthday=birthday,
-        additional_info=contact_data.additional_info
-    )
+    On PostgreSQL and SQLite it is ``INSERT ... ON CONFLICT (user_id, email) DO NOTHING RETURNING *``, so the
+    duplicate check, the insert and reading back generated columns happen in one round trip.
+
+    :param dialect_name: The name of the SQLAlchemy dialect.
+    :type dialect_name: str
+    :param values: Column values of the new contact.
+    :type values: dict
+    :return: The insert statement returning the new ``Contact``, or no row on conflict.
+    :rtype: sqlalchemy.sql.dml.Insert
+    """
+    if dialect_name == "postgresql":
+        statement = postgresql.insert(Contact).values(values).on_conflict_do_nothing(
+            index_elements=[Contact.user_id, Contact.email])
+    elif dialect_name == "sqlite":
+        statement = sqlite.insert(Contact).values(values).on_conflict_do_nothing(
+            index_elements=[Contact.user_id, Contact.email])
+    else:
+        statement = insert(Contact).values(values)
+    return statement.returning(Contact)
+
+
+def create_contact(contact_data: ContactCreate, db: Session, current_user: User) -> Contact:
+    """
+    Creates a new contact for a user.
 
+    :param contact_data: Data required to create a new contact.
+    :type contact_data: ContactCreate
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user who owns the new contact.
+    :type current_user: User
+    :return: The newly created contact.
+    :rtype: Contact
+    :raises HTTPException: If the user already has a contact with the same email or if there is a failure in creating the contact.
+
+    """
+    statement = contact_create_statement(db.get_bind().dialect.name, contact_values(contact_data, current_user.id))
     try:
-        db.add(new_contact)
+        new_contact = db.scalars(statement).first()
+        if new_contact is None:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+        bump_contacts_version(db, current_user.id)
         db.commit()
-        db.refresh(new_contact)
-    except Exception as e:
+    except HTTPException:
+        raise
+    except Exception:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create contact.")
-    if new_contact.birthday:
-        new_contact.birthday = new_contact.birthday.strftime('%Y-%m-%d')
-
     return new_contact
 
 
-def get_contacts(db: Session, current_user: User, skip: int = 0, limit: int = 100) -> List[Contact]:
+def get_contacts(db: Session, current_user: User, skip: int = 0, limit: int = 100) -> List[Row]:
     """
     Retrieves a list of contacts for the current user.
 
+    Only the response columns are selected, so no ORM entities are built for read-only listings.
+
     :param db: The database session.
     :type db: Session
     :param current_user: The user whose contacts are to be retrieved.
@@ -64,14 +119,87 @@ def get_contacts(db: Session, current_user: User, skip: int = 0, limit: int = 10
     :type skip: int, optional
     :param limit: The maximum number of records to return.
     :type limit: int, optional
-    :return: A list of contacts for the current user.
-    :rtype: List[Contact]
+    :return: A list of contact rows for the current user.
+    :rtype: List[Row]
 
     """
-    contacts = db.query(Contact).filter(Contact.user_id == current_user.id).offset(skip).limit(limit).all()
+    contacts = (
+        db.query(*CONTACT_RESPONSE_COLUMNS)
+        .filter(Contact.user_id == current_user.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     return contacts
 
 
+def encode_cursor(contact_id: int) -> str:
+    """
+    Encodes the position after a contact into an opaque pagination cursor.
+
+    :param contact_id: The ID of the last contact on the page.
+    :type contact_id: int
+    :return: The cursor string.
+    :rtype: str
+
+    """
+    raw = json.dumps({"id": contact_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """
+    Decodes a pagination cursor produced by :func:`encode_cursor`.
+
+    :param cursor: The cursor string; an empty string starts from the first page.
+    :type cursor: str
+    :return: The ID of the contact to continue after, or None for the first page.
+    :rtype: Optional[int]
+    :raises HTTPException: If the cursor is malformed.
+
+    """
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(payload["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def get_contacts_page(db: Session, current_user: User, after: str = "",
+                      limit: int = 100) -> Tuple[List[Row], Optional[str]]:
+    """
+    Retrieves one page of the current user's contacts using keyset pagination.
+
+    Pages are ordered by ``(user_id, id)`` and served from the matching index, so every page costs the same
+    no matter how deep it is, and rows inserted meanwhile never shift page contents.
+
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user whose contacts are to be retrieved.
+    :type current_user: User
+    :param after: The cursor returned with the previous page, or an empty string for the first page.
+    :type after: str, optional
+    :param limit: The maximum number of records to return, capped at ``MAX_PAGE_SIZE``.
+    :type limit: int, optional
+    :return: The contact rows on the page, ending with their ``id``, and the cursor for the next page, or
+        None on the last page.
+    :rtype: Tuple[List[Row], Optional[str]]
+
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = db.query(*CONTACT_RESPONSE_COLUMNS, Contact.id).filter(Contact.user_id == current_user.id)
+    after_id = decode_cursor(after)
+    if after_id is not None:
+        query = query.filter(Contact.id > after_id)
+    contacts = query.order_by(Contact.id).limit(limit + 1).all()
+    if len(contacts) > limit:
+        contacts = contacts[:limit]
+        return contacts, encode_cursor(contacts[-1].id)
+    return contacts, None
+
+
 def get_contact(db: Session, contact_id: int, current_user: User) -> Optional[Contact]:
     """
     Retrieves a specific contact by ID for the current user.
@@ -90,28 +218,81 @@ def get_contact(db: Session, contact_id: int, current_user: User) -> Optional[Co
     return contact
 
 
+def contact_changes(contact_data: dict) -> dict:
+    """
+    Converts the fields of an update request into column values.
+
+    :param contact_data: The fields to change.
+    :type contact_data: dict
+    :return: Column values to write.
+    :rtype: dict
+    :raises HTTPException: If the birthday is not a valid YYYY-MM-DD date.
+
+    """
+    changes = dict(contact_data)
+    if changes.get("birthday"):
+        try:
+            changes["birthday"] = datetime.strptime(changes["birthday"], '%Y-%m-%d').date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+    return changes
+
+
+def contact_update_statement(contact_id: int, user_id: int, changes: dict):
+    """
+    Builds the owner-scoped UPDATE that writes only when a value actually differs.
+
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param user_id: The ID of the owner.
+    :type user_id: int
+    :param changes: Column values to write.
+    :type changes: dict
+    :return: The update statement returning the updated ``Contact``, or no row if nothing was written.
+    :rtype: sqlalchemy.sql.dml.Update
+    """
+    differs = or_(*(getattr(Contact, key).is_distinct_from(value) for key, value in changes.items()))
+    return (
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == user_id, differs)
+        .values(**changes, version=Contact.version + 1)
+        .returning(Contact)
+    )
+
+
 def update_contact(db: Session, contact_id: int, contact_data: dict, current_user: User) -> Optional[Contact]:
     """
-    Updates the details of an existing contact.
+    Updates the given fields of an existing contact.
+
+    The write is a single ``UPDATE ... WHERE id = :id AND user_id = :uid RETURNING ...``. Nothing is written,
+    and the contact version is not bumped, when the fields already hold the requested values.
 
     :param db: The database session.
     :type db: Session
     :param contact_id: The ID of the contact to update.
     :type contact_id: int
-    :param contact_data: The updated data for the contact.
+    :param contact_data: The fields to change; fields left out are kept.
     :type contact_data: dict
     :param current_user: The user whose contact is to be updated.
     :type current_user: User
     :return: The updated contact if found, otherwise None.
     :rtype: Optional[Contact]
+    :raises HTTPException: If the new email is taken by another of the user's contacts or the birthday is invalid.
 
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user.id).first()
-    if contact:
-        for key, value in contact_data.items():
-            setattr(contact, key, value)
-        db.commit()
-        db.refresh(contact)
+    changes = contact_changes(contact_data)
+    if not changes:
+        return get_contact(db, contact_id, current_user)
+    try:
+        contact = db.scalars(contact_update_statement(contact_id, current_user.id, changes)).first()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+    if contact is None:
+        db.rollback()
+        return get_contact(db, contact_id, current_user)
+    bump_contacts_version(db, current_user.id)
+    db.commit()
     return contact
 
 
@@ -137,69 +318,440 @@ def delete_contact(db: Session, contact_id: int, current_user: User):
     if db_contact.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this contact")
     db.delete(db_contact)
+    bump_contacts_version(db, current_user.id)
     db.commit()
     return db_contact
 
 
-def format_date(d: date) -> str:
+def plan_bulk_operations(updates: List[Tuple[int, dict]], deletes: List[int]):
+    """
+    Validates a batch of contact mutations before anything is sent to the database.
+
+    :param updates: Pairs of contact ID and the fields to change.
+    :type updates: List[Tuple[int, dict]]
+    :param deletes: The IDs of contacts to delete.
+    :type deletes: List[int]
+    :return: One ``(op, id, result)`` entry per requested item in request order, with the results of rejected
+        items already filled in, the column values to write keyed by contact ID, and the IDs to delete.
+    :rtype: tuple
+    """
+    seen = Counter([contact_id for contact_id, _ in updates] + list(deletes))
+    results = []
+    changes_by_id = {}
+    for contact_id, data in updates:
+        if seen[contact_id] > 1:
+            results.append(("update", contact_id, {"id": contact_id, "op": "update", "status": "error",
+                                                   "detail": "Contact appears more than once in this request."}))
+            continue
+        try:
+            changes = contact_changes(data)
+        except HTTPException as e:
+            results.append(("update", contact_id, {"id": contact_id, "op": "update", "status": "error",
+                                                   "detail": e.detail}))
+            continue
+        if not changes:
+            results.append(("update", contact_id, {"id": contact_id, "op": "update", "status": "error",
+                                                   "detail": "No fields to update."}))
+            continue
+        results.append(("update", contact_id, None))
+        changes_by_id[contact_id] = changes
+    delete_ids = []
+    for contact_id in deletes:
+        if seen[contact_id] > 1:
+            results.append(("delete", contact_id, {"id": contact_id, "op": "delete", "status": "error",
+                                                   "detail": "Contact appears more than once in this request."}))
+            continue
+        results.append(("delete", contact_id, None))
+        delete_ids.append(contact_id)
+    return results, changes_by_id, delete_ids
+
+
+def bulk_update_statements(user_id: int, changes_by_id: dict) -> List[tuple]:
+    """
+    Groups updates by the set of columns they change into executemany-ready statements.
+
+    :param user_id: The ID of the owner.
+    :type user_id: int
+    :param changes_by_id: The column values to write keyed by contact ID.
+    :type changes_by_id: dict
+    :return: Pairs of an owner-scoped UPDATE and its parameter list.
+    :rtype: List[tuple]
+    """
+    groups = {}
+    for contact_id, changes in changes_by_id.items():
+        params = {"b_id": contact_id, **{f"v_{key}": value for key, value in changes.items()}}
+        groups.setdefault(tuple(sorted(changes)), []).append(params)
+    table = Contact.__table__
+    statements = []
+    for keys, params in groups.items():
+        values = {key: bindparam(f"v_{key}") for key in keys}
+        values["version"] = table.c.version + 1
+        statement = update(table).where(table.c.id == bindparam("b_id"), table.c.user_id == user_id).values(values)
+        statements.append((statement, params))
+    return statements
+
+
+def owned_contact_ids_statement(user_id: int, contact_ids: List[int]):
     """
-    Formats a date object into a string in the format YYYY-MM-DD.
+    Builds the query that locks and returns which of the given contacts belong to a user.
+
+    :param user_id: The ID of the owner.
+    :type user_id: int
+    :param contact_ids: The IDs to check.
+    :type contact_ids: List[int]
+    :return: The select statement.
+    :rtype: Select
+    """
+    return select(Contact.id).where(Contact.id.in_(contact_ids), Contact.user_id == user_id).with_for_update()
 
-    :param d: The date to format.
-    :type d: date
-    :return: The formatted date string.
-    :rtype: str
 
+def bulk_delete_statement(user_id: int, contact_ids: List[int]):
+    """
+    Builds ``DELETE ... WHERE id IN (...) AND user_id = :uid RETURNING id``.
+
+    :param user_id: The ID of the owner.
+    :type user_id: int
+    :param contact_ids: The IDs to delete.
+    :type contact_ids: List[int]
+    :return: The delete statement.
+    :rtype: sqlalchemy.sql.dml.Delete
     """
-    return d.strftime('%Y-%m-%d') if d else None
+    return (
+        delete(Contact)
+        .where(Contact.id.in_(contact_ids), Contact.user_id == user_id)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )
 
 
-def search_contacts(db: Session, name: Optional[str] = None, email: Optional[str] = None) -> List[Contact]:
+def finish_bulk_results(results: List[tuple], updated: Set[int], deleted: Set[int]) -> List[dict]:
+    """
+    Fills in the outcome of every accepted item.
+
+    :param results: The per-item results from :func:`plan_bulk_operations`.
+    :type results: List[tuple]
+    :param updated: The IDs that were updated.
+    :type updated: Set[int]
+    :param deleted: The IDs that were deleted.
+    :type deleted: Set[int]
+    :return: One result per requested item, updates first, in request order.
+    :rtype: List[dict]
+    """
+    items = []
+    for op, contact_id, result in results:
+        if result is None:
+            done = updated if op == "update" else deleted
+            result = {"id": contact_id, "op": op, "status": f"{op}d" if contact_id in done else "not_found",
+                      "detail": None}
+        items.append(result)
+    return items
+
+
+def bulk_mutate_contacts(db: Session, current_user: User, updates: List[Tuple[int, dict]],
+                         deletes: List[int]) -> List[dict]:
     """
-    Searches for contacts by name or email.
+    Applies a batch of contact updates and deletions in one transaction.
+
+    Updates with the same set of changed columns run as one executemany UPDATE and all deletions as one
+    ``DELETE ... RETURNING id``, both scoped to the owner. Items that are invalid or not found are reported
+    without failing the batch; a unique-email violation rolls the whole batch back.
 
     :param db: The database session.
     :type db: Session
+    :param current_user: The user whose contacts are changed.
+    :type current_user: User
+    :param updates: Pairs of contact ID and the fields to change.
+    :type updates: List[Tuple[int, dict]]
+    :param deletes: The IDs of contacts to delete.
+    :type deletes: List[int]
+    :return: One result per requested item.
+    :rtype: List[dict]
+    :raises HTTPException: If an update would duplicate an email.
+    """
+    results, changes_by_id, delete_ids = plan_bulk_operations(updates, deletes)
+    updated, deleted = set(), set()
+    try:
+        if changes_by_id:
+            owned = set(db.scalars(owned_contact_ids_statement(current_user.id, list(changes_by_id))).all())
+            owned_changes = {contact_id: changes_by_id[contact_id] for contact_id in owned}
+            for statement, params in bulk_update_statements(current_user.id, owned_changes):
+                db.execute(statement, params)
+            updated = owned
+        if delete_ids:
+            deleted = set(db.scalars(bulk_delete_statement(current_user.id, delete_ids)).all())
+        if updated or deleted:
+            bump_contacts_version(db, current_user.id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Contact with this email already exists.")
+    return finish_bulk_results(results, updated, deleted)
+
+
+def search_contacts(db: Session, current_user: User, name: Optional[str] = None, email: Optional[str] = None,
+                    limit: int = DEFAULT_SEARCH_LIMIT) -> List[Row]:
+    """
+    Searches the current user's contacts by name or email, best match first.
+
+    The query is built by :func:`src.repository.search.contact_search_statement`, which uses trigram indexes
+    on PostgreSQL and an FTS5 table on SQLite instead of scanning every contact.
+
+    :param db: The database session.
+    :type db: Session
+    :param current_user: The user whose contacts are searched.
+    :type current_user: User
     :param name: The name to search for (first or last).
     :type name: str, optional
     :param email: The email to search for.
     :type email: str, optional
-    :return: A list of contacts that match the search criteria.
-    :rtype: List[Contact]
+    :param limit: The maximum number of contacts to return.
+    :type limit: int, optional
+    :return: A list of contact rows that match the search criteria.
+    :rtype: List[Row]
 
     """
-    query = db.query(Contact)
-    if name:
-        query = query.filter(Contact.first_name.ilike(f"%{name}%") | Contact.last_name.ilike(f"%{name}%"))
-    if email:
-        query = query.filter(Contact.email.ilike(f"%{email}%"))
+    query = contact_search_statement(db.get_bind().dialect.name, current_user.id, name, email, limit)
+    return db.execute(query).all()
 
-    contacts = query.all()
-    for contact in contacts:
-        contact.birthday = format_date(contact.birthday)
-    return contacts
 
+def upcoming_birthday_window(days: int, today: Optional[date] = None):
+    """
+    Builds the filter and ordering for birthdays falling within the next ``days`` days.
+
+    Works on the generated ``birth_md`` column so the birth year is ignored, and splits the range in two when
+    it wraps from December into January. Both halves are range scans on ``(user_id, birth_md)``.
+
+    :param days: The number of days ahead to include.
+    :type days: int
+    :param today: The first day of the window, defaults to today.
+    :type today: date, optional
+    :return: The WHERE condition and the ORDER BY clauses listing the nearest birthdays first.
+    :rtype: tuple
 
-def get_contacts_birthday_soon(db: Session, days: int = 7) -> List[Contact]:
     """
-    Retrieves contacts with birthdays within a specified number of days.
+    today = today or datetime.today().date()
+    start = today.month * 100 + today.day
+    end_date = today + timedelta(days=max(days, 0))
+    end = end_date.month * 100 + end_date.day
+    if days >= 365:
+        condition = Contact.birth_md.isnot(None)
+    elif start <= end:
+        condition = Contact.birth_md.between(start, end)
+    else:
+        condition = or_(Contact.birth_md >= start, Contact.birth_md <= end)
+    ordering = (case((Contact.birth_md >= start, 0), else_=1), Contact.birth_md, Contact.id)
+    return condition, ordering
+
+
+def get_contacts_birthday_soon(db: Session, current_user: User, days: int = 7,
+                               today: Optional[date] = None) -> List[Row]:
+    """
+    Retrieves the current user's contacts with birthdays within a specified number of days.
 
     :param db: The database session.
     :type db: Session
+    :param current_user: The user whose contacts are to be retrieved.
+    :type current_user: User
     :param days: The number of days within which to search for upcoming birthdays.
     :type days: int, optional
-    :return: A list of contacts with upcoming birthdays.
-    :rtype: List[Contact]
+    :param today: The first day of the window, defaults to today.
+    :type today: date, optional
+    :return: A list of contact rows with upcoming birthdays, nearest first.
+    :rtype: List[Row]
 
     """
-    today = datetime.today().date()
-    end_date = today + timedelta(days=days)
-    contacts = (
-        db.query(Contact)
-        .filter(Contact.birthday >= today, Contact.birthday <= end_date)
+    condition, ordering = upcoming_birthday_window(days, today)
+    return (
+        db.query(*CONTACT_RESPONSE_COLUMNS)
+        .filter(Contact.user_id == current_user.id, condition)
+        .order_by(*ordering)
         .all()
     )
-    for contact in contacts:
-        if contact.birthday:
-            contact.birthday = contact.birthday.strftime('%Y-%m-%d')
-    return contacts
+
+
+def contacts_insert_statement(dialect_name: str, rows: List[dict]):
+    """
+    Builds one multi-row INSERT for a batch of contacts that skips rows conflicting with existing ones.
+
+    On PostgreSQL and SQLite the statement is ``INSERT ... ON CONFLICT DO NOTHING RETURNING email``, so a
+    whole batch is written in a single round trip and the returned emails tell which rows went in.
+
+    :param dialect_name: The name of the SQLAlchemy dialect.
+    :type dialect_name: str
+    :param rows: Column values of the contacts to insert.
+    :type rows: List[dict]
+    :return: The insert statement.
+    :rtype: sqlalchemy.sql.dml.Insert
+    """
+    if dialect_name == "postgresql":
+        statement = postgresql.insert(Contact).values(rows).on_conflict_do_nothing()
+    elif dialect_name == "sqlite":
+        statement = sqlite.insert(Contact).values(rows).on_conflict_do_nothing()
+    else:
+        statement = insert(Contact).values(rows)
+    return statement.returning(Contact.email)
+
+
+def insert_contacts_batch(db: Session, rows: List[dict]) -> Set[str]:
+    """
+    Inserts a batch of validated contacts and commits.
+
+    :param db: The database session.
+    :type db: Session
+    :param rows: Column values of the contacts to insert, all with the same ``user_id``.
+    :type rows: List[dict]
+    :return: The emails of the contacts that were inserted; conflicting rows are left out.
+    :rtype: Set[str]
+    """
+    if not rows:
+        return set()
+    inserted = set(db.scalars(contacts_insert_statement(db.get_bind().dialect.name, rows)).all())
+    if inserted:
+        bump_contacts_version(db, rows[0]["user_id"])
+    db.commit()
+    return inserted
+
+
+def find_existing_emails(db: Session, user_id: int, emails: List[str]) -> Set[str]:
+    """
+    Returns which of the given emails already belong to one of a user's contacts.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param emails: The emails to check.
+    :type emails: List[str]
+    :return: The emails that are already taken.
+    :rtype: Set[str]
+    """
+    if not emails:
+        return set()
+    return set(db.scalars(
+        select(Contact.email).where(Contact.user_id == user_id, Contact.email.in_(emails))
+    ).all())
+
+
+def contacts_version_bump_statement(user_id: int):
+    """
+    Builds the UPDATE that increments a user's contact collection version and returns the new value.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The update statement.
+    :rtype: Update
+    """
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(contacts_version=User.contacts_version + 1)
+        .returning(User.contacts_version)
+    )
+
+
+def bump_contacts_version(db: Session, user_id: int) -> Optional[int]:
+    """
+    Increments a user's contact collection version inside the current transaction.
+
+    The new version is kept in ``db.info`` and published to the version cache by
+    :func:`src.repository.versions.run_contacts_write` once the transaction has committed.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user whose contacts changed.
+    :type user_id: int
+    :return: The new version, or None if the user does not exist.
+    :rtype: Optional[int]
+    """
+    version = db.execute(contacts_version_bump_statement(user_id)).scalar()
+    if version is not None:
+        db.info.setdefault(CONTACTS_VERSIONS_INFO_KEY, {})[user_id] = version
+    return version
+
+
+def get_contacts_version(db: Session, user_id: int) -> int:
+    """
+    Reads a user's contact collection version.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The version, or 0 if the user does not exist.
+    :rtype: int
+    """
+    return db.scalar(select(User.contacts_version).where(User.id == user_id)) or 0
+
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    """
+    Retrieves a user by email address.
+
+    :param db: The database session.
+    :type db: Session
+    :param email: The email address of the user.
+    :type email: str
+    :return: The user if found, otherwise None.
+    :rtype: Optional[User]
+
+    """
+    return db.query(User).filter(User.email == email).first()
+
+
+def create_user(db: Session, email: str, hashed_password: str, username: Optional[str] = None,
+                outbox: Iterable[OutboxMessage] = ()) -> User:
+    """
+    Creates a new user with an already hashed password.
+
+    :param db: The database session.
+    :type db: Session
+    :param email: The email address of the user.
+    :type email: str
+    :param hashed_password: The bcrypt hash of the user's password.
+    :type hashed_password: str
+    :param username: The username of the user.
+    :type username: str, optional
+    :param outbox: Messages, such as the verification email, committed in the same transaction as the user.
+    :type outbox: Iterable[OutboxMessage]
+    :return: The newly created user.
+    :rtype: User
+
+    """
+    new_user = User(username=username, email=email, password=hashed_password)
+    db.add(new_user)
+    db.add_all(outbox)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+
+def get_user_avatar_hash(db: Session, user_id: int) -> Optional[str]:
+    """
+    Returns the digest of a user's avatar without loading the user.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The SHA-256 of the avatar, or None if the user has no processed avatar or does not exist.
+    :rtype: Optional[str]
+    """
+    return db.scalar(select(User.avatar_hash).where(User.id == user_id))
+
+
+def set_user_avatar(db: Session, user_id: int, avatar_hash: str, avatar_url: str):
+    """
+    Points a user's avatar at stored variants with a single UPDATE.
+
+    :param db: The database session.
+    :type db: Session
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param avatar_hash: The SHA-256 of the uploaded avatar.
+    :type avatar_hash: str
+    :param avatar_url: The URL of the avatar.
+    :type avatar_url: str
+    """
+    db.execute(update(User).where(User.id == user_id).values(avatar_hash=avatar_hash, avatar_url=avatar_url)
+               .execution_options(synchronize_session=False))
+    db.commit()
@@ -0,0 +1,101 @@
+from typing import Optional
+
+from sqlalchemy import Select, func, literal_column, or_, select, table, column
+
+from src.database.models import Contact
+from src.repository.projection import CONTACT_RESPONSE_COLUMNS
+
+DEFAULT_SEARCH_LIMIT = 50
+MIN_TRIGRAM_LENGTH = 3
+
+contacts_fts = table("contacts_fts", column("rowid"), column("rank"))
+
+
+def _fts_phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _like_pattern(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _postgresql_statement(query: Select, name: Optional[str], email: Optional[str]) -> Select:
+    scores = []
+    if name:
+        pattern = _like_pattern(name)
+        query = query.where(or_(Contact.first_name.ilike(pattern, escape="\\"),
+                                Contact.last_name.ilike(pattern, escape="\\")))
+        scores.append(func.greatest(func.similarity(Contact.first_name, name),
+                                    func.similarity(Contact.last_name, name)))
+    if email:
+        query = query.where(Contact.email.ilike(_like_pattern(email), escape="\\"))
+        scores.append(func.similarity(Contact.email, email))
+    if scores:
+        query = query.order_by(sum(scores[1:], scores[0]).desc())
+    return query.order_by(Contact.id)
+
+
+def _sqlite_statement(query: Select, name: Optional[str], email: Optional[str]) -> Select:
+    phrases = []
+    if name:
+        if len(name) >= MIN_TRIGRAM_LENGTH:
+            phrases.append(f"{{first_name last_name}} : {_fts_phrase(name)}")
+        else:
+            pattern = _like_pattern(name)
+            query = query.where(or_(Contact.first_name.ilike(pattern, escape="\\"),
+                                    Contact.last_name.ilike(pattern, escape="\\")))
+    if email:
+        if len(email) >= MIN_TRIGRAM_LENGTH:
+            phrases.append(f"email : {_fts_phrase(email)}")
+        else:
+            query = query.where(Contact.email.ilike(_like_pattern(email), escape="\\"))
+    if phrases:
+        query = (
+            query.join(contacts_fts, contacts_fts.c.rowid == Contact.id)
+            .where(literal_column("contacts_fts").op("MATCH")(" AND ".join(phrases)))
+            .order_by(contacts_fts.c.rank)
+        )
+    return query.order_by(Contact.id)
+
+
+def _generic_statement(query: Select, name: Optional[str], email: Optional[str]) -> Select:
+    if name:
+        pattern = _like_pattern(name)
+        query = query.where(or_(Contact.first_name.ilike(pattern, escape="\\"),
+                                Contact.last_name.ilike(pattern, escape="\\")))
+    if email:
+        query = query.where(Contact.email.ilike(_like_pattern(email), escape="\\"))
+    return query.order_by(Contact.id)
+
+
+def contact_search_statement(dialect_name: str, user_id: int, name: Optional[str] = None,
+                             email: Optional[str] = None, limit: int = DEFAULT_SEARCH_LIMIT) -> Select:
+    """
+    Builds the ranked, user-scoped contact search query for a database dialect.
+
+    On PostgreSQL the substring predicates are answered by the ``pg_trgm`` GIN indexes and ranked by trigram
+    similarity. On SQLite they go through the ``contacts_fts`` FTS5 table (trigram tokenizer) and are ranked
+    by bm25; terms shorter than three characters, which trigrams cannot match, fall back to ``LIKE``.
+
+    :param dialect_name: The name of the SQLAlchemy dialect, e.g. ``postgresql`` or ``sqlite``.
+    :type dialect_name: str
+    :param user_id: The ID of the user whose contacts are searched.
+    :type user_id: int
+    :param name: The text to find in the first or last name.
+    :type name: str, optional
+    :param email: The text to find in the email.
+    :type email: str, optional
+    :param limit: The maximum number of contacts to return.
+    :type limit: int, optional
+    :return: The select statement returning the response columns of matching contacts, best match first.
+    :rtype: Select
+    """
+    query = select(*CONTACT_RESPONSE_COLUMNS).where(Contact.user_id == user_id)
+    if dialect_name == "postgresql":
+        query = _postgresql_statement(query, name, email)
+    elif dialect_name == "sqlite":
+        query = _sqlite_statement(query, name, email)
+    else:
+        query = _generic_statement(query, name, email)
+    return query.limit(limit)
@@ -0,0 +1,187 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.cache import async_redis_client
+from src.repository import async_repository, repository
+from src.repository.async_repository import run_repository
+from src.repository.repository import CONTACTS_VERSIONS_INFO_KEY
+
+COMMITTED_CONTACTS_VERSIONS_INFO_KEY = "committed_contacts_versions"
+
+# Stores ARGV[1] unless the key already holds a version at least as new, so a slow reader can never
+# overwrite the version published by a later write.
+_OFFER_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+if current == nil or current < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class ContactsVersionCache:
+    """
+    Redis cache of each user's contact collection version.
+
+    Every Redis error is treated as a cache miss, so the database stays the source of truth when Redis
+    is slow or down. A write whose version could neither be published nor have the old one deleted leaves
+    a stale version in Redis; this worker then skips the cache for that user until the stale version has
+    expired or a newer one was stored.
+
+    :param client: The async Redis client.
+    :type client: redis.asyncio.Redis
+    :param ttl: Seconds a cached version is kept.
+    :type ttl: int
+    """
+
+    def __init__(self, client: redis.asyncio.Redis, ttl: int):
+        self.client = client
+        self.ttl = ttl
+        self._offer = client.register_script(_OFFER_SCRIPT)
+        self._stale: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"contacts:version:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[int]:
+        """
+        Returns the cached collection version of a user.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The version, or None on a miss, a Redis error or while the cached version may be stale.
+        :rtype: Optional[int]
+        """
+        if self._stale:
+            now = time.monotonic()
+            while self._stale and next(iter(self._stale.values()))[1] <= now:
+                self._stale.popitem(last=False)
+            if user_id in self._stale:
+                return None
+        try:
+            value = await self.client.get(self.key(user_id))
+        except redis.RedisError:
+            return None
+        return int(value) if value is not None else None
+
+    async def offer(self, user_id: int, version: int) -> bool:
+        """
+        Caches a collection version unless a newer one is already cached.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param version: The version read from or written to the database.
+        :type version: int
+        :return: Whether Redis was reached.
+        :rtype: bool
+        """
+        try:
+            await self._offer(keys=[self.key(user_id)], args=[version, self.ttl])
+        except redis.RedisError:
+            return False
+        stale = self._stale.get(user_id)
+        if stale is not None and version >= stale[0]:
+            del self._stale[user_id]
+        return True
+
+    async def publish(self, user_id: int, version: int):
+        """
+        Caches the collection version a write committed, making sure the previous one is no longer served.
+
+        If the version cannot be stored, the cached one is deleted; if that fails too, this worker skips the
+        cache for the user until the cached version has expired.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param version: The version the write committed.
+        :type version: int
+        """
+        if await self.offer(user_id, version):
+            return
+        try:
+            await self.client.delete(self.key(user_id))
+            return
+        except redis.RedisError:
+            pass
+        self._stale.pop(user_id, None)
+        self._stale[user_id] = (version, time.monotonic() + self.ttl)
+
+
+contacts_version_cache = ContactsVersionCache(async_redis_client, settings.contacts_version_ttl)
+
+
+async def current_contacts_version(db, user_id: int) -> int:
+    """
+    Returns a user's contact collection version, from Redis when possible.
+
+    :param db: The database session, sync or async.
+    :type db: Session | AsyncSession
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :return: The current collection version.
+    :rtype: int
+    """
+    version = await contacts_version_cache.get(user_id)
+    if version is None:
+        version = await run_repository(repository.get_contacts_version, async_repository.get_contacts_version, db,
+                                       user_id=user_id)
+        await contacts_version_cache.offer(user_id, version)
+    return version
+
+
+async def publish_contacts_versions(db):
+    """
+    Caches the collection versions committed through a session since the last call.
+
+    :param db: The database session, sync or async.
+    :type db: Session | AsyncSession
+    """
+    committed: Dict[int, int] = db.info.pop(COMMITTED_CONTACTS_VERSIONS_INFO_KEY, {})
+    for user_id, version in committed.items():
+        await contacts_version_cache.publish(user_id, version)
+
+
+async def run_contacts_write(sync_fn: Callable, async_fn: Callable, db, **kwargs) -> Any:
+    """
+    Calls a repository function that changes contacts, like :func:`run_repository`, then publishes the
+    collection versions it committed.
+
+    Publishing happens here rather than when the transaction commits, because sync sessions commit in a
+    worker thread and async ones inside the event loop, where a slow Redis would stall every request.
+
+    :param sync_fn: The function from :mod:`src.repository.repository`.
+    :type sync_fn: Callable
+    :param async_fn: The equivalent function from :mod:`src.repository.async_repository`.
+    :type async_fn: Callable
+    :param db: The database session, sync or async.
+    :type db: Session | AsyncSession
+    :param kwargs: The remaining keyword arguments of the repository function.
+    :return: Whatever the repository function returns.
+    :rtype: Any
+    """
+    try:
+        return await run_repository(sync_fn, async_fn, db, **kwargs)
+    finally:
+        await publish_contacts_versions(db)
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_contacts_versions(session: Session):
+    pending: Dict[int, int] = session.info.pop(CONTACTS_VERSIONS_INFO_KEY, {})
+    committed = session.info.setdefault(COMMITTED_CONTACTS_VERSIONS_INFO_KEY, {})
+    for user_id, version in pending.items():
+        committed[user_id] = max(version, committed.get(user_id, version))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_contacts_versions(session: Session):
+    session.info.pop(CONTACTS_VERSIONS_INFO_KEY, None)
@@ -0,0 +1,116 @@
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import settings
+from src.database.db import get_db
+from src.repository import repository
+from src.routes.conditional import not_modified, parse_if_none_match, quote_etag
+from src.services.avatars import MISSING, avatar_index, avatar_pipeline
+
+router = APIRouter(tags=["avatars"])
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def serve_variant(digest: str, size: int, if_none_match: Optional[str], cache_control: str):
+    """
+    Sends a stored avatar variant straight from disk.
+
+    ``FileResponse`` hands the path to the server when it supports the ASGI path-send extension and
+    otherwise streams the file in chunks; the stat result is cached, so a warm request makes no system
+    call before sending. ``Range`` and ``If-Range`` requests are answered by ``FileResponse``.
+
+    :param digest: The hex SHA-256 of the upload.
+    :type digest: str
+    :param size: The edge length of the variant.
+    :type size: int
+    :param if_none_match: The ``If-None-Match`` header.
+    :type if_none_match: str, optional
+    :param cache_control: The cache policy of the URL being served.
+    :type cache_control: str
+    :return: The file, or an empty 304 if the client's copy is current.
+    :rtype: Response
+    :raises HTTPException: If the variant is not stored.
+    """
+    tag = f"{digest}-{size}"
+    tags = parse_if_none_match(if_none_match)
+    if tag in tags or "*" in tags:
+        return not_modified(tag, cache_control)
+    located = avatar_pipeline.storage.locate(digest, size)
+    if located is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    path, stat_result = located
+    return FileResponse(path, media_type="image/webp", stat_result=stat_result,
+                        headers={"ETag": quote_etag(tag), "Cache-Control": cache_control})
+
+
+def variant_size(size: Optional[int]) -> int:
+    if size is None:
+        return max(avatar_pipeline.sizes)
+    if size not in avatar_pipeline.sizes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such avatar size")
+    return size
+
+
+@router.get(settings.avatar_base_url.rstrip("/") + "/{shard}/{subshard}/{digest}/{size}.webp")
+async def avatar_file(shard: str, subshard: str, digest: str, size: int,
+                      if_none_match: Optional[str] = Header(None)):
+    """
+    Serves an avatar variant by content address. The URL never changes meaning, so it may be cached forever.
+
+    :param shard: The first two hex digits of the digest.
+    :type shard: str
+    :param subshard: The next two hex digits of the digest.
+    :type subshard: str
+    :param digest: The hex SHA-256 of the upload.
+    :type digest: str
+    :param size: The edge length of the variant.
+    :type size: int
+    :param if_none_match: The ``If-None-Match`` header.
+    :type if_none_match: str, optional
+    :return: The WebP file.
+    :rtype: FileResponse
+    :raises HTTPException: If there is no such variant.
+    """
+    if not DIGEST_PATTERN.fullmatch(digest) or shard != digest[:2] or subshard != digest[2:4]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    return serve_variant(digest, variant_size(size), if_none_match, IMMUTABLE_CACHE_CONTROL)
+
+
+@router.get("/users/{user_id}/avatar")
+async def user_avatar(user_id: int, size: Optional[int] = Query(None, description="Edge length in pixels"),
+                      if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """
+    Serves the current avatar of a user.
+
+    The user's avatar digest is cached per worker, so a warm request does not query the database. The URL
+    changes meaning when the user uploads a new avatar, so clients revalidate it; the strong ETag makes that
+    a 304.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param size: The edge length of the variant; the largest when omitted.
+    :type size: int, optional
+    :param if_none_match: The ``If-None-Match`` header.
+    :type if_none_match: str, optional
+    :param db: The database session, used only on a cache miss.
+    :type db: Session
+    :return: The WebP file.
+    :rtype: FileResponse
+    :raises HTTPException: If the user has no avatar or the size is not stored.
+    """
+    size = variant_size(size)
+    digest = avatar_index.get(user_id)
+    if digest is MISSING:
+        digest = await run_in_threadpool(repository.get_user_avatar_hash, db, user_id)
+        avatar_index.put(user_id, digest)
+    if digest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    return serve_variant(digest, size, if_none_match, REVALIDATE_CACHE_CONTROL)
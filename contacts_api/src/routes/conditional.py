@@ -0,0 +1,123 @@
+from typing import List, Optional
+
+from fastapi import Response, status
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def parse_if_none_match(header: Optional[str]) -> List[str]:
+    """
+    Splits an ``If-None-Match`` header into opaque tags.
+
+    Weak validators are compared as their strong form, as RFC 9110 prescribes for ``If-None-Match``.
+
+    :param header: The raw header value.
+    :type header: str, optional
+    :return: The entity tags without quotes or ``W/`` prefixes; ``["*"]`` for a wildcard.
+    :rtype: List[str]
+    """
+    if not header:
+        return []
+    tags = []
+    for part in header.split(","):
+        part = part.strip()
+        if part.startswith("W/"):
+            part = part[2:]
+        tags.append(part.strip('"'))
+    return tags
+
+
+def quote_etag(tag: str) -> str:
+    return f'"{tag}"'
+
+
+def contacts_list_etag(user_id: int, version: int) -> str:
+    """
+    Builds the tag of a user's contact list from the collection version.
+
+    :param user_id: The ID of the user.
+    :type user_id: int
+    :param version: The user's contact collection version.
+    :type version: int
+    :return: The unquoted entity tag.
+    :rtype: str
+    """
+    return f"contacts.{user_id}.{version}"
+
+
+def contact_etag(contact_id: int, contact_version: int, collection_version: int) -> str:
+    """
+    Builds the tag of a single contact.
+
+    The collection version lets an unchanged book be revalidated without loading the contact; the row
+    version keeps the tag valid when only other contacts changed.
+
+    :param contact_id: The ID of the contact.
+    :type contact_id: int
+    :param contact_version: The version of the contact row.
+    :type contact_version: int
+    :param collection_version: The owner's contact collection version.
+    :type collection_version: int
+    :return: The unquoted entity tag.
+    :rtype: str
+    """
+    return f"contact.{contact_id}.{contact_version}.{collection_version}"
+
+
+def match_contact_etag(tags: List[str], contact_id: int, contact_version: Optional[int] = None,
+                       collection_version: Optional[int] = None) -> Optional[str]:
+    """
+    Finds a tag built by :func:`contact_etag` that is still current for a contact.
+
+    :param tags: The tags from ``If-None-Match``.
+    :type tags: List[str]
+    :param contact_id: The ID of the requested contact.
+    :type contact_id: int
+    :param contact_version: The current row version, if it has been loaded.
+    :type contact_version: int, optional
+    :param collection_version: The current collection version, if it has been read.
+    :type collection_version: int, optional
+    :return: The first tag naming this contact and matching every version given, or None.
+    :rtype: Optional[str]
+    """
+    for tag in tags:
+        parts = tag.split(".")
+        if len(parts) != 4 or parts[0] != "contact" or not all(part.isdigit() for part in parts[1:]):
+            continue
+        tag_id, tag_contact_version, tag_collection_version = (int(part) for part in parts[1:])
+        if tag_id != contact_id:
+            continue
+        if contact_version is not None and tag_contact_version != contact_version:
+            continue
+        if collection_version is not None and tag_collection_version != collection_version:
+            continue
+        return tag
+    return None
+
+
+def not_modified(tag: str, cache_control: str = CACHE_CONTROL) -> Response:
+    """
+    Returns an empty 304 response carrying the current validator.
+
+    :param tag: The unquoted entity tag.
+    :type tag: str
+    :param cache_control: The cache policy of the resource.
+    :type cache_control: str
+    :return: The 304 response.
+    :rtype: Response
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": quote_etag(tag), "Cache-Control": cache_control})
+
+
+def set_validator(response: Response, tag: str):
+    """
+    Attaches an ETag and a revalidate-every-time cache policy to a response.
+
+    :param response: The outgoing response.
+    :type response: Response
+    :param tag: The unquoted entity tag.
+    :type tag: str
+    """
+    response.headers["ETag"] = quote_etag(tag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from src.services.metrics import render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Exposes the application metrics for Prometheus, merged across workers in multiprocess mode.
+
+    :return: The metrics in the Prometheus text format.
+    :rtype: Response
+    """
+    body, content_type = render()
+    return Response(body, media_type=content_type)
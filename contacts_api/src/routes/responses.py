@@ -0,0 +1,17 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Returning it from a route skips FastAPI's ``response_model`` validation, so it is meant for content
+    that already has the response shape, such as rows from :func:`src.repository.projection.contact_records`.
+    Dates are written as ``YYYY-MM-DD``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
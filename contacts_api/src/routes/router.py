@@ -1,75 +1,101 @@
 from datetime import datetime, timedelta
 from typing import List, Optional
-import redis
-from cloudinary import uploader
-from fastapi import Request, APIRouter, File, Path, HTTPException, Depends, status, BackgroundTasks, UploadFile
+from fastapi import Request, Response, APIRouter, File, Query, HTTPException, Depends, status, BackgroundTasks, \
+    UploadFile, Header
+from fastapi.responses import StreamingResponse
 import jwt
-from fastapi_mail import MessageSchema, FastMail
-from passlib.context import CryptContext
-import bcrypt
-from sqlalchemy.orm import Session
-
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from src.database.models import User
-from src.database.db import get_db
+from src.database.db import get_db, get_contacts_db, get_session_factory
+from src.auths.hashing import password_hasher, hash_password, verify_password
+from src.auths.principal_cache import Principal
 from src.auths.auth import get_current_user, SECRET_KEY, create_verification_token, send_verification_email, \
     create_access_token
-from src.repository.repository import (
-    create_contact,
-    get_contacts,
-    get_contact,
-    update_contact,
-    delete_contact,
-    search_contacts,
-    get_contacts_birthday_soon
-)
-from src.schemas import ContactCreate, ContactUpdate, ContactResponse, UserResponse, UserModel
-
-limiter = Limiter(key_func=get_remote_address)
-from slowapi.errors import RateLimitExceeded
+from src.repository import repository, async_repository
+from src.repository.async_repository import run_repository
+from src.repository.contact_export import EXPORT_MEDIA_TYPES, export_contacts
+from src.repository.contact_import import import_contacts
+from src.repository.outbox import email_message, queue_messages
+from src.repository.repository import get_user_by_email, create_user
+from src.repository.projection import contact_records
+from src.repository.search import DEFAULT_SEARCH_LIMIT
+from src.repository.versions import current_contacts_version, run_contacts_write
+from src.routes.conditional import contact_etag, contacts_list_etag, match_contact_etag, not_modified, \
+    parse_if_none_match, set_validator
+from src.routes.responses import FastJSONResponse
+from src.schemas import ContactCreate, ContactUpdate, ContactPatch, ContactResponse, ContactImportResult, \
+    ContactBulkRequest, ContactBulkResult, AvatarUploadResult, UserResponse, UserModel
+from src.services.avatars import SpooledAvatar, avatar_index, avatar_pipeline
+from src.services.rate_limit import contacts_rate_limit, password_reset_rate_limit, signup_rate_limit
+
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-redis_client = redis.Redis(host='localhost', port=6379, db=0)
+
+def _set_user_avatar(session_factory: sessionmaker, user_id: int, digest: str, avatar_url: str):
+    with session_factory() as db:
+        repository.set_user_avatar(db, user_id, digest, avatar_url)
 
 
-def update_avatar(request: Request, user_id: int = Path(..., description="The ID of the user"),
-                  file: UploadFile = File(...),
-                  db: Session = Depends(get_db)):
+async def publish_avatar(spooled: SpooledAvatar, session_factory: sessionmaker, user_id: int):
     """
-    Uploads a user's avatar to Cloudinary and updates the user's profile with the new avatar URL.
+    Processes a spooled avatar and points the user at it once its variants are stored.
 
-    :param request: The HTTP request object.
-    :type request: Request
-    :param user_id: The ID of the user whose avatar is being updated.
-    :type user_id: int
-    :param file: The avatar file uploaded by the user.
-    :type file: UploadFile
-    :param db: The database session.
-    :type db: Session
-    :return: A dictionary containing the URL of the uploaded avatar.
-    :rtype: dict
-    :raises HTTPException: If the Cloudinary upload fails or if the user is not found.
+    No database connection is held while the image is processed; a session is opened only to store the result.
 
+    :param spooled: The spooled upload.
+    :type spooled: SpooledAvatar
+    :param session_factory: Creates the session that stores the avatar.
+    :type session_factory: sessionmaker
+    :param user_id: The ID of the user.
+    :type user_id: int
     """
-    try:
-        upload_result = uploader.upload(file.file, folder='user_avatars')
-        avatar_url = upload_result['secure_url']
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Cloudinary upload error: {str(e)}")
+    if await avatar_pipeline.process(spooled):
+        await run_in_threadpool(_set_user_avatar, session_factory, user_id, spooled.digest,
+                                avatar_pipeline.url(spooled.digest))
+        avatar_index.invalidate(user_id)
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
 
-    user.avatar_url = avatar_url
-    db.commit()
-    db.refresh(user)
+@router.put("/users/me/avatar", response_model=AvatarUploadResult, status_code=status.HTTP_202_ACCEPTED)
+async def upload_avatar(response: Response, background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                        db: Session = Depends(get_db), session_factory: sessionmaker = Depends(get_session_factory),
+                        current_user: Principal = Depends(get_current_user)):
+    """
+    Accepts a new avatar for the current user and processes it after responding.
+
+    The upload is spooled to a temporary file and its header checked; decoding, resizing and WebP
+    encoding run in a process pool. An upload whose variants are already stored is applied at once.
 
-    return {"avatar_url": avatar_url}
+    :param response: The outgoing response.
+    :type response: Response
+    :param background_tasks: Runs the processing after the response is sent.
+    :type background_tasks: BackgroundTasks
+    :param file: The avatar image.
+    :type file: UploadFile
+    :param db: The database session; closed before processing starts, so it holds no connection meanwhile.
+    :type db: Session
+    :param session_factory: Creates the session that stores the processed avatar.
+    :type session_factory: sessionmaker
+    :param current_user: The current authenticated user.
+    :type current_user: Principal
+    :return: Whether the avatar is ready or still processing, and the URL it will be served from.
+    :rtype: AvatarUploadResult
+    :raises HTTPException: 413 if the upload is too large, 415 if it is not an image, 503 if too many
+        uploads are in flight.
+    """
+    spooled = await avatar_pipeline.spool(file)
+    avatar_url = avatar_pipeline.url(spooled.digest)
+    if await avatar_pipeline.storage.exists(spooled.digest):
+        avatar_pipeline.discard(spooled)
+        await run_in_threadpool(repository.set_user_avatar, db, current_user.id, spooled.digest, avatar_url)
+        avatar_index.invalidate(current_user.id)
+        response.status_code = status.HTTP_200_OK
+        return AvatarUploadResult(status="ready", avatar_url=avatar_url)
+    db.close()
+    background_tasks.add_task(publish_avatar, spooled, session_factory, current_user.id)
+    return AvatarUploadResult(status="processing", avatar_url=avatar_url)
 
 
 @router.get("/verify-email/")
@@ -107,23 +133,27 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
 
 class HashHandler:
-    def __init__(self):
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    """
+    Synchronous password hashing helpers.
+
+    Request handlers should await :data:`src.auths.hashing.password_hasher` instead, which runs bcrypt
+    in a process pool.
+    """
 
     def get_password_hash(self, password: str) -> str:
-        return self.pwd_context.hash(password)
+        return hash_password(password)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return verify_password(plain_password, hashed_password)
 
 
 hash_handler = HashHandler()
 
 
-@router.post("/signup/", response_model=UserResponse)
-def register_user(user: UserModel, db: Session = Depends(get_db)):
+@router.post("/signup/", response_model=UserResponse, dependencies=[Depends(signup_rate_limit)])
+async def register_user(user: UserModel, db: Session = Depends(get_db)):
     """
-    Registers a new user, hashes their password, and sends an email verification link.
+    Registers a new user, hashes their password, and queues an email verification link.
 
     :param user: The user details to be registered.
     :type user: UserModel
@@ -134,84 +164,64 @@ def register_user(user: UserModel, db: Session = Depends(get_db)):
     :raises HTTPException: If the email is already registered.
 
     """
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await run_in_threadpool(get_user_by_email, db, user.email)
     if existing_user:
         raise HTTPException(status_code=409, detail="Email already registered")
 
-    hash_handler = HashHandler()
-    hashed_password = hash_handler.get_password_hash(user.password)
-
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        password=hashed_password
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    verification_token = create_access_token(data={"sub": db_user.email}, expires_delta=timedelta(hours=24))
+    hashed_password = await password_hasher.hash(user.password)
+    verification_token = create_access_token(data={"sub": user.email}, expires_delta=timedelta(hours=24))
     verification_link = f"http://127.0.0.1:8000/verify-email?token={verification_token}"
-
-    message = MessageSchema(
-        subject="Email Verification",
-        recipients=[user.email],
-        body=f"Click on the link to verify your email: {verification_link}",
-        subtype="plain"
-    )
+    db_user = await run_in_threadpool(create_user, db, user.email, hashed_password, user.username,
+                                      outbox=[email_message("verify_email", user.email, link=verification_link)])
 
     return db_user
 
 
-@router.post("/reset-password/")
+@router.post("/reset-password/", dependencies=[Depends(password_reset_rate_limit)])
 async def reset_password(email: str, db: Session = Depends(get_db)):
     """
-    Registers a new user, hashes their password, and sends an email verification link.
+    Queues a password reset link for a registered user.
 
-    :param user: The user details to be registered.
-    :type user: UserModel
+    :param email: The email of the user.
+    :type email: str
     :param db: The database session.
     :type db: Session
-    :return: The newly registered user.
-    :rtype: User
-    :raises HTTPException: If the email is already registered.
-
+    :return: A message confirming that the link was sent.
+    :rtype: dict
+    :raises HTTPException: If there is no user with this email.
     """
     user = db.query(User).filter(User.email == email).first()
     if user:
         reset_token = create_access_token(data={"sub": email}, expires_delta=timedelta(minutes=15))
         reset_link = f"http://127.0.0.1:8000/reset-password/{reset_token}/"
 
-        message = MessageSchema(
-            subject="Password Reset",
-            recipients=[email],
-            body=f"Click on the link to reset your password: {reset_link}",
-            subtype="plain"
-        )
+        await run_in_threadpool(queue_messages, db, [email_message("reset_password", email, link=reset_link)])
 
         return {"message": "Password reset link sent"}
     raise HTTPException(status_code=404, detail="User not found")
 
 
-@router.post("/contacts/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
-def create_new_contact(contact: ContactCreate, db: Session = Depends(get_db),
-                       current_user: User = Depends(get_current_user)):
+@router.post("/contacts/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(contacts_rate_limit)])
+async def create_new_contact(contact: ContactCreate, db: Session = Depends(get_contacts_db),
+                             current_user: Principal = Depends(get_current_user)):
     """
     Creates a new contact for the current user.
 
     :param contact: The details of the contact to be created.
     :type contact: ContactCreate
-    :param db: The database session.
-    :type db: Session
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
     :param current_user: The currently authenticated user.
-    :type current_user: User
+    :type current_user: Principal
     :return: The newly created contact.
     :rtype: ContactResponse
     :raises HTTPException: If there is an internal server error.
 
     """
     try:
-        db_contact = create_contact(contact, db)
+        db_contact = await run_contacts_write(repository.create_contact, async_repository.create_contact, db,
+                                              contact_data=contact, current_user=current_user)
         return db_contact
     except HTTPException as e:
         print(f"Error in create_new_contact: {e.detail}")
@@ -221,91 +231,248 @@ def create_new_contact(contact: ContactCreate, db: Session = Depends(get_db),
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
-@router.get("/contacts/", response_model=List[ContactResponse])
-def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                  current_user: User = Depends(get_current_user)):
+@router.get("/contacts/", response_model=List[ContactResponse], dependencies=[Depends(contacts_rate_limit)])
+async def read_contacts(skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                        if_none_match: Optional[str] = Header(None), db: Session = Depends(get_contacts_db),
+                        current_user: Principal = Depends(get_current_user)):
     """
     Retrieves a list of contacts for the current user with pagination.
 
-    :param skip: The number of contacts to skip (for pagination).
+    Passing ``after`` switches to keyset pagination: ``?after=`` returns the first page, and the cursor for
+    the following page is sent in the ``X-Next-Cursor`` and ``Link`` headers until the last page.
+
+    The response carries an ETag derived from the user's contact collection version, so a matching
+    ``If-None-Match`` is answered with 304 without querying the contacts.
+
+    :param skip: The number of contacts to skip (for offset pagination).
     :type skip: int, optional
     :param limit: The maximum number of contacts to retrieve.
     :type limit: int, optional
-    :param db: The database session.
-    :type db: Session
+    :param after: The opaque cursor from the previous page (for keyset pagination).
+    :type after: str, optional
+    :param if_none_match: Entity tags the client already holds.
+    :type if_none_match: str, optional
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
     :param current_user: The currently authenticated user.
-    :type current_user: User
-    :return: A list of contacts.
+    :type current_user: Principal
+    :return: A list of contacts, or an empty 304 response if the client's copy is current.
     :rtype: List[ContactResponse]
 
     """
-    contacts = get_contacts(db, current_user, skip=skip, limit=limit)
-    return contacts
-
-
-@router.get("/contacts/search/", response_model=list[ContactResponse])
-def search_contacts_route(name: Optional[str] = None, email: Optional[str] = None, db: Session = Depends(get_db)):
+    version = await current_contacts_version(db, current_user.id)
+    tag = contacts_list_etag(current_user.id, version)
+    requested = parse_if_none_match(if_none_match)
+    if tag in requested or "*" in requested:
+        return not_modified(tag)
+    next_cursor = None
+    if after is not None:
+        contacts, next_cursor = await run_repository(repository.get_contacts_page, async_repository.get_contacts_page,
+                                                     db, current_user=current_user, after=after, limit=limit)
+    else:
+        contacts = await run_repository(repository.get_contacts, async_repository.get_contacts, db,
+                                        current_user=current_user, skip=skip, limit=limit)
+    response = FastJSONResponse(contact_records(contacts))
+    set_validator(response, tag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'</contacts/?after={next_cursor}&limit={limit}>; rel="next"'
+    return response
+
+
+@router.get("/contacts/search/", response_model=list[ContactResponse], dependencies=[Depends(contacts_rate_limit)])
+async def search_contacts_route(name: Optional[str] = None, email: Optional[str] = None,
+                                limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=repository.MAX_PAGE_SIZE),
+                                db: Session = Depends(get_contacts_db),
+                                current_user: Principal = Depends(get_current_user)):
     """
-    Searches for contacts by name or email.
+    Searches the current user's contacts by name or email, best match first.
 
     :param name: The name of the contact to search for.
     :type name: str, optional
     :param email: The email of the contact to search for.
     :type email: str, optional
-    :param db: The database session.
-    :type db: Session
+    :param limit: The maximum number of contacts to return.
+    :type limit: int, optional
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
     :return: A list of contacts matching the search criteria.
     :rtype: list[ContactResponse]
     :raises HTTPException: If no contacts are found.
 
     """
-    contacts = search_contacts(db, name, email)
+    contacts = await run_repository(repository.search_contacts, async_repository.search_contacts, db,
+                                    current_user=current_user, name=name, email=email, limit=limit)
     if not contacts:
         raise HTTPException(status_code=404, detail="No contacts found")
-    return contacts
+    return FastJSONResponse(contact_records(contacts))
 
 
-@router.get("/contacts/birthday/", response_model=List[ContactResponse])
-def contacts_birthday_soon(days: int = 7, db: Session = Depends(get_db)):
+@router.get("/contacts/birthday/", response_model=List[ContactResponse], dependencies=[Depends(contacts_rate_limit)])
+async def contacts_birthday_soon(days: int = Query(7, ge=0, le=366), db: Session = Depends(get_contacts_db),
+                                 current_user: Principal = Depends(get_current_user)):
     """
-    Retrieves contacts with birthdays within a specified number of days.
+    Retrieves the current user's contacts with birthdays within a specified number of days.
 
     :param days: The number of days within which to search for upcoming birthdays.
     :type days: int, optional
-    :param db: The database session.
-    :type db: Session
-    :return: A list of contacts with upcoming birthdays.
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :return: A list of contacts with upcoming birthdays, nearest first.
     :rtype: List[ContactResponse]
 
     """
-    return get_contacts_birthday_soon(db, days)
+    contacts = await run_repository(repository.get_contacts_birthday_soon,
+                                    async_repository.get_contacts_birthday_soon,
+                                    db, current_user=current_user, days=days)
+    return FastJSONResponse(contact_records(contacts))
+
+
+@router.get("/contacts/export", dependencies=[Depends(contacts_rate_limit)])
+async def export_contacts_route(format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                                db: Session = Depends(get_contacts_db),
+                                current_user: Principal = Depends(get_current_user)):
+    """
+    Streams all of the current user's contacts as NDJSON or CSV.
+
+    Rows are read through a server-side cursor and encoded batch by batch, so the first bytes go out
+    immediately and memory use does not grow with the size of the address book. The output can be fed
+    back into ``POST /contacts/import``.
+
+    :param format: The output format, ``ndjson`` or ``csv``.
+    :type format: str, optional
+    :param db: The database session, sync or async depending on configuration; only its engine is used.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :return: The streamed export.
+    :rtype: StreamingResponse
+
+    """
+    return StreamingResponse(
+        export_contacts(db, current_user.id, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
+
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/jsonlines": "ndjson",
+}
 
 
-@router.get("/contacts/{contact_id}", response_model=ContactResponse)
-def read_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post("/contacts/import", response_model=ContactImportResult, dependencies=[Depends(contacts_rate_limit)])
+async def import_contacts_route(request: Request, format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+                                dry_run: bool = False, db: Session = Depends(get_contacts_db),
+                                current_user: Principal = Depends(get_current_user)):
+    """
+    Imports contacts for the current user from a CSV or NDJSON request body.
+
+    The body is read as a stream and written in batches, so large files are never held in memory. Rows that
+    fail validation or clash with an existing email are skipped and reported; the rest are imported.
+
+    :param request: The incoming request whose body holds the contacts.
+    :type request: Request
+    :param format: The body format, ``csv`` or ``ndjson``; taken from the Content-Type header when omitted.
+    :type format: str, optional
+    :param dry_run: Whether to only validate the rows without writing them.
+    :type dry_run: bool, optional
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :return: Counts of processed, inserted and failed rows with the first per-row errors.
+    :rtype: ContactImportResult
+    :raises HTTPException: If the body format is not supported.
+
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                                detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    return await import_contacts(request.stream(), format, db, current_user.id, dry_run=dry_run)
+
+
+@router.post("/contacts/bulk", response_model=ContactBulkResult, dependencies=[Depends(contacts_rate_limit)])
+async def bulk_contacts_route(body: ContactBulkRequest, db: Session = Depends(get_contacts_db),
+                              current_user: Principal = Depends(get_current_user)):
+    """
+    Updates and deletes many of the current user's contacts in one transaction.
+
+    :param body: The updates and deletions to apply, at most ``MAX_BULK_OPERATIONS`` in total.
+    :type body: ContactBulkRequest
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :return: The outcome of each operation.
+    :rtype: ContactBulkResult
+    :raises HTTPException: If an update would duplicate an email.
+
+    """
+    updates = [(item.id, item.changes.model_dump(exclude_unset=True)) for item in body.update]
+    items = await run_contacts_write(repository.bulk_mutate_contacts, async_repository.bulk_mutate_contacts, db,
+                                     current_user=current_user, updates=updates, deletes=body.delete)
+    statuses = [item["status"] for item in items]
+    return ContactBulkResult(updated=statuses.count("updated"), deleted=statuses.count("deleted"),
+                             failed=len(items) - statuses.count("updated") - statuses.count("deleted"),
+                             items=items)
+
+
+@router.get("/contacts/{contact_id}", response_model=ContactResponse, dependencies=[Depends(contacts_rate_limit)])
+async def read_contact(contact_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                       db: Session = Depends(get_contacts_db),
+                       current_user: Principal = Depends(get_current_user)):
     """
     Retrieves a specific contact by ID for the current user.
 
+    The ETag combines the contact's row version with the user's collection version. If nothing in the
+    user's book changed the request is answered with 304 before the contact is loaded; otherwise the
+    contact is loaded and 304 is still returned if this contact's own version is unchanged.
+
     :param contact_id: The ID of the contact to retrieve.
     :type contact_id: int
-    :param db: The database session.
-    :type db: Session
+    :param response: The outgoing response, used to attach the ETag.
+    :type response: Response
+    :param if_none_match: Entity tags the client already holds.
+    :type if_none_match: str, optional
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
     :param current_user: The currently authenticated user.
-    :type current_user: User
-    :return: The contact with the specified ID.
+    :type current_user: Principal
+    :return: The contact with the specified ID, or an empty 304 response if the client's copy is current.
     :rtype: ContactResponse
     :raises HTTPException: If the contact is not found.
 
     """
-    db_contact = get_contact(db, contact_id, current_user)
+    requested = parse_if_none_match(if_none_match)
+    version = await current_contacts_version(db, current_user.id)
+    current = match_contact_etag(requested, contact_id, collection_version=version)
+    if current:
+        return not_modified(current)
+    db_contact = await run_repository(repository.get_contact, async_repository.get_contact, db,
+                                      contact_id=contact_id, current_user=current_user)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
+    tag = contact_etag(contact_id, db_contact.version, version)
+    if match_contact_etag(requested, contact_id, contact_version=db_contact.version):
+        return not_modified(tag)
+    set_validator(response, tag)
     return db_contact
 
 
-@router.put("/contacts/{contact_id}", response_model=ContactResponse)
-def update_contact(contact_id: int, contact: ContactUpdate, db: Session = Depends(get_db),
-                   current_user: User = Depends(get_current_user)):
+@router.put("/contacts/{contact_id}", response_model=ContactResponse, dependencies=[Depends(contacts_rate_limit)])
+async def update_contact_route(contact_id: int, contact: ContactUpdate, db: Session = Depends(get_contacts_db),
+                               current_user: Principal = Depends(get_current_user)):
     """
     Updates a contact's details for the current user.
 
@@ -313,35 +480,64 @@ def update_contact(contact_id: int, contact: ContactUpdate, db: Session = Depend
     :type contact_id: int
     :param contact: The new details of the contact.
     :type contact: ContactUpdate
-    :param db: The database session.
-    :type db: Session
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
     :param current_user: The currently authenticated user.
-    :type current_user: User
+    :type current_user: Principal
     :return: The updated contact.
     :rtype: ContactResponse
     :raises HTTPException: If the contact is not found.
 
     """
-    db_contact = update_contact(db, contact_id, contact.dict(), current_user)
+    db_contact = await run_contacts_write(repository.update_contact, async_repository.update_contact, db,
+                                          contact_id=contact_id, contact_data=contact.dict(), current_user=current_user)
     if db_contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
     return db_contact
 
 
-@router.delete("/contacts/{contact_id}", response_model=ContactResponse)
-def delete_contact_route(contact_id: int, db: Session = Depends(get_db),
-                         current_user: User = Depends(get_current_user)):
+@router.patch("/contacts/{contact_id}", response_model=ContactResponse, dependencies=[Depends(contacts_rate_limit)])
+async def patch_contact_route(contact_id: int, contact: ContactPatch, db: Session = Depends(get_contacts_db),
+                              current_user: Principal = Depends(get_current_user)):
+    """
+    Changes only the given fields of a contact for the current user.
+
+    :param contact_id: The ID of the contact to update.
+    :type contact_id: int
+    :param contact: The fields to change.
+    :type contact: ContactPatch
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
+    :param current_user: The currently authenticated user.
+    :type current_user: Principal
+    :return: The updated contact.
+    :rtype: ContactResponse
+    :raises HTTPException: If the contact is not found.
+
+    """
+    db_contact = await run_contacts_write(repository.update_contact, async_repository.update_contact, db,
+                                          contact_id=contact_id, contact_data=contact.model_dump(exclude_unset=True),
+                                          current_user=current_user)
+    if db_contact is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return db_contact
+
+
+@router.delete("/contacts/{contact_id}", response_model=ContactResponse, dependencies=[Depends(contacts_rate_limit)])
+async def delete_contact_route(contact_id: int, db: Session = Depends(get_contacts_db),
+                               current_user: Principal = Depends(get_current_user)):
     """
     Deletes a contact for the current user.
 
     :param contact_id: The ID of the contact to delete.
     :type contact_id: int
-    :param db: The database session.
-    :type db: Session
+    :param db: The database session, sync or async depending on configuration.
+    :type db: Session | AsyncSession
     :param current_user: The currently authenticated user.
-    :type current_user: User
+    :type current_user: Principal
     :return: The deleted contact.
     :rtype: ContactResponse
 
     """
-    return delete_contact(db, contact_id, current_user)
+    return await run_contacts_write(repository.delete_contact, async_repository.delete_contact, db,
+                                    contact_id=contact_id, current_user=current_user)
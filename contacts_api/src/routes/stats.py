@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from src.auths.hashing import password_hasher
+from src.database.db import engine, get_async_engine_if_created, get_db
+from src.database.pool import pool_status
+from src.repository.outbox import outbox_status
+from src.services.avatars import avatar_pipeline
+from src.services.rate_limit import rate_limiter
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/hashing")
+def hashing_stats():
+    """
+    Reports the password hashing pool depth and latency for this worker.
+
+    :return: Pool depth counters and a latency histogram in milliseconds.
+    :rtype: dict
+    """
+    return password_hasher.stats()
+
+
+@router.get("/db-pool")
+def db_pool_stats():
+    """
+    Reports connection pool usage for this worker.
+
+    :return: Checked-out and overflow connections, checkout wait histogram and timeout counts for the sync
+        pool, and for the async pool once it has been created.
+    :rtype: dict
+    """
+    stats = {"sync": pool_status(engine.pool)}
+    async_engine = get_async_engine_if_created()
+    if async_engine is not None:
+        stats["async"] = pool_status(async_engine.sync_engine.pool)
+    return stats
+
+
+@router.get("/outbox")
+def outbox_stats(db: Session = Depends(get_db)):
+    """
+    Reports how many outbox messages wait for delivery.
+
+    :param db: The database session.
+    :type db: Session
+    :return: Pending and due message counts and the age of the oldest due message in seconds.
+    :rtype: dict
+    """
+    return outbox_status(db)
+
+
+@router.get("/avatars")
+def avatar_stats():
+    """
+    Reports avatar uploads in flight, processed and deduplicated for this worker.
+
+    :return: Upload counters of the avatar pipeline.
+    :rtype: dict
+    """
+    return avatar_pipeline.stats()
+
+
+@router.get("/rate-limit")
+def rate_limit_stats():
+    """
+    Reports how many rate limit decisions this worker made locally and how many needed Redis.
+
+    :return: Decision counters, tracked clients and whether the in-memory fallback is active.
+    :rtype: dict
+    """
+    return rate_limiter.stats()
@@ -1,14 +1,16 @@
 from dataclasses import Field
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import List, Optional
 
 from fastapi_mail import ConnectionConfig
-from pydantic import BaseModel, EmailStr, constr, HttpUrl
+from pydantic import BaseModel, EmailStr, constr, HttpUrl, model_validator
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+MAX_BULK_OPERATIONS = 1000
+
 
 class ContactCreate(BaseModel):
     """
@@ -44,6 +46,109 @@ class ContactUpdate(ContactCreate):
     pass
 
 
+class ContactPatch(BaseModel):
+    """
+    Schema for a partial update of a contact.
+
+    Only the fields present in the request are changed.
+
+    :param first_name: The first name of the contact.
+    :type first_name: str, optional
+    :param last_name: The last name of the contact.
+    :type last_name: str, optional
+    :param email: The email address of the contact.
+    :type email: EmailStr, optional
+    :param phone_number: The phone number of the contact.
+    :type phone_number: str, optional
+    :param birthday: The birthday of the contact in YYYY-MM-DD format.
+    :type birthday: str, optional
+    :param additional_info: Any additional information about the contact.
+    :type additional_info: str, optional
+    """
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone_number: Optional[str] = None
+    birthday: Optional[str] = None
+    additional_info: Optional[str] = None
+
+
+class ContactBulkUpdate(BaseModel):
+    """
+    Schema for one update in a bulk request.
+
+    :param id: The ID of the contact to update.
+    :type id: int
+    :param changes: The fields to change.
+    :type changes: ContactPatch
+    """
+    id: int
+    changes: ContactPatch
+
+
+class ContactBulkRequest(BaseModel):
+    """
+    Schema for a batch of contact updates and deletions applied in one transaction.
+
+    Together the two lists may hold at most ``MAX_BULK_OPERATIONS`` items; the limit is checked before the
+    items are validated.
+
+    :param update: The contacts to update.
+    :type update: List[ContactBulkUpdate]
+    :param delete: The IDs of the contacts to delete.
+    :type delete: List[int]
+    """
+    update: List[ContactBulkUpdate] = []
+    delete: List[int] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def limit_operations(cls, data):
+        if isinstance(data, dict):
+            count = sum(len(data[name]) for name in ("update", "delete") if isinstance(data.get(name), list))
+            if count > MAX_BULK_OPERATIONS:
+                raise ValueError(f"At most {MAX_BULK_OPERATIONS} operations per request.")
+        return data
+
+
+class ContactBulkItem(BaseModel):
+    """
+    Schema for the outcome of one operation in a bulk request.
+
+    :param id: The ID of the contact.
+    :type id: int
+    :param op: The operation, ``update`` or ``delete``.
+    :type op: str
+    :param status: ``updated``, ``deleted``, ``not_found`` or ``error``.
+    :type status: str
+    :param detail: Why the operation was rejected.
+    :type detail: str, optional
+    """
+    id: int
+    op: str
+    status: str
+    detail: Optional[str] = None
+
+
+class ContactBulkResult(BaseModel):
+    """
+    Schema for the outcome of a bulk request.
+
+    :param updated: The number of contacts updated.
+    :type updated: int
+    :param deleted: The number of contacts deleted.
+    :type deleted: int
+    :param failed: The number of operations that were not applied.
+    :type failed: int
+    :param items: The outcome of each operation, updates first.
+    :type items: List[ContactBulkItem]
+    """
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+    items: List[ContactBulkItem] = []
+
+
 class ContactResponse(BaseModel):
     """
     Schema for the response after creating or retrieving a contact.
@@ -57,7 +162,7 @@ class ContactResponse(BaseModel):
     :param phone_number: The phone number of the contact (optional).
     :type phone_number: str, optional
     :param birthday: The birthday of the contact (optional).
-    :type birthday: str, optional
+    :type birthday: date, optional
     :param additional_info: Any additional information about the contact (optional).
     :type additional_info: str, optional
     """
@@ -65,10 +170,45 @@ class ContactResponse(BaseModel):
     last_name: str
     email: EmailStr
     phone_number: Optional[str] = None
-    birthday: Optional[str] = None
+    birthday: Optional[date] = None
     additional_info: Optional[str] = None
 
 
+class ContactImportError(BaseModel):
+    """
+    Schema for a row rejected by a contact import.
+
+    :param line: The line of the uploaded file where the row starts.
+    :type line: int
+    :param error: Why the row was rejected.
+    :type error: str
+    """
+    line: int
+    error: str
+
+
+class ContactImportResult(BaseModel):
+    """
+    Schema for the outcome of a contact import.
+
+    :param dry_run: Whether the rows were only validated.
+    :type dry_run: bool
+    :param processed: The number of rows read.
+    :type processed: int
+    :param inserted: The number of contacts created, or that would be created in a dry run.
+    :type inserted: int
+    :param failed: The number of rejected rows.
+    :type failed: int
+    :param errors: The first rejected rows with their errors.
+    :type errors: List[ContactImportError]
+    """
+    dry_run: bool = False
+    processed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ContactImportError] = []
+
+
 class UserModel(BaseModel):
     """
     Schema for creating a new user.
@@ -95,6 +235,19 @@ class UserUpdate(BaseModel):
     avatar_url: HttpUrl
 
 
+class AvatarUploadResult(BaseModel):
+    """
+    Schema for the response to an avatar upload.
+
+    :param status: ``"ready"`` if the avatar is already in place, ``"processing"`` while its variants are made.
+    :type status: str
+    :param avatar_url: The URL the avatar is served from once ready.
+    :type avatar_url: str
+    """
+    status: str
+    avatar_url: str
+
+
 class UserDb(BaseModel):
     """
     Schema representing a user in the database.
@@ -168,6 +321,25 @@ class TokenModel(BaseModel):
     token_type: str = "bearer"
 
 
+class SessionResponse(BaseModel):
+    """
+    Schema for one logged-in device of the current user.
+
+    :param family: The ID of the session, used to log the device out.
+    :type family: str
+    :param device: The client that logged in, if it sent a ``User-Agent``.
+    :type device: Optional[str]
+    :param created_at: When the device logged in.
+    :type created_at: datetime
+    :param last_used_at: When the device last refreshed its tokens.
+    :type last_used_at: datetime
+    """
+    family: str
+    device: Optional[str] = None
+    created_at: datetime
+    last_used_at: datetime
+
+
 class EmailSettings(BaseModel):
     """
     Schema for the email configuration settings.
@@ -0,0 +1,495 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf.config import settings
+
+SPOOL_CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 16 * 1024
+MISSING = object()
+
+
+def render_avatar(source_path: str, sizes: Sequence[int], max_pixels: int) -> Dict[int, bytes]:
+    """
+    Decodes an image, crops it to a centered square and encodes one WebP per size.
+
+    Runs in a worker process. JPEGs are decoded at the smallest DCT scale that still covers the largest
+    size, which skips most of the decoding work for photos.
+
+    :param source_path: The path of the uploaded file.
+    :type source_path: str
+    :param sizes: The edge lengths of the variants, in pixels.
+    :type sizes: Sequence[int]
+    :param max_pixels: The largest image, in pixels, that may be decoded.
+    :type max_pixels: int
+    :return: The encoded WebP variants by size.
+    :rtype: Dict[int, bytes]
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    largest = max(sizes)
+    with Image.open(source_path) as image:
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+        variants = {}
+        for size in sizes:
+            buffer = io.BytesIO()
+            ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS).save(buffer, "WEBP", quality=85, method=4)
+            variants[size] = buffer.getvalue()
+    return variants
+
+
+class AvatarStorage(ABC):
+    """
+    Where processed avatar variants are kept, addressed by the SHA-256 of the uploaded file.
+    """
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        """
+        Tells whether every variant of an upload is stored.
+
+        :param digest: The hex SHA-256 of the upload.
+        :type digest: str
+        :return: True if the upload was processed before.
+        :rtype: bool
+        """
+
+    @abstractmethod
+    async def save(self, digest: str, variants: Dict[int, bytes]):
+        """
+        Stores the variants of an upload.
+
+        :param digest: The hex SHA-256 of the upload.
+        :type digest: str
+        :param variants: The encoded variants by size.
+        :type variants: Dict[int, bytes]
+        """
+
+    @abstractmethod
+    def url(self, digest: str, size: int) -> str:
+        """
+        Returns the public URL of a variant.
+
+        :param digest: The hex SHA-256 of the upload.
+        :type digest: str
+        :param size: The edge length of the variant.
+        :type size: int
+        :return: The URL.
+        :rtype: str
+        """
+
+    def locate(self, digest: str, size: int) -> Optional[Tuple[Path, os.stat_result]]:
+        """
+        Finds a variant on the local filesystem so it can be sent without reading it into Python.
+
+        :param digest: The hex SHA-256 of the upload.
+        :type digest: str
+        :param size: The edge length of the variant.
+        :type size: int
+        :return: The path and stat result of the file, or None if the variant is not stored locally.
+        :rtype: Optional[Tuple[Path, os.stat_result]]
+        """
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _stat_variant(path: str) -> os.stat_result:
+    # Variants never change once renamed into place, so their stat results can be kept; misses raise and are
+    # not cached.
+    return os.stat(path)
+
+
+class LocalAvatarStorage(AvatarStorage):
+    """
+    Keeps avatar variants on the local filesystem under ``root/ab/cd/<digest>/<size>.webp``.
+
+    Files are written to a temporary name and renamed into place, so readers never see a partial file.
+
+    :param root: The directory holding the variants.
+    :type root: str
+    :param base_url: The URL prefix the directory is served under.
+    :type base_url: str
+    :param sizes: The edge lengths every upload is stored in.
+    :type sizes: Sequence[int]
+    """
+
+    def __init__(self, root: str, base_url: str, sizes: Sequence[int]):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.sizes = tuple(sizes)
+
+    @staticmethod
+    def relative_path(digest: str, size: int) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}/{size}.webp"
+
+    def path(self, digest: str, size: int) -> Path:
+        return self.root / self.relative_path(digest, size)
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(lambda: all(self.path(digest, size).is_file() for size in self.sizes))
+
+    def _write(self, digest: str, variants: Dict[int, bytes]):
+        for size, data in variants.items():
+            target = self.path(digest, size)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=target.parent, suffix=".part")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, target)
+
+    async def save(self, digest: str, variants: Dict[int, bytes]):
+        await asyncio.to_thread(self._write, digest, variants)
+
+    def url(self, digest: str, size: int) -> str:
+        return f"{self.base_url}/{self.relative_path(digest, size)}"
+
+    def locate(self, digest: str, size: int) -> Optional[Tuple[Path, os.stat_result]]:
+        path = self.path(digest, size)
+        try:
+            return path, _stat_variant(str(path))
+        except FileNotFoundError:
+            return None
+
+
+@dataclass
+class SpooledAvatar:
+    """
+    An upload copied to a temporary file.
+
+    :param path: The path of the temporary file.
+    :type path: str
+    :param digest: The hex SHA-256 of the upload.
+    :type digest: str
+    """
+    path: str
+    digest: str
+
+    def discard(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class AvatarPipeline:
+    """
+    Spools avatar uploads, turns them into fixed-size WebP variants in a process pool and stores them.
+
+    Uploads are deduplicated by content hash: an upload that is already stored, or is being processed for
+    another request, is not decoded again. At most ``queue_limit`` uploads may be in flight; further ones
+    are rejected with 503 before they are spooled.
+
+    :param storage: Where the variants are kept.
+    :type storage: AvatarStorage
+    :param sizes: The edge lengths of the variants, in pixels.
+    :type sizes: Sequence[int]
+    :param workers: Number of worker processes. ``0`` renders in the default thread pool instead.
+    :type workers: int
+    :param queue_limit: Maximum number of uploads spooled or being processed at once.
+    :type queue_limit: int
+    :param max_bytes: The largest accepted upload.
+    :type max_bytes: int
+    :param max_pixels: The largest accepted image, in pixels.
+    :type max_pixels: int
+    """
+
+    def __init__(self, storage: AvatarStorage, sizes: Sequence[int], workers: int, queue_limit: int,
+                 max_bytes: int, max_pixels: int):
+        self.storage = storage
+        self.sizes = tuple(sizes)
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._pending = 0
+        self._rendered = 0
+        self._deduplicated = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def url(self, digest: str) -> str:
+        """
+        Returns the URL of the largest variant of an upload.
+
+        :param digest: The hex SHA-256 of the upload.
+        :type digest: str
+        :return: The URL.
+        :rtype: str
+        """
+        return self.storage.url(digest, max(self.sizes))
+
+    def _inspect(self, path: str):
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+        except (UnidentifiedImageError, OSError):
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Not a supported image")
+        if width * height > self.max_pixels:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+
+    async def spool(self, upload: UploadFile) -> SpooledAvatar:
+        """
+        Copies an upload to a temporary file, hashing it on the way, and checks that it is an image.
+
+        Only the image header is read here; decoding happens in :meth:`process`. The caller must pass the
+        result to :meth:`process` or discard it, which releases its slot.
+
+        :param upload: The uploaded file.
+        :type upload: UploadFile
+        :return: The spooled upload.
+        :rtype: SpooledAvatar
+        :raises HTTPException: 503 if too many uploads are in flight, 413 if the upload or image is too
+            large, 415 if it is not an image.
+        """
+        if self._pending >= self.queue_limit:
+            self._rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Avatar processing is busy, please retry", headers={"Retry-After": "1"})
+        if upload.size is not None and upload.size > self.max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload is too large")
+        self._pending += 1
+        fd, path = tempfile.mkstemp(prefix="avatar-", suffix=".upload")
+        spooled = SpooledAvatar(path=path, digest="")
+        try:
+            digest, written = hashlib.sha256(), 0
+            with os.fdopen(fd, "wb") as file:
+                while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                            detail="Upload is too large")
+                    digest.update(chunk)
+                    file.write(chunk)
+            spooled.digest = digest.hexdigest()
+            await asyncio.to_thread(self._inspect, path)
+        except BaseException:
+            self.discard(spooled)
+            raise
+        return spooled
+
+    def discard(self, spooled: SpooledAvatar):
+        """
+        Deletes a spooled upload that will not be processed and releases its slot.
+
+        :param spooled: The spooled upload.
+        :type spooled: SpooledAvatar
+        """
+        spooled.discard()
+        self._pending -= 1
+
+    async def process(self, spooled: SpooledAvatar) -> bool:
+        """
+        Renders and stores the variants of a spooled upload, unless they are stored already.
+
+        :param spooled: The spooled upload; it is deleted afterwards.
+        :type spooled: SpooledAvatar
+        :return: True if the variants are stored, False if the image could not be decoded.
+        :rtype: bool
+        """
+        try:
+            in_flight = self._in_flight.get(spooled.digest)
+            if in_flight is not None:
+                self._deduplicated += 1
+                return await asyncio.shield(in_flight)
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[spooled.digest] = future
+            try:
+                if await self.storage.exists(spooled.digest):
+                    self._deduplicated += 1
+                    future.set_result(True)
+                    return True
+                variants = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), render_avatar, spooled.path, self.sizes, self.max_pixels)
+                await self.storage.save(spooled.digest, variants)
+                self._rendered += 1
+                future.set_result(True)
+            except BrokenProcessPool:
+                self._executor = None
+                self._failed += 1
+                future.set_result(False)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                self._failed += 1
+                future.set_result(False)
+            finally:
+                del self._in_flight[spooled.digest]
+                if not future.done():
+                    future.cancel()
+            return future.result()
+        finally:
+            self.discard(spooled)
+
+    def stats(self) -> dict:
+        """
+        Returns upload counters for this worker.
+
+        :return: Uploads in flight, rendered, deduplicated, undecodable and rejected for lack of capacity.
+        :rtype: dict
+        """
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+            "rendered": self._rendered,
+            "deduplicated": self._deduplicated,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        """
+        Stops the worker processes, waiting for running jobs to finish.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class AvatarIndex:
+    """
+    Bounded LRU cache of the avatar digest of each user, so serving a warm avatar needs no query.
+
+    Users without an avatar are cached too. Entries expire after ``ttl`` seconds, which bounds how long
+    other workers keep serving a replaced avatar; this worker drops the entry when it changes the avatar.
+
+    :param maxsize: Maximum number of cached users.
+    :type maxsize: int
+    :param ttl: Seconds an entry is trusted.
+    :type ttl: float
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        """
+        Returns the cached digest of a user's avatar.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The digest, None for a user without an avatar, or :data:`MISSING` on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return MISSING
+            digest, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return MISSING
+            self._entries.move_to_end(user_id)
+            return digest
+
+    def put(self, user_id: int, digest: Optional[str]):
+        """
+        Caches the digest of a user's avatar.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param digest: The digest, or None if the user has no avatar.
+        :type digest: str, optional
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (digest, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+class AvatarUploadLimitMiddleware:
+    """
+    Caps the body of avatar uploads before the multipart parser reads it.
+
+    Starlette parses the form, spooling the file to disk, before the route runs, so without this an upload
+    of any size would be stored before :meth:`AvatarPipeline.spool` could reject it. A body larger than the
+    pipeline's ``max_bytes`` plus :data:`MULTIPART_OVERHEAD` is answered 413 straight away when its
+    ``Content-Length`` says so, and is otherwise cut off with 413 as soon as it crosses the limit.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    :param pipeline: The pipeline whose ``max_bytes`` applies.
+    :type pipeline: AvatarPipeline
+    :param path: The path of the upload route, which is only limited for ``PUT``.
+    :type path: str
+    """
+
+    def __init__(self, app: ASGIApp, pipeline: AvatarPipeline, path: str):
+        self.app = app
+        self.pipeline = pipeline
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "PUT" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        limit = self.pipeline.max_bytes + MULTIPART_OVERHEAD
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                response = JSONResponse({"detail": "Upload is too large"},
+                                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+                await response(scope, receive, send)
+                return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                        detail="Upload is too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+avatar_pipeline = AvatarPipeline(
+    LocalAvatarStorage(settings.avatar_dir, settings.avatar_base_url, settings.avatar_sizes),
+    sizes=settings.avatar_sizes,
+    workers=settings.avatar_pool_workers,
+    queue_limit=settings.avatar_queue_limit,
+    max_bytes=settings.avatar_max_bytes,
+    max_pixels=settings.avatar_max_pixels,
+)
+avatar_index = AvatarIndex(settings.avatar_index_size, settings.avatar_index_ttl)
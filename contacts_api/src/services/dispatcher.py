@@ -0,0 +1,188 @@
+"""
+Delivers outbox messages outside the web workers.
+
+Run one or more dispatcher processes next to the API::
+
+    python -m src.services.dispatcher
+
+Dispatchers claim disjoint batches, so more processes can be added to raise throughput.
+"""
+import asyncio
+import signal
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from aiosmtplib import SMTPRecipientsRefused, SMTPResponseException
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository.outbox import claim_outbox_batch, mark_failed, mark_sent, purge_outbox
+from src.services.mail import Mailer, mailer
+
+
+def is_permanent(error: BaseException) -> bool:
+    """
+    Tells whether retrying a failed delivery is pointless.
+
+    :param error: The error raised by the delivery.
+    :type error: BaseException
+    :return: True for rejected recipients, other 5xx SMTP replies and malformed messages.
+    :rtype: bool
+    """
+    if isinstance(error, SMTPRecipientsRefused):
+        return True
+    if isinstance(error, SMTPResponseException):
+        return error.code >= 500
+    return isinstance(error, (LookupError, TypeError, ValueError))
+
+
+class OutboxDispatcher:
+    """
+    Claims due outbox messages, performs them and records the outcome.
+
+    A failed attempt is retried after an exponential backoff, until ``max_attempts`` attempts have been
+    made or the error is permanent.
+
+    :param session_factory: Creates the database sessions used for claiming and recording.
+    :type session_factory: Callable[[], Session]
+    :param mailer: Sends the email messages.
+    :type mailer: Mailer
+    :param batch_size: The number of messages claimed at once.
+    :type batch_size: int
+    :param lease: Seconds the dispatcher has to deliver a claimed batch.
+    :type lease: float
+    :param max_attempts: Attempts after which a message is given up.
+    :type max_attempts: int
+    :param backoff_base: Seconds before the first retry.
+    :type backoff_base: float
+    :param backoff_max: Longest delay between two attempts, in seconds.
+    :type backoff_max: float
+    :param retention: Seconds sent and failed messages are kept before they are deleted.
+    :type retention: float
+    :param purge_interval: Seconds between two deletions of expired messages.
+    :type purge_interval: float
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], mailer: Mailer, batch_size: int = 100,
+                 lease: float = 300, max_attempts: int = 8, backoff_base: float = 10, backoff_max: float = 3600,
+                 retention: float = 7 * 24 * 3600, purge_interval: float = 3600):
+        self.session_factory = session_factory
+        self.mailer = mailer
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+
+    def backoff(self, attempts: int) -> timedelta:
+        """
+        Returns the delay before the next attempt.
+
+        :param attempts: The number of attempts made so far.
+        :type attempts: int
+        :return: ``backoff_base`` doubled for every attempt after the first, capped at ``backoff_max``.
+        :rtype: timedelta
+        """
+        return timedelta(seconds=min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)))
+
+    async def perform(self, kind: str, payload: dict):
+        """
+        Performs one message.
+
+        :param kind: The kind of the message.
+        :type kind: str
+        :param payload: The arguments of the message.
+        :type payload: dict
+        :raises ValueError: If the kind is unknown.
+        """
+        if kind == "email":
+            await self.mailer.send(payload["template"], payload["recipient"], **payload.get("context", {}))
+        else:
+            raise ValueError(f"Unknown outbox message kind: {kind}")
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """
+        Claims one batch, performs its messages concurrently and records the outcomes.
+
+        :param now: The current UTC time.
+        :type now: datetime, optional
+        :return: The number of messages claimed.
+        :rtype: int
+        """
+        with self.session_factory() as db:
+            rows = claim_outbox_batch(db, self.batch_size, self.lease, now)
+            if not rows:
+                return 0
+            results = await asyncio.gather(*(self.perform(row.kind, row.payload) for row in rows),
+                                           return_exceptions=True)
+            now = now or datetime.utcnow()
+            sent = []
+            for row, error in zip(rows, results):
+                if error is None:
+                    sent.append(row.id)
+                elif row.attempts >= self.max_attempts or is_permanent(error):
+                    mark_failed(db, row.id, repr(error))
+                else:
+                    mark_failed(db, row.id, repr(error), retry_at=now + self.backoff(row.attempts))
+            mark_sent(db, sent, now)
+            db.commit()
+            return len(rows)
+
+    def purge(self, now: Optional[datetime] = None) -> int:
+        """
+        Deletes the sent and failed messages older than ``retention``.
+
+        :param now: The current UTC time.
+        :type now: datetime, optional
+        :return: The number of deleted messages.
+        :rtype: int
+        """
+        now = now or datetime.utcnow()
+        with self.session_factory() as db:
+            return purge_outbox(db, now - timedelta(seconds=self.retention))
+
+    async def run(self, poll_interval: float, stop: asyncio.Event):
+        """
+        Dispatches until ``stop`` is set, polling only when the previous batch was not full.
+
+        Expired messages are purged every ``purge_interval`` seconds between batches.
+
+        :param poll_interval: Seconds to wait when there was nothing more to claim.
+        :type poll_interval: float
+        :param stop: Set to finish the current batch and return.
+        :type stop: asyncio.Event
+        """
+        while not stop.is_set():
+            if time.monotonic() >= self._next_purge:
+                await asyncio.to_thread(self.purge)
+                self._next_purge = time.monotonic() + self.purge_interval
+            if await self.run_once() < self.batch_size:
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+async def main():
+    dispatcher = OutboxDispatcher(SessionLocal, mailer, batch_size=settings.outbox_batch_size,
+                                  lease=settings.outbox_lease, max_attempts=settings.outbox_max_attempts,
+                                  backoff_base=settings.outbox_backoff_base, backoff_max=settings.outbox_backoff_max,
+                                  retention=settings.outbox_retention,
+                                  purge_interval=settings.outbox_purge_interval)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await dispatcher.run(settings.outbox_poll_interval, stop)
+    finally:
+        await mailer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
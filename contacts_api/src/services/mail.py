@@ -0,0 +1,276 @@
+import asyncio
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiosmtplib import SMTP, SMTPException, SMTPServerDisconnected
+from jinja2 import Environment, StrictUndefined, Template
+
+from src.conf.config import settings
+from src.services.metrics import observe_mail
+
+MAIL_TEMPLATES = {
+    "verify_email": (
+        "Email Verification",
+        "Click on the link to verify your email: {{ link }}",
+        "<html><body><p>Thank you for registering! Please verify your email by clicking the link below:</p>"
+        "<a href=\"{{ link }}\">Verify Email</a></body></html>",
+    ),
+    "reset_password": (
+        "Password Reset",
+        "Click on the link to reset your password: {{ link }}",
+        "<html><body><p>Someone asked to reset your password. The link below is valid for 15 minutes:</p>"
+        "<a href=\"{{ link }}\">Reset Password</a></body></html>",
+    ),
+}
+
+
+class MailTemplates:
+    """
+    Holds the subject, plain text and HTML templates of every message, compiled once.
+
+    :param sources: Template name mapped to ``(subject, text, html)`` Jinja sources.
+    :type sources: Dict[str, Tuple[str, str, str]]
+    """
+
+    def __init__(self, sources: Dict[str, Tuple[str, str, str]]):
+        text_env = Environment(autoescape=False, undefined=StrictUndefined)
+        html_env = Environment(autoescape=True, undefined=StrictUndefined)
+        self._compiled: Dict[str, Tuple[Template, Template, Template]] = {
+            name: (text_env.from_string(subject), text_env.from_string(text), html_env.from_string(html))
+            for name, (subject, text, html) in sources.items()
+        }
+
+    def render(self, name: str, **context) -> Tuple[str, str, str]:
+        """
+        Renders one message.
+
+        :param name: The template name.
+        :type name: str
+        :param context: The template variables.
+        :return: The subject, plain text body and HTML body.
+        :rtype: Tuple[str, str, str]
+        :raises KeyError: If there is no template with this name.
+        """
+        subject, text, html = self._compiled[name]
+        return subject.render(context), text.render(context), html.render(context)
+
+
+class SMTPPool:
+    """
+    Keeps up to ``size`` authenticated SMTP connections open and reuses them across messages.
+
+    Idle connections are handed out most recently used first. One that has been idle for more than
+    ``idle_check`` seconds is probed with ``NOOP`` before use and replaced if the server has dropped it.
+    A send that fails because a reused connection turns out to be closed is retried once on a new one.
+
+    :param hostname: The SMTP server host.
+    :type hostname: str
+    :param port: The SMTP server port.
+    :type port: int
+    :param username: The login user, or None to skip authentication.
+    :type username: str, optional
+    :param password: The login password.
+    :type password: str, optional
+    :param use_tls: Whether to connect with implicit TLS.
+    :type use_tls: bool
+    :param start_tls: Whether to upgrade a plain connection with ``STARTTLS``.
+    :type start_tls: bool
+    :param validate_certs: Whether to validate the server certificate.
+    :type validate_certs: bool
+    :param size: The maximum number of open connections, and of messages in flight.
+    :type size: int
+    :param timeout: Seconds allowed for each SMTP command.
+    :type timeout: float
+    :param idle_check: Seconds a connection may sit idle before it is checked with ``NOOP``.
+    :type idle_check: float
+    """
+
+    def __init__(self, hostname: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, start_tls: bool = False, validate_certs: bool = True, size: int = 4,
+                 timeout: float = 10, idle_check: float = 30):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.size = size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._idle: List[Tuple[SMTP, float]] = []
+        self._slots = asyncio.Semaphore(size)
+        self._sent = 0
+        self._connects = 0
+        self._reconnects = 0
+
+    async def _connect(self) -> SMTP:
+        client = SMTP(hostname=self.hostname, port=self.port, username=self.username, password=self.password,
+                      use_tls=self.use_tls, start_tls=self.start_tls, validate_certs=self.validate_certs,
+                      timeout=self.timeout)
+        await client.connect()
+        self._connects += 1
+        return client
+
+    async def _checkout(self) -> Tuple[SMTP, bool]:
+        while self._idle:
+            client, last_used = self._idle.pop()
+            if not client.is_connected:
+                continue
+            if time.monotonic() - last_used < self.idle_check:
+                return client, True
+            try:
+                await client.noop()
+                return client, True
+            except SMTPException:
+                client.close()
+        return await self._connect(), False
+
+    async def send(self, message: EmailMessage):
+        """
+        Sends a message over a pooled connection, recording how long it took and why it failed.
+
+        :param message: The message, with its sender and recipients in the headers.
+        :type message: EmailMessage
+        :raises SMTPException: If the server refuses the message or cannot be reached.
+        """
+        started = time.perf_counter()
+        try:
+            await self._send(message)
+        except Exception as error:
+            observe_mail(started, error)
+            raise
+        observe_mail(started)
+
+    async def _send(self, message: EmailMessage):
+        async with self._slots:
+            while True:
+                client, reused = await self._checkout()
+                try:
+                    await client.send_message(message)
+                except SMTPServerDisconnected:
+                    client.close()
+                    if not reused:
+                        raise
+                    self._reconnects += 1
+                    continue
+                except BaseException:
+                    client.close()
+                    raise
+                self._idle.append((client, time.monotonic()))
+                self._sent += 1
+                return
+
+    async def close(self):
+        """
+        Quits every idle connection.
+
+        The pool can be used again afterwards, including from another event loop.
+        """
+        idle, self._idle = self._idle, []
+        self._slots = asyncio.Semaphore(self.size)
+        for client, _ in idle:
+            try:
+                await client.quit()
+            except SMTPException:
+                client.close()
+
+    def stats(self) -> dict:
+        """
+        Returns connection reuse counters for this worker.
+
+        :return: Messages sent, connections opened, reconnects after a dropped connection and idle connections.
+        :rtype: dict
+        """
+        return {
+            "size": self.size,
+            "sent": self._sent,
+            "connections_opened": self._connects,
+            "reconnects": self._reconnects,
+            "idle": len(self._idle),
+        }
+
+
+class Mailer:
+    """
+    Renders templated messages and delivers them through an :class:`SMTPPool`.
+
+    :param pool: The connection pool.
+    :type pool: SMTPPool
+    :param sender: The ``From`` address.
+    :type sender: str
+    :param sender_name: The display name shown with the sender address.
+    :type sender_name: str, optional
+    :param templates: The compiled templates.
+    :type templates: MailTemplates
+    """
+
+    def __init__(self, pool: SMTPPool, sender: str, sender_name: Optional[str] = None,
+                 templates: Optional[MailTemplates] = None):
+        self.pool = pool
+        self.sender = formataddr((sender_name, sender)) if sender_name else sender
+        self.templates = templates or MailTemplates(MAIL_TEMPLATES)
+
+    def render(self, template: str, recipient: str, **context) -> EmailMessage:
+        """
+        Builds a multipart message with a plain text and an HTML part.
+
+        :param template: The template name.
+        :type template: str
+        :param recipient: The recipient address.
+        :type recipient: str
+        :param context: The template variables.
+        :return: The message.
+        :rtype: EmailMessage
+        """
+        subject, text, html = self.templates.render(template, **context)
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = recipient
+        message.set_content(text)
+        message.add_alternative(html, subtype="html")
+        return message
+
+    async def send(self, template: str, recipient: str, **context):
+        """
+        Renders and sends a message, waiting for the server to accept it.
+
+        :param template: The template name.
+        :type template: str
+        :param recipient: The recipient address.
+        :type recipient: str
+        :param context: The template variables.
+        :raises SMTPException: If the message could not be delivered.
+        """
+        await self.pool.send(self.render(template, recipient, **context))
+
+    async def send_many(self, messages: Iterable[EmailMessage]) -> List[Optional[BaseException]]:
+        """
+        Sends messages concurrently, keeping up to one transaction in flight per pooled connection.
+
+        :param messages: The messages to send.
+        :type messages: Iterable[EmailMessage]
+        :return: None for every delivered message and the exception for every failed one, in order.
+        :rtype: List[Optional[BaseException]]
+        """
+        results = await asyncio.gather(*(self.pool.send(message) for message in messages), return_exceptions=True)
+        return [result if isinstance(result, BaseException) else None for result in results]
+
+    async def close(self):
+        """
+        Closes the pooled connections.
+        """
+        await self.pool.close()
+
+
+mailer = Mailer(
+    SMTPPool(settings.mail_server, settings.mail_port, username=settings.mail_username,
+             password=settings.mail_password, use_tls=settings.mail_ssl_tls, start_tls=settings.mail_starttls,
+             validate_certs=settings.mail_validate_certs, size=settings.mail_pool_size,
+             timeout=settings.mail_timeout, idle_check=settings.mail_idle_check),
+    sender=settings.mail_from,
+    sender_name=settings.mail_from_name,
+)
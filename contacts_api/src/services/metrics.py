@@ -0,0 +1,205 @@
+"""
+Prometheus metrics of the HTTP, database, password hashing, JWT, mail and Redis hot paths.
+
+The metrics live in the default registry and are served by ``GET /metrics``. When the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable names a directory, every uvicorn or gunicorn worker writes
+its values there and a scrape, whichever worker answers it, merges the files of all workers. The variable must
+be set before the application is imported, and the directory emptied before the server starts. Gunicorn
+should call :func:`child_exit` from its ``child_exit`` hook so gauges of dead workers are dropped.
+
+Label sets that are known up front are bound once at import; the others are cached on first use, so
+recording a value costs a dictionary lookup and the observation itself.
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request until its response is sent.",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled.", ["method"], multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Database connections lent to sessions.", ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OPEN = Gauge(
+    "db_pool_open_connections", "Database connections held open by the pool.", ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a free pooled connection.", ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts", "Checkouts that gave up waiting for a free connection.", ["engine"],
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "CPU time of bcrypt hashing and verification.", ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PASSWORD_HASH = PASSWORD_HASH_SECONDS.labels("hash")
+PASSWORD_VERIFY = PASSWORD_HASH_SECONDS.labels("verify")
+
+JWT_SECONDS = Histogram(
+    "jwt_duration_seconds", "Time spent encoding and decoding JWTs.", ["operation"],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+JWT_ENCODE = JWT_SECONDS.labels("encode")
+JWT_DECODE = JWT_SECONDS.labels("decode")
+JWT_DECODE_FAILURES = Counter("jwt_decode_failures", "Tokens rejected as malformed, forged or expired.")
+
+MAIL_SEND_SECONDS = Histogram(
+    "mail_send_duration_seconds", "Time to hand a message to the SMTP server, including waiting for a connection.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+MAIL_SEND_FAILURES = Counter("mail_send_failures", "Messages the SMTP server refused or never received.", ["error"])
+
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds", "Round trip of Redis commands; a pipeline counts as one PIPELINE command.",
+    ["command"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+REDIS_COMMAND_FAILURES = Counter("redis_command_failures", "Redis commands that raised an error.", ["command"])
+
+_request_durations: Dict[Tuple[str, str, int], Histogram] = {}
+_requests_in_progress: Dict[str, Gauge] = {}
+_redis_durations: Dict[str, Histogram] = {}
+
+
+def observe_redis(command: str, started: float, failed: bool):
+    """
+    Records one Redis round trip.
+
+    :param command: The command name, such as ``GET`` or ``EVALSHA``.
+    :type command: str
+    :param started: The ``time.perf_counter()`` reading taken before the command was sent.
+    :type started: float
+    :param failed: Whether the command raised an error.
+    :type failed: bool
+    """
+    elapsed = time.perf_counter() - started
+    child = _redis_durations.get(command)
+    if child is None:
+        child = _redis_durations.setdefault(command, REDIS_COMMAND_SECONDS.labels(command))
+    child.observe(elapsed)
+    if failed:
+        REDIS_COMMAND_FAILURES.labels(command).inc()
+
+
+def observe_mail(started: float, error: Optional[BaseException] = None):
+    """
+    Records one message delivery.
+
+    :param started: The ``time.perf_counter()`` reading taken when the send began.
+    :type started: float
+    :param error: The exception the send failed with, if any.
+    :type error: BaseException, optional
+    """
+    MAIL_SEND_SECONDS.observe(time.perf_counter() - started)
+    if error is not None:
+        MAIL_SEND_FAILURES.labels(type(error).__name__).inc()
+
+
+def instrument_pool(engine: Engine, label: str):
+    """
+    Keeps the connection gauges of an engine's pool up to date.
+
+    The listeners stay attached when the pool is recreated by ``engine.dispose()``.
+
+    :param engine: The engine; pass ``async_engine.sync_engine`` for an async engine.
+    :type engine: Engine
+    :param label: The value of the ``engine`` label.
+    :type label: str
+    """
+    checked_out, open_connections = DB_POOL_CHECKED_OUT.labels(label), DB_POOL_OPEN.labels(label)
+    event.listen(engine, "connect", lambda dbapi_connection, record: open_connections.inc())
+    event.listen(engine, "close", lambda dbapi_connection, record: open_connections.dec())
+    event.listen(engine, "detach", lambda dbapi_connection, record: open_connections.dec())
+    event.listen(engine, "checkout", lambda dbapi_connection, record, proxy: checked_out.inc())
+    event.listen(engine, "checkin", lambda dbapi_connection, record: checked_out.dec())
+
+
+def render() -> Tuple[bytes, str]:
+    """
+    Renders the metrics in the Prometheus text format.
+
+    :return: The body and its content type.
+    :rtype: Tuple[bytes, str]
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def child_exit(server, worker):
+    """
+    Gunicorn ``child_exit`` hook removing the live gauges of a worker that stopped.
+
+    :param server: The gunicorn arbiter.
+    :param worker: The worker that exited.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class MetricsMiddleware:
+    """
+    Counts requests in progress and times each request by method, route template and status.
+
+    The route is the path template of the matched route, so ``/contacts/1`` and ``/contacts/2`` share a
+    series; requests no route matched are labelled ``<unmatched>`` and unknown methods ``OTHER``, so clients
+    cannot create series at will. The duration ends when the response has been sent, including streamed
+    bodies.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = _requests_in_progress.get(method)
+        if in_progress is None:
+            in_progress = _requests_in_progress.setdefault(method, HTTP_REQUESTS_IN_PROGRESS.labels(method))
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            key = (method, route, status_code)
+            duration = _request_durations.get(key)
+            if duration is None:
+                duration = _request_durations.setdefault(key, HTTP_REQUEST_SECONDS.labels(method, route, status_code))
+            duration.observe(elapsed)
@@ -0,0 +1,190 @@
+"""
+On-demand profiling of single requests.
+
+A request is profiled when it carries an ``X-Profile`` header equal to ``settings.profiling_token``, or when it
+is the ``settings.profiling_sample_rate``-th request a worker has seen since the last sampled one. pyinstrument
+samples the event loop thread; work the request hands to the thread pool shows up as ``[await]`` under the
+line that awaited it. To see where that time went, the database, bcrypt and JWT time of the request is also
+measured directly, including in pool threads and processes. Serialization is read from the samples.
+
+Each profile is written to ``settings.profiling_dir`` as a speedscope file named after the ``X-Profile-Id``
+response header; only the newest ``settings.profiling_keep`` files are kept. Requests that are not profiled
+only pay for a counter and a header lookup, and nothing at all while both triggers are off, since the
+middleware is then not installed.
+"""
+import hmac
+import itertools
+import json
+import logging
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from pyinstrument import Profiler
+from pyinstrument.frame import Frame
+from pyinstrument.renderers import SpeedscopeRenderer
+from pyinstrument.session import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.database.instrumentation import current_query_stats, track_queries
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("db", "bcrypt", "jwt", "serialization")
+# Frames whose whole time counts as serialization, as (file path suffix, function).
+SERIALIZATION_FRAMES = (
+    ("fastapi/routing.py", "serialize_response"),
+    ("fastapi/encoders.py", "jsonable_encoder"),
+    ("starlette/responses.py", "render"),
+    ("src/routes/responses.py", "render"),
+    ("src/repository/projection.py", "contact_records"),
+)
+
+_charges: ContextVar[Optional[Dict[str, float]]] = ContextVar("profile_charges", default=None)
+
+
+def charge(category: str, seconds: float):
+    """
+    Adds time spent on behalf of the request being profiled to one of :data:`CATEGORIES`.
+
+    Outside a profiled request this only reads a context variable.
+
+    :param category: The category, such as ``bcrypt``.
+    :type category: str
+    :param seconds: The time spent.
+    :type seconds: float
+    """
+    charges = _charges.get()
+    if charges is not None:
+        charges[category] = charges.get(category, 0.0) + seconds
+
+
+def serialization_time(frame: Optional[Frame]) -> float:
+    """
+    Sums the sampled time of the serialization frames below ``frame``, not counting nested ones twice.
+
+    :param frame: The root of a profile.
+    :type frame: Optional[Frame]
+    :return: The time in seconds.
+    :rtype: float
+    """
+    if frame is None:
+        return 0.0
+    path = (frame.file_path or "").replace(os.sep, "/")
+    if any(frame.function == function and path.endswith(suffix) for suffix, function in SERIALIZATION_FRAMES):
+        return frame.time
+    return sum(serialization_time(child) for child in frame.children)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests that ask for it and one in every ``sample_rate`` others.
+
+    It must be added before :class:`src.database.instrumentation.QueryStatsMiddleware`, so that it runs inside
+    it and reads the database time from the request's query statistics.
+
+    :param app: The wrapped application.
+    :type app: ASGIApp
+    :param token: The value of the ``X-Profile`` header that requests a profile; empty to disable the header.
+    :type token: str
+    :param sample_rate: Profile one request in this many; ``0`` disables sampling.
+    :type sample_rate: int
+    :param directory: Where profiles are written.
+    :type directory: str
+    :param keep: The number of profiles kept in ``directory``.
+    :type keep: int
+    :param interval: Seconds between samples.
+    :type interval: float
+    """
+
+    def __init__(self, app: ASGIApp, token: str, sample_rate: int, directory: str, keep: int,
+                 interval: float = 0.001):
+        self.app = app
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval
+        self._unsampled = 0
+        self._ids = itertools.count(1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        await self._profile(scope, receive, send)
+
+    def _wanted(self, scope: Scope) -> bool:
+        if self.sample_rate > 0:
+            self._unsampled += 1
+            if self._unsampled >= self.sample_rate:
+                self._unsampled = 0
+                return True
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, self.token)
+        return False
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send):
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(self._ids)}"
+        status_code = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        charges: Dict[str, float] = {}
+        token = _charges.set(charges)
+        outer_stats = current_query_stats()
+        with nullcontext(outer_stats) if outer_stats is not None else track_queries() as stats:
+            db_before = stats.duration
+            profiler = Profiler(interval=self.interval, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                session = profiler.stop()
+                _charges.reset(token)
+                charges["db"] = stats.duration - db_before
+                charges["serialization"] = serialization_time(session.root_frame())
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                breakdown = ", ".join(f"{category} {charges.get(category, 0.0) * 1000:.2f} ms"
+                                      for category in CATEGORIES)
+                title = f"{scope['method']} {route} {status_code} in {session.duration * 1000:.1f} ms: {breakdown}"
+                path = await run_in_threadpool(self._save, profile_id, title, session)
+                logger.info("Profiled %s, saved to %s", title, path)
+
+    def _save(self, profile_id: str, title: str, session: Session) -> str:
+        profile = json.loads(SpeedscopeRenderer().render(session))
+        profile["name"] = title
+        for entry in profile["profiles"]:
+            entry["name"] = title
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile_id}.speedscope.json")
+        with open(path, "w") as file:
+            json.dump(profile, file)
+        self._prune()
+        return path
+
+    def _prune(self):
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".speedscope.json"):
+                try:
+                    profiles.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        profiles.sort(reverse=True)
+        for _, path in profiles[self.keep:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,289 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.auths.principal_cache import token_signature
+from src.conf.config import settings
+from src.database.cache import async_redis_client
+
+# Approximates a sliding window with the counts of the current and previous fixed windows, the previous one
+# weighted by how much of it still overlaps the sliding window. Grants up to ARGV[4] requests at once and
+# otherwise returns how long, in milliseconds, until one more request fits.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local wanted = tonumber(ARGV[4])
+local start = now - (now % window)
+local current_key = KEYS[1] .. ':' .. start
+local current = tonumber(redis.call('GET', current_key) or '0')
+local previous = tonumber(redis.call('GET', KEYS[1] .. ':' .. (start - window)) or '0')
+local used = previous * (1 - (now - start) / window) + current
+local granted = math.min(wanted, math.floor(limit - used))
+if granted > 0 then
+    redis.call('INCRBY', current_key, granted)
+    redis.call('PEXPIRE', current_key, window * 2)
+    return {granted, 0}
+end
+local retry_at = start + window
+if previous > 0 and current <= limit - 1 then
+    retry_at = start + window * (1 - (limit - 1 - current) / previous)
+end
+return {0, math.max(1, math.ceil(retry_at - now))}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """
+    How many requests a client may make to a group of routes.
+
+    :param name: Identifies the counters of the policy.
+    :type name: str
+    :param limit: Requests allowed per window.
+    :type limit: int
+    :param window: The length of the sliding window, in seconds.
+    :type window: float
+    :param per_user: Whether clients are told apart by their bearer token rather than their address.
+    :type per_user: bool
+    """
+    name: str
+    limit: int
+    window: float
+    per_user: bool = False
+
+
+@dataclass
+class _LocalState:
+    tokens: int = 0
+    expires_at: float = 0.0
+    blocked_until: float = 0.0
+
+
+@dataclass
+class _MemoryWindow:
+    window_ms: int
+    start: int
+    current: int = 0
+    previous: int = 0
+
+
+def sliding_window_reserve(counts: "OrderedDict[str, _MemoryWindow]", key: str, limit: int, window_ms: int,
+                           now_ms: int, wanted: int, max_keys: int = 100000) -> Tuple[int, int]:
+    """
+    In-memory twin of :data:`SLIDING_WINDOW_SCRIPT`, used while Redis is unreachable.
+
+    Keys are kept in the order they last reserved requests. Leading keys whose windows have both ended are
+    dropped on every call, whichever client makes it, and at most ``max_keys`` keys are kept.
+
+    :param counts: The current and previous window counts by key.
+    :type counts: OrderedDict[str, _MemoryWindow]
+    :param key: The counter key.
+    :type key: str
+    :param limit: Requests allowed per window.
+    :type limit: int
+    :param window_ms: The window length in milliseconds.
+    :type window_ms: int
+    :param now_ms: The current time in milliseconds.
+    :type now_ms: int
+    :param wanted: The number of requests to reserve.
+    :type wanted: int
+    :param max_keys: Maximum number of keys kept.
+    :type max_keys: int
+    :return: The number of requests granted and, if none, milliseconds until one fits.
+    :rtype: Tuple[int, int]
+    """
+    while counts:
+        oldest = next(iter(counts.values()))
+        if oldest.start + 2 * oldest.window_ms > now_ms:
+            break
+        counts.popitem(last=False)
+    start = now_ms - now_ms % window_ms
+    current = previous = 0
+    counter = counts.get(key)
+    if counter is not None and counter.start == start:
+        current, previous = counter.current, counter.previous
+    elif counter is not None and counter.start == start - window_ms:
+        previous = counter.current
+    used = previous * (1 - (now_ms - start) / window_ms) + current
+    granted = min(wanted, math.floor(limit - used))
+    if granted > 0:
+        counts[key] = _MemoryWindow(window_ms, start, current + granted, previous)
+        counts.move_to_end(key)
+        while len(counts) > max_keys:
+            counts.popitem(last=False)
+        return granted, 0
+    retry_at = start + window_ms
+    if previous > 0 and current <= limit - 1:
+        retry_at = start + window_ms * (1 - (limit - 1 - current) / previous)
+    return 0, max(1, math.ceil(retry_at - now_ms))
+
+
+class RateLimiter:
+    """
+    Enforces rate limit policies across workers with sliding-window counters in Redis.
+
+    Each worker reserves requests from Redis in batches of ``lease_fraction`` of the limit and spends them
+    from a local bucket, so most decisions make no network call. Unspent reservations lapse after
+    ``lease_ttl`` seconds; they stay counted, which only errs on the strict side. A denied client is
+    remembered locally until it may retry, so rejected floods do not reach Redis either.
+
+    While Redis is unreachable the same counters are kept in memory, per worker, and Redis is tried again
+    after ``redis_retry`` seconds.
+
+    :param client: The async Redis client.
+    :param lease_fraction: The share of a policy's limit a worker reserves at once.
+    :type lease_fraction: float
+    :param lease_ttl: Seconds a worker may spend a reservation.
+    :type lease_ttl: float
+    :param redis_retry: Seconds to wait before using Redis again after an error.
+    :type redis_retry: float
+    :param max_keys: Maximum number of clients tracked locally.
+    :type max_keys: int
+    :param clock: Returns the current time in seconds.
+    :type clock: Callable[[], float]
+    """
+
+    def __init__(self, client, lease_fraction: float = 0.1, lease_ttl: float = 1.0, redis_retry: float = 5.0,
+                 max_keys: int = 100000, clock: Callable[[], float] = time.time):
+        self.client = client
+        self.lease_fraction = lease_fraction
+        self.lease_ttl = lease_ttl
+        self.redis_retry = redis_retry
+        self.max_keys = max_keys
+        self.clock = clock
+        self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._local: "OrderedDict[str, _LocalState]" = OrderedDict()
+        self._memory_counts: "OrderedDict[str, _MemoryWindow]" = OrderedDict()
+        self._redis_down_until = 0.0
+        self._local_decisions = 0
+        self._redis_calls = 0
+        self._redis_errors = 0
+        self._memory_reservations = 0
+        self._denied = 0
+
+    async def _reserve(self, key: str, policy: RateLimitPolicy, wanted: int, now: float) -> Tuple[int, float]:
+        now_ms, window_ms = int(now * 1000), int(policy.window * 1000)
+        if now >= self._redis_down_until:
+            try:
+                self._redis_calls += 1
+                granted, retry_ms = await self._script(keys=[f"rate:{key}"],
+                                                       args=[policy.limit, window_ms, now_ms, wanted])
+                return int(granted), int(retry_ms) / 1000
+            except (RedisError, OSError):
+                self._redis_errors += 1
+                self._redis_down_until = now + self.redis_retry
+        self._memory_reservations += 1
+        granted, retry_ms = sliding_window_reserve(self._memory_counts, key, policy.limit, window_ms, now_ms, wanted,
+                                                   self.max_keys)
+        return granted, retry_ms / 1000
+
+    def _state(self, key: str) -> _LocalState:
+        state = self._local.get(key)
+        if state is None:
+            state = self._local[key] = _LocalState()
+            while len(self._local) > self.max_keys:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(key)
+        return state
+
+    async def acquire(self, policy: RateLimitPolicy, client_key: str) -> Optional[float]:
+        """
+        Counts one request of a client against a policy.
+
+        :param policy: The policy of the route.
+        :type policy: RateLimitPolicy
+        :param client_key: Identifies the client.
+        :type client_key: str
+        :return: None if the request is allowed, otherwise the seconds until the client may retry.
+        :rtype: Optional[float]
+        """
+        key = f"{policy.name}:{client_key}"
+        now = self.clock()
+        state = self._state(key)
+        if state.blocked_until > now:
+            self._local_decisions += 1
+            self._denied += 1
+            return state.blocked_until - now
+        if state.tokens > 0 and state.expires_at > now:
+            self._local_decisions += 1
+            state.tokens -= 1
+            return None
+        wanted = max(1, int(policy.limit * self.lease_fraction))
+        granted, retry_after = await self._reserve(key, policy, wanted, now)
+        if granted <= 0:
+            self._denied += 1
+            state.tokens, state.blocked_until = 0, now + retry_after
+            return retry_after
+        state.tokens, state.expires_at = granted - 1, now + self.lease_ttl
+        return None
+
+    def stats(self) -> dict:
+        """
+        Returns how many decisions were made locally and how many needed Redis, for this worker.
+
+        :return: Decision counters, tracked clients and whether the in-memory fallback is active.
+        :rtype: dict
+        """
+        return {
+            "local_decisions": self._local_decisions,
+            "redis_calls": self._redis_calls,
+            "redis_errors": self._redis_errors,
+            "memory_reservations": self._memory_reservations,
+            "denied": self._denied,
+            "tracked_clients": len(self._local),
+            "fallback_active": self.clock() < self._redis_down_until,
+        }
+
+
+class RateLimit:
+    """
+    Route dependency that rejects a client with 429 once it exceeds a policy.
+
+    :param policy: The policy to enforce.
+    :type policy: RateLimitPolicy
+    :param limiter: The limiter keeping the counters; the shared one when omitted.
+    :type limiter: RateLimiter, optional
+    """
+
+    def __init__(self, policy: RateLimitPolicy, limiter: Optional[RateLimiter] = None):
+        self.policy = policy
+        self.limiter = limiter
+
+    def client_key(self, request: Request) -> str:
+        if self.policy.per_user:
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return "token:" + token_signature(token)
+        return "ip:" + (request.client.host if request.client else "unknown")
+
+    async def __call__(self, request: Request):
+        if not settings.rate_limit_enabled:
+            return
+        retry_after = await (self.limiter or rate_limiter).acquire(self.policy, self.client_key(request))
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
+rate_limiter = RateLimiter(async_redis_client, lease_fraction=settings.rate_limit_lease_fraction,
+                           lease_ttl=settings.rate_limit_lease_ttl, redis_retry=settings.rate_limit_redis_retry)
+
+login_rate_limit = RateLimit(RateLimitPolicy("login", settings.rate_limit_auth_limit, settings.rate_limit_auth_window))
+signup_rate_limit = RateLimit(RateLimitPolicy("signup", settings.rate_limit_auth_limit,
+                                              settings.rate_limit_auth_window))
+password_reset_rate_limit = RateLimit(RateLimitPolicy("reset-password", settings.rate_limit_auth_limit,
+                                                      settings.rate_limit_auth_window))
+send_email_rate_limit = RateLimit(RateLimitPolicy("send-email", settings.rate_limit_auth_limit,
+                                                  settings.rate_limit_auth_window))
+contacts_rate_limit = RateLimit(RateLimitPolicy("contacts", settings.rate_limit_contacts_limit,
+                                                settings.rate_limit_contacts_window, per_user=True))
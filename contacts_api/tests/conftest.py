@@ -1,9 +1,15 @@
+import itertools
+import socket
+
 import pytest
+from aiosmtpd.controller import Controller
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from src.database.db import Base, get_db
+from src.database.db import Base, get_db, get_session_factory
+from src.database import models
 from main import app
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -23,9 +29,96 @@ def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 
 
 @pytest.fixture(scope="module")
 def client():
     with TestClient(app) as c:
         yield c
+
+
+@pytest.fixture()
+def session():
+    memory_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=memory_engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=memory_engine)()
+    yield db
+    db.close()
+    memory_engine.dispose()
+
+
+def add_user(session, email):
+    user = models.User(email=email, password="x", is_verified=True)
+    session.add(user)
+    session.commit()
+    return user
+
+
+@pytest.fixture()
+def owner(session):
+    return add_user(session, "owner@example.com")
+
+
+@pytest.fixture()
+def other(session):
+    return add_user(session, "other@example.com")
+
+
+@pytest.fixture()
+def make_contact(session):
+    numbers = itertools.count()
+
+    def make(user, **fields):
+        number = next(numbers)
+        values = {"first_name": f"N{number}", "last_name": "L", "email": f"c{number}@example.com", **fields}
+        contact = models.Contact(user_id=user.id, **values)
+        session.add(contact)
+        session.commit()
+        return contact
+
+    return make
+
+
+class SMTPServer:
+    def __init__(self, hostname="127.0.0.1"):
+        self.hostname = hostname
+        self.port = unused_port()
+        self.messages = []
+        self._controller = None
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+    def start(self):
+        self._controller = Controller(self, hostname=self.hostname, port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        if self._controller is not None:
+            self._controller.stop()
+            self._controller = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture()
+def free_port():
+    return unused_port()
+
+
+@pytest.fixture()
+def smtp_server():
+    server = SMTPServer()
+    server.start()
+    yield server
+    server.stop()
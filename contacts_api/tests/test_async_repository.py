@@ -0,0 +1,60 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base
+from src.repository import async_repository
+from src.repository.async_repository import run_repository
+from src.schemas import ContactCreate
+
+
+async def make_session() -> AsyncSession:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(engine, expire_on_commit=False)()
+
+
+def test_async_contact_crud():
+    async def run():
+        db = await make_session()
+        user = await async_repository.create_user(db, "owner@example.com", "hashed", "owner")
+        contact = await async_repository.create_contact(ContactCreate(
+            first_name="John", last_name="Doe", email="john@example.com", phone_number="123"),
+            db=db, current_user=user)
+
+        listed = await async_repository.get_contacts(db, user)
+        updated = await async_repository.update_contact(db, contact.id, {"phone_number": "456"}, user)
+        found = await async_repository.get_user_by_email(db, "owner@example.com")
+        deleted = await async_repository.delete_contact(db, contact.id, user)
+        remaining = await async_repository.get_contacts(db, user)
+        await db.close()
+        return listed, updated, found, deleted, remaining, user
+
+    listed, updated, found, deleted, remaining, user = asyncio.run(run())
+
+    assert [c.email for c in listed] == ["john@example.com"]
+    assert updated.phone_number == "456"
+    assert found.id == user.id
+    assert deleted.email == "john@example.com"
+    assert remaining == []
+
+
+def test_run_repository_dispatches_on_session_type():
+    calls = []
+
+    def sync_fn(db, value):
+        calls.append(("sync", value))
+
+    async def async_fn(db, value):
+        calls.append(("async", value))
+
+    async def run():
+        await run_repository(sync_fn, async_fn, Session(), value=1)
+        await run_repository(sync_fn, async_fn, AsyncSession(), value=2)
+
+    asyncio.run(run())
+
+    assert calls == [("sync", 1), ("async", 2)]
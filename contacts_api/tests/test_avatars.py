@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from src.auths.auth import create_access_token
+from src.database.models import Base, User
+from src.repository import repository
+from src.services.avatars import MULTIPART_OVERHEAD, AvatarPipeline, AvatarStorage, LocalAvatarStorage, avatar_index, \
+    avatar_pipeline, render_avatar
+from tests.conftest import TestingSessionLocal, engine
+
+
+def png_bytes(width=300, height=200, color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data), filename="avatar.png")
+
+
+def make_pipeline(tmp_path, **options):
+    storage = LocalAvatarStorage(str(tmp_path / "avatars"), "/media/avatars", (32, 128))
+    defaults = dict(sizes=(32, 128), workers=0, queue_limit=4, max_bytes=1024 * 1024, max_pixels=10 ** 6)
+    return AvatarPipeline(storage, **{**defaults, **options})
+
+
+def test_render_avatar_makes_square_webp_variants(tmp_path):
+    source = tmp_path / "source.png"
+    source.write_bytes(png_bytes())
+
+    variants = render_avatar(str(source), (32, 128), 10 ** 6)
+
+    for size, data in variants.items():
+        with Image.open(io.BytesIO(data)) as image:
+            assert (image.format, image.size) == ("WEBP", (size, size))
+
+
+def test_storage_backends_must_implement_every_operation():
+    class ReadOnlyStorage(AvatarStorage):
+        async def exists(self, digest):
+            return False
+
+    with pytest.raises(TypeError):
+        ReadOnlyStorage()
+
+
+def test_identical_uploads_are_rendered_once(tmp_path):
+    pipeline = make_pipeline(tmp_path)
+    data = png_bytes()
+
+    async def run():
+        first, second = await pipeline.spool(upload(data)), await pipeline.spool(upload(data))
+        results = await asyncio.gather(pipeline.process(first), pipeline.process(second))
+        third = await pipeline.spool(upload(data))
+        return first, results + [await pipeline.process(third)]
+
+    first, results = asyncio.run(run())
+
+    assert results == [True, True, True]
+    assert pipeline.stats()["rendered"] == 1
+    assert pipeline.stats()["deduplicated"] == 2
+    assert pipeline.stats()["pending"] == 0
+    assert not os.path.exists(first.path)
+    assert pipeline.storage.path(first.digest, 128).is_file()
+    assert pipeline.url(first.digest) == f"/media/avatars/{first.digest[:2]}/{first.digest[2:4]}/{first.digest}/128.webp"
+
+
+@pytest.mark.parametrize("data, code", [(b"x" * 2048, 413), (b"not an image", 415), (png_bytes(2000, 1000), 413)])
+def test_spool_rejects_bad_uploads(tmp_path, data, code):
+    pipeline = make_pipeline(tmp_path, max_bytes=1024 if code == 413 and len(data) == 2048 else 1024 * 1024)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(pipeline.spool(upload(data)))
+
+    assert error.value.status_code == code
+    assert pipeline.stats()["pending"] == 0
+
+
+def test_upload_route_processes_after_responding(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(avatar_pipeline, "storage", LocalAvatarStorage(str(tmp_path), "/media/avatars",
+                                                                       avatar_pipeline.sizes))
+    monkeypatch.setattr(avatar_pipeline, "workers", 0)
+    Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as db:
+        user = User(email="avatar-owner@example.com", password="x", is_verified=True)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'avatar-owner@example.com'})}"}
+    checked_out = []
+    process = avatar_pipeline.process
+
+    async def process_and_count_connections(spooled):
+        checked_out.append(engine.pool.checkedout())
+        return await process(spooled)
+
+    monkeypatch.setattr(avatar_pipeline, "process", process_and_count_connections)
+
+    try:
+        first = client.put("/users/me/avatar", files={"file": ("a.png", png_bytes(), "image/png")}, headers=headers)
+        again = client.put("/users/me/avatar", files={"file": ("a.png", png_bytes(), "image/png")}, headers=headers)
+        with TestingSessionLocal() as db:
+            stored = db.get(User, user_id)
+            avatar_hash, avatar_url = stored.avatar_hash, stored.avatar_url
+    finally:
+        with TestingSessionLocal() as db:
+            db.query(User).filter(User.id == user_id).delete()
+            db.commit()
+
+    assert (first.status_code, first.json()["status"]) == (202, "processing")
+    assert checked_out == [0]
+    assert (again.status_code, again.json()["status"]) == (200, "ready")
+    assert avatar_url == first.json()["avatar_url"]
+    assert avatar_url.endswith(f"{avatar_hash}/{max(avatar_pipeline.sizes)}.webp")
+
+
+def test_avatar_is_served_from_disk_with_validators(client, tmp_path, monkeypatch):
+    storage = LocalAvatarStorage(str(tmp_path), "/media/avatars", avatar_pipeline.sizes)
+    monkeypatch.setattr(avatar_pipeline, "storage", storage)
+    digest = "ab" * 32
+    asyncio.run(storage.save(digest, {size: b"RIFF" + bytes(range(64)) * size for size in avatar_pipeline.sizes}))
+    lookups = []
+    monkeypatch.setattr(repository, "get_user_avatar_hash", lambda db, user_id: lookups.append(user_id) or digest)
+    avatar_index.invalidate(4242)
+
+    first = client.get("/users/4242/avatar")
+    cached = client.get("/users/4242/avatar", headers={"If-None-Match": first.headers["etag"]})
+    partial = client.get("/users/4242/avatar", headers={"Range": "bytes=0-9"})
+    small = client.get(f"/users/4242/avatar?size={min(avatar_pipeline.sizes)}")
+    by_content = client.get(storage.url(digest, max(avatar_pipeline.sizes)))
+
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/webp"
+    assert first.headers["etag"] == f'"{digest}-{max(avatar_pipeline.sizes)}"'
+    assert first.headers["cache-control"] == "public, no-cache"
+    assert cached.status_code == 304
+    assert (partial.status_code, partial.content) == (206, first.content[:10])
+    assert len(small.content) < len(first.content)
+    assert by_content.content == first.content
+    assert "immutable" in by_content.headers["cache-control"]
+    assert lookups == [4242]
+    assert client.get("/users/4242/avatar?size=7").status_code == 404
+    assert client.get(f"/media/avatars/00/00/{digest}/64.webp").status_code == 404
+
+
+def test_oversized_upload_bodies_are_refused_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(avatar_pipeline, "max_bytes", 1024)
+    parsed = []
+    monkeypatch.setattr(avatar_pipeline, "spool", lambda upload: parsed.append(upload))
+    body = b"x" * (1024 + MULTIPART_OVERHEAD + 1)
+
+    def chunks():
+        for start in range(0, len(body), 4096):
+            yield body[start:start + 4096]
+
+    headers = {"Content-Type": "multipart/form-data; boundary=b"}
+    declared = client.put("/users/me/avatar", content=body, headers=headers)
+    streamed = client.put("/users/me/avatar", content=chunks(), headers=headers)
+
+    assert (declared.status_code, streamed.status_code) == (413, 413)
+    assert "content-length" not in streamed.request.headers
+    assert parsed == []
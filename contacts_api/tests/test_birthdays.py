@@ -0,0 +1,37 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from src.repository.repository import get_contacts_birthday_soon
+
+
+def add_contacts(make_contact, owner, other, birthdays):
+    for birthday in birthdays:
+        make_contact(owner, birthday=birthday)
+    make_contact(other, birthday=date(1980, 12, 31))
+
+
+def test_birthdays_ignore_year_and_wrap_into_january(session, owner, other, make_contact):
+    add_contacts(make_contact, owner, other, [
+        date(1990, 1, 2), date(1985, 12, 30), date(2001, 12, 31), date(1970, 1, 10), date(1999, 6, 1), None,
+    ])
+
+    contacts = get_contacts_birthday_soon(session, owner, days=7, today=date(2026, 12, 29))
+
+    assert [c.birthday for c in contacts] == [date(1985, 12, 30), date(2001, 12, 31), date(1990, 1, 2)]
+
+
+def test_birthdays_within_same_month(session, owner, other, make_contact):
+    add_contacts(make_contact, owner, other, [date(1990, 3, 5), date(1990, 3, 20), date(1990, 2, 28)])
+
+    contacts = get_contacts_birthday_soon(session, owner, days=10, today=date(2026, 3, 1))
+
+    assert [c.birthday for c in contacts] == [date(1990, 3, 5)]
+
+
+def test_birthday_lookup_uses_composite_index(session):
+    plan = session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM contacts WHERE user_id = 1 AND birth_md BETWEEN 101 AND 110"
+    )).all()
+
+    assert any("ix_contacts_user_id_birth_md" in row[-1] for row in plan)
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from src.database.models import Contact
+from src.repository.repository import bulk_mutate_contacts, get_contacts_version
+from src.schemas import MAX_BULK_OPERATIONS, ContactBulkRequest
+
+
+@pytest.fixture()
+def ids(owner, make_contact):
+    return [make_contact(owner, last_name="X").id for _ in range(4)]
+
+
+@pytest.fixture()
+def foreign_id(other, make_contact):
+    return make_contact(other, last_name="X", email="f@example.com").id
+
+
+def test_bulk_applies_updates_and_deletes_with_per_item_results(session, owner, ids, foreign_id):
+
+    items = bulk_mutate_contacts(session, owner, updates=[
+        (ids[0], {"last_name": "Y"}),
+        (ids[1], {"phone_number": "5", "birthday": "1990-02-03"}),
+        (ids[2], {"birthday": "soon"}),
+        (foreign_id, {"last_name": "stolen"}),
+    ], deletes=[ids[3], foreign_id, 999])
+
+    assert [(i["id"], i["op"], i["status"]) for i in items] == [
+        (ids[0], "update", "updated"), (ids[1], "update", "updated"), (ids[2], "update", "error"),
+        (foreign_id, "update", "error"), (ids[3], "delete", "deleted"), (foreign_id, "delete", "error"),
+        (999, "delete", "not_found"),
+    ]
+    session.expire_all()
+    assert session.get(Contact, ids[0]).last_name == "Y"
+    assert session.get(Contact, ids[1]).version == 2
+    assert session.get(Contact, ids[3]) is None
+    assert session.get(Contact, foreign_id).last_name == "X"
+    assert get_contacts_version(session, owner.id) == 1
+
+
+def test_bulk_ignores_other_users_contacts(session, owner, foreign_id):
+
+    items = bulk_mutate_contacts(session, owner, updates=[(foreign_id, {"last_name": "Y"})], deletes=[])
+
+    assert items[0]["status"] == "not_found"
+    assert get_contacts_version(session, owner.id) == 0
+
+
+def test_bulk_is_all_or_nothing_on_email_clash(session, owner, ids):
+
+    with pytest.raises(HTTPException) as error:
+        bulk_mutate_contacts(session, owner, deletes=[ids[3]],
+                             updates=[(ids[0], {"last_name": "Y"}), (ids[1], {"email": "c2@example.com"})])
+
+    assert error.value.status_code == 400
+    session.expire_all()
+    assert session.get(Contact, ids[0]).last_name == "X"
+    assert session.get(Contact, ids[3]) is not None
+
+
+def test_bulk_reports_every_repeated_item(session, owner, ids):
+
+    items = bulk_mutate_contacts(session, owner, updates=[], deletes=[ids[0], ids[0], ids[1]])
+
+    assert [(i["id"], i["status"]) for i in items] == [(ids[0], "error"), (ids[0], "error"), (ids[1], "deleted")]
+
+
+def test_bulk_limit_counts_both_lists_and_answers_422():
+    app = FastAPI()
+
+    @app.post("/bulk")
+    def bulk(body: ContactBulkRequest):
+        return {}
+
+    half = MAX_BULK_OPERATIONS // 2 + 1
+    with TestClient(app) as client:
+        assert client.post("/bulk", json={"delete": list(range(MAX_BULK_OPERATIONS))}).status_code == 200
+        assert client.post("/bulk", json={"delete": list(range(MAX_BULK_OPERATIONS + 1))}).status_code == 422
+        split = {"update": [{"id": i, "changes": {}} for i in range(half)], "delete": list(range(half))}
+        assert client.post("/bulk", json=split).status_code == 422
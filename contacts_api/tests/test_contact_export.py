@@ -0,0 +1,66 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, Contact, User
+from src.repository.contact_export import export_contacts
+from src.repository.contact_import import import_contacts
+
+
+def add_contacts(session, owner_id, other_id, count=5):
+    session.add_all([
+        Contact(first_name=f"First{i}", last_name="Last, Jr.", email=f"c{i}@example.com", phone_number=str(i),
+                birthday=date(1990, 1, i + 1), user_id=owner_id)
+        for i in range(count)
+    ])
+    session.add(Contact(first_name="Hidden", last_name="X", email="hidden@example.com", user_id=other_id))
+    session.commit()
+
+
+def test_ndjson_export_streams_in_batches(session, owner, other):
+    add_contacts(session, owner.id, other.id)
+
+    chunks = list(export_contacts(session, owner.id, "ndjson", batch_size=2))
+
+    assert len(chunks) == 3
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [r["email"] for r in records] == [f"c{i}@example.com" for i in range(5)]
+    assert records[0]["birthday"] == "1990-01-01"
+
+
+def test_csv_export_round_trips_through_import(session, owner, other):
+    add_contacts(session, owner.id, other.id, count=3)
+    body = b"".join(export_contacts(session, owner.id, "csv"))
+    assert body.splitlines()[0] == b"first_name,last_name,email,phone_number,birthday,additional_info"
+
+    session.query(Contact).filter(Contact.user_id == owner.id).delete()
+    session.commit()
+
+    async def chunks():
+        yield body
+
+    result = asyncio.run(import_contacts(chunks(), "csv", session, owner.id))
+
+    assert (result.inserted, result.failed) == (3, 0)
+    assert session.query(Contact).filter(Contact.last_name == "Last, Jr.").count() == 3
+
+
+def test_async_export():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            owner, other = User(email="owner@example.com", password="x"), User(email="other@example.com", password="x")
+            db.add_all([owner, other])
+            await db.commit()
+            await db.run_sync(add_contacts, owner.id, other.id)
+            return [chunk async for chunk in export_contacts(db, owner.id, "ndjson", batch_size=4)]
+
+    chunks = asyncio.run(run())
+
+    assert len(chunks) == 2
+    assert b"hidden@example.com" not in b"".join(chunks)
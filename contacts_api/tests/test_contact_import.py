@@ -0,0 +1,81 @@
+import asyncio
+
+from src.database.models import Contact
+from src.repository import contact_import
+from src.repository.contact_import import import_contacts
+
+
+async def chunked(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def run_import(session, owner, body: bytes, fmt: str, **kwargs):
+    return asyncio.run(import_contacts(chunked(body), fmt, session, owner.id, **kwargs))
+
+
+CSV = (
+    "first_name,last_name,email,phone_number,birthday,additional_info\r\n"
+    "John,Doe,john@example.com,123,1990-04-01,\r\n"
+    'Ann,Lee,ann@example.com,456,,"line one\r\nline two"\r\n'
+).encode()
+
+
+def test_csv_import_streams_rows_and_keeps_multiline_fields(session, owner):
+    result = run_import(session, owner, CSV, "csv")
+
+    assert (result.processed, result.inserted, result.failed) == (2, 2, 0)
+    ann = session.query(Contact).filter(Contact.email == "ann@example.com").one()
+    assert ann.additional_info == "line one\nline two"
+    assert ann.user_id == owner.id
+    assert str(session.query(Contact).filter(Contact.email == "john@example.com").one().birthday) == "1990-04-01"
+
+
+def test_ndjson_import_reports_invalid_and_duplicate_rows(session, owner):
+    body = b"\n".join([
+        b'{"first_name": "John", "last_name": "Doe", "email": "john@example.com", "phone_number": "1"}',
+        b'{"first_name": "Bad", "last_name": "Email", "email": "nope", "phone_number": "2"}',
+        b'not json',
+        b'{"first_name": "John", "last_name": "Again", "email": "john@example.com", "phone_number": "3"}',
+        b'{"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com", "phone_number": "4",'
+        b' "birthday": "01.01.1990"}',
+    ])
+
+    result = run_import(session, owner, body, "ndjson", batch_size=2)
+
+    assert (result.processed, result.inserted, result.failed) == (5, 1, 4)
+    assert [error.line for error in result.errors] == [2, 3, 4, 5]
+    assert result.errors[0].error.startswith("email:")
+    assert result.errors[2].error == "Duplicate email in this import"
+    assert result.errors[3].error.startswith("birthday:")
+    assert session.query(Contact).count() == 1
+
+
+def test_dry_run_validates_without_writing(session, owner):
+    run_import(session, owner, CSV, "csv")
+    extra = b'{"first_name": "New", "last_name": "One", "email": "new@example.com", "phone_number": "9"}\n' \
+            b'{"first_name": "John", "last_name": "Doe", "email": "john@example.com", "phone_number": "1"}\n'
+
+    result = run_import(session, owner, extra, "ndjson", dry_run=True)
+
+    assert result.dry_run
+    assert (result.processed, result.inserted, result.failed) == (2, 1, 1)
+    assert session.query(Contact).count() == 2
+
+
+def test_oversized_records_are_reported_and_not_buffered(session, owner, monkeypatch):
+    monkeypatch.setattr(contact_import, "MAX_RECORD_LENGTH", 100)
+    long_note = "x" * 50
+    body = CSV + f'Max,Poe,max@example.com,7,,"{long_note}\r\n{long_note}"\r\nEve,Ray,eve@example.com,8,,\r\n'.encode()
+
+    result = run_import(session, owner, body, "csv")
+
+    assert (result.processed, result.inserted, result.failed) == (4, 3, 1)
+    assert result.errors[0].line == 5 and "longer than 100" in result.errors[0].error
+
+    ndjson = b'{"first_name": "' + b"y" * 120 + b'"}\n' \
+             b'{"first_name": "Kim", "last_name": "Ko", "email": "kim@example.com", "phone_number": "3"}\n'
+    result = run_import(session, owner, ndjson, "ndjson")
+
+    assert (result.processed, result.inserted, result.failed) == (2, 1, 1)
+    assert result.errors[0].line == 1
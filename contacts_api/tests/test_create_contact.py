@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.repository.repository import create_contact
+from src.schemas import ContactCreate
+
+
+def contact(email="john@example.com"):
+    return ContactCreate(first_name="John", last_name="Doe", email=email, phone_number="1", birthday="1990-04-01")
+
+
+def test_email_is_unique_per_owner(session, owner, other):
+    created = create_contact(contact(), session, owner)
+    assert (created.user_id, created.version, created.birth_md) == (owner.id, 1, 401)
+    assert create_contact(contact(), session, other).user_id == other.id
+
+    with pytest.raises(HTTPException) as error:
+        create_contact(contact(), session, owner)
+    assert error.value.status_code == 400
+
+
+def test_create_issues_no_select(session, owner):
+    session.refresh(owner)
+    statements = []
+    engine = session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        create_contact(contact(), session, owner)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert statements == ["INSERT", "UPDATE"]
@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from src.auths.hashing import PasswordHasher
+
+
+def test_hash_and_verify_in_process_pool():
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+
+    async def run():
+        hashed = await hasher.hash("mypassword")
+        return hashed, await hasher.verify("mypassword", hashed), await hasher.verify("wrong", hashed)
+
+    try:
+        hashed, ok, bad = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+
+    assert hashed.startswith("$2")
+    assert ok
+    assert not bad
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["pending"] == 0
+    assert stats["latency_ms"]["max"] > 0
+
+
+def test_queue_limit_rejects_with_503():
+    hasher = PasswordHasher(workers=0, queue_limit=1)
+
+    async def run():
+        return await asyncio.gather(hasher.hash("one"), hasher.hash("two"), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 503
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,59 @@
+import asyncio
+
+from src.services.mail import MAIL_TEMPLATES, Mailer, MailTemplates, SMTPPool
+
+
+def make_mailer(server, **options):
+    return Mailer(SMTPPool(server.hostname, server.port, **options), sender="noreply@example.com")
+
+
+def test_sequential_messages_share_one_connection(smtp_server):
+    mailer = make_mailer(smtp_server, size=2)
+
+    async def run():
+        for i in range(5):
+            await mailer.send("verify_email", f"user{i}@example.com", link=f"http://x/{i}")
+        await mailer.close()
+
+    asyncio.run(run())
+
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.messages[0].rcpt_tos == ["user0@example.com"]
+    assert mailer.pool.stats()["connections_opened"] == 1
+
+
+def test_send_many_is_bounded_by_pool_size(smtp_server):
+    mailer = make_mailer(smtp_server, size=3)
+    messages = [mailer.render("reset_password", f"user{i}@example.com", link="http://x") for i in range(20)]
+
+    async def run():
+        errors = await mailer.send_many(messages)
+        await mailer.close()
+        return errors
+
+    assert asyncio.run(run()) == [None] * 20
+    assert len(smtp_server.messages) == 20
+    assert mailer.pool.stats()["connections_opened"] == 3
+
+
+def test_dropped_connection_is_replaced(smtp_server):
+    mailer = make_mailer(smtp_server, size=1, idle_check=0)
+
+    async def run():
+        await mailer.send("verify_email", "first@example.com", link="http://x")
+        await asyncio.to_thread(smtp_server.restart)
+        await mailer.send("verify_email", "second@example.com", link="http://x")
+        await mailer.close()
+
+    asyncio.run(run())
+
+    assert [m.rcpt_tos for m in smtp_server.messages] == [["first@example.com"], ["second@example.com"]]
+    assert mailer.pool.stats()["connections_opened"] == 2
+
+
+def test_templates_escape_html_only():
+    subject, text, html = MailTemplates(MAIL_TEMPLATES).render("verify_email", link="http://x/?a=1&b=2")
+
+    assert subject == "Email Verification"
+    assert "http://x/?a=1&b=2" in text
+    assert 'href="http://x/?a=1&amp;b=2"' in html
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+import redis
+from aiosmtplib import SMTPConnectError
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import JWTError
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from src.auths.auth import create_access_token, decode_token
+from src.auths.hashing import PasswordHasher, hash_password
+from src.database.cache import create_redis_client
+from src.services.mail import SMTPPool, mailer
+from src.services.metrics import MetricsMiddleware, instrument_pool
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_timed_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    def read_item(item_id: int):
+        assert sample("http_requests_in_progress", method="GET") == 1
+        return {}
+
+    labels = {"method": "GET", "route": "/metrics-test/{item_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    unmatched = sample("http_request_duration_seconds_count", method="OTHER", route="<unmatched>", status="404")
+    with TestClient(app) as client:
+        client.get("/metrics-test/1")
+        client.get("/metrics-test/2")
+        client.request("BREW", "/no-such-route")
+
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert sample("http_request_duration_seconds_count", method="OTHER", route="<unmatched>",
+                  status="404") == unmatched + 1
+    assert sample("http_requests_in_progress", method="GET") == 0
+
+
+def test_metrics_endpoint_serves_the_text_format(client):
+    client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "/metrics" not in client.get("/openapi.json").json()["paths"]
+
+
+def test_jwt_encode_and_decode_are_counted():
+    encoded = sample("jwt_duration_seconds_count", operation="encode")
+    decoded = sample("jwt_duration_seconds_count", operation="decode")
+    failures = sample("jwt_decode_failures_total")
+
+    decode_token(create_access_token({"sub": "metrics@example.com"}))
+    with pytest.raises(JWTError):
+        decode_token("not-a-token")
+
+    assert sample("jwt_duration_seconds_count", operation="encode") == encoded + 1
+    assert sample("jwt_duration_seconds_count", operation="decode") == decoded + 2
+    assert sample("jwt_decode_failures_total") == failures + 1
+
+
+def test_bcrypt_is_timed_in_process_and_in_the_pool():
+    hashed = sample("password_hash_duration_seconds_count", operation="hash")
+    verified = sample("password_hash_duration_seconds_count", operation="verify")
+    hasher = PasswordHasher(workers=1, queue_limit=4)
+
+    password_hash = hash_password("secret")
+    try:
+        assert asyncio.run(hasher.verify("secret", password_hash))
+    finally:
+        hasher.shutdown()
+
+    assert sample("password_hash_duration_seconds_count", operation="hash") == hashed + 1
+    assert sample("password_hash_duration_seconds_count", operation="verify") == verified + 1
+    assert sample("password_hash_duration_seconds_sum", operation="verify") > 0
+
+
+def test_pool_gauges_follow_checkouts():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=2)
+    instrument_pool(engine, "metrics-test")
+
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("SELECT 1"))
+        second.execute(text("SELECT 1"))
+        assert sample("db_pool_checked_out_connections", engine="metrics-test") == 2
+    assert sample("db_pool_checked_out_connections", engine="metrics-test") == 0
+    assert sample("db_pool_open_connections", engine="metrics-test") == 2
+
+    engine.dispose()
+    assert sample("db_pool_open_connections", engine="metrics-test") == 0
+
+
+def test_redis_commands_and_pipelines_are_timed():
+    client = create_redis_client("redis://localhost:1/0")
+    commands = sample("redis_command_duration_seconds_count", command="GET")
+    failures = sample("redis_command_failures_total", command="GET")
+    pipelines = sample("redis_command_failures_total", command="PIPELINE")
+
+    with pytest.raises(redis.RedisError):
+        client.get("key")
+    with pytest.raises(redis.RedisError):
+        client.pipeline().get("key").execute()
+
+    assert sample("redis_command_duration_seconds_count", command="GET") == commands + 1
+    assert sample("redis_command_failures_total", command="GET") == failures + 1
+    assert sample("redis_command_failures_total", command="PIPELINE") == pipelines + 1
+
+
+def test_mail_failures_are_counted_by_error(free_port):
+    pool = SMTPPool("127.0.0.1", free_port, timeout=1)
+    message = mailer.render("verify_email", "metrics@example.com", link="http://x")
+    sent = sample("mail_send_duration_seconds_count")
+    failures = sample("mail_send_failures_total", error="SMTPConnectError")
+
+    with pytest.raises(SMTPConnectError):
+        asyncio.run(pool.send(message))
+
+    assert sample("mail_send_duration_seconds_count") == sent + 1
+    assert sample("mail_send_failures_total", error="SMTPConnectError") == failures + 1
+
+
+def test_multiprocess_scrape_merges_every_worker(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = "from src.auths.auth import create_access_token; create_access_token({'sub': 'x'})"
+    scrape = "from src.services.metrics import render; print(render()[0].decode())"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+    output = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, capture_output=True,
+                            text=True).stdout
+
+    assert 'jwt_duration_seconds_count{operation="encode"} 2.0' in output
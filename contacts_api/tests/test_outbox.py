@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, OutboxMessage, User
+from src.repository.outbox import claim_outbox_batch, email_message, outbox_status, purge_outbox, queue_messages
+from src.repository.repository import create_user
+from src.services.dispatcher import OutboxDispatcher
+from src.services.mail import Mailer, SMTPPool
+
+
+@pytest.fixture()
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, expire_on_commit=False)
+    engine.dispose()
+
+
+def make_dispatcher(session_factory, port, **options):
+    mailer = Mailer(SMTPPool("127.0.0.1", port, timeout=1), sender="noreply@example.com")
+    return OutboxDispatcher(session_factory, mailer, **options)
+
+
+def test_outbox_row_is_committed_with_the_user(session_factory):
+    with session_factory() as db:
+        create_user(db, "a@example.com", "hashed", outbox=[email_message("verify_email", "a@example.com", link="l")])
+        with pytest.raises(IntegrityError):
+            create_user(db, "a@example.com", "hashed", outbox=[email_message("verify_email", "a@example.com", link="l")])
+        db.rollback()
+
+        assert db.query(User).count() == 1
+        assert [m.payload["recipient"] for m in db.query(OutboxMessage)] == ["a@example.com"]
+
+
+def test_dispatcher_delivers_and_records(session_factory, smtp_server):
+    dispatcher = make_dispatcher(session_factory, smtp_server.port)
+    with session_factory() as db:
+        queue_messages(db, [email_message("reset_password", f"u{i}@example.com", link="l") for i in range(3)])
+
+    async def run():
+        try:
+            return await dispatcher.run_once()
+        finally:
+            await dispatcher.mailer.close()
+
+    claimed = asyncio.run(run())
+
+    assert claimed == 3
+    assert sorted(m.rcpt_tos[0] for m in smtp_server.messages) == ["u0@example.com", "u1@example.com", "u2@example.com"]
+    with session_factory() as db:
+        assert {(m.status, m.attempts) for m in db.query(OutboxMessage)} == {("sent", 1)}
+        assert all(m.payload == {} for m in db.query(OutboxMessage))
+        assert outbox_status(db)["pending"] == 0
+
+
+def test_failed_delivery_backs_off_then_gives_up(session_factory, free_port):
+    dispatcher = make_dispatcher(session_factory, free_port, max_attempts=2, backoff_base=10)
+    with session_factory() as db:
+        queue_messages(db, [email_message("verify_email", "a@example.com", link="l")])
+    now = datetime.utcnow()
+
+    assert asyncio.run(dispatcher.run_once(now)) == 1
+    with session_factory() as db:
+        message = db.query(OutboxMessage).one()
+        assert (message.status, message.attempts) == ("pending", 1)
+        assert message.available_at == now + timedelta(seconds=10)
+        assert message.last_error
+
+    assert asyncio.run(dispatcher.run_once(now + timedelta(seconds=5))) == 0
+    assert asyncio.run(dispatcher.run_once(now + timedelta(seconds=10))) == 1
+    with session_factory() as db:
+        message = db.query(OutboxMessage).one()
+        assert (message.status, message.attempts) == ("failed", 2)
+
+
+def test_malformed_message_fails_without_retry(session_factory, free_port):
+    dispatcher = make_dispatcher(session_factory, free_port)
+    with session_factory() as db:
+        queue_messages(db, [email_message("no_such_template", "a@example.com")])
+
+    asyncio.run(dispatcher.run_once())
+
+    with session_factory() as db:
+        assert db.query(OutboxMessage).one().status == "failed"
+
+
+def test_claim_lease_expires(session_factory):
+    with session_factory() as db:
+        queue_messages(db, [email_message("verify_email", "a@example.com", link="l")])
+        now = datetime.utcnow()
+        assert len(claim_outbox_batch(db, 10, lease=60, now=now)) == 1
+        assert claim_outbox_batch(db, 10, lease=60, now=now + timedelta(seconds=30)) == []
+        assert [row.attempts for row in claim_outbox_batch(db, 10, lease=60, now=now + timedelta(seconds=60))] == [2]
+
+
+def test_outbox_status_counts_pending_messages(session_factory):
+    now = datetime.utcnow()
+    with session_factory() as db:
+        queue_messages(db, [
+            OutboxMessage(kind="email", payload={}, created_at=now - timedelta(seconds=30), available_at=now),
+            OutboxMessage(kind="email", payload={}, available_at=now + timedelta(seconds=60)),
+            OutboxMessage(kind="email", payload={}, status="sent", sent_at=now),
+        ])
+
+        assert outbox_status(db, now) == {"pending": 2, "due": 1, "oldest_due_age_s": 30.0}
+
+
+def test_purge_deletes_expired_finished_messages(session_factory):
+    now = datetime.utcnow()
+    old, recent = now - timedelta(days=8), now - timedelta(days=1)
+    with session_factory() as db:
+        queue_messages(db, [
+            OutboxMessage(kind="email", payload={}, status="sent", sent_at=old),
+            OutboxMessage(kind="email", payload={}, status="sent", sent_at=recent),
+            OutboxMessage(kind="email", payload={}, status="failed", available_at=old),
+            OutboxMessage(kind="email", payload={}, status="failed", available_at=recent),
+            OutboxMessage(kind="email", payload={}, available_at=old),
+        ])
+
+        assert purge_outbox(db, now - timedelta(days=7), limit=1) == 2
+        assert sorted((m.status, m.available_at == old) for m in db.query(OutboxMessage)) == [
+            ("failed", False), ("pending", True), ("sent", False)]
+
+
+def test_dispatcher_purges_while_running(session_factory):
+    dispatcher = OutboxDispatcher(session_factory, None, retention=60)
+    with session_factory() as db:
+        queue_messages(db, [OutboxMessage(kind="email", payload={}, status="sent",
+                                          sent_at=datetime.utcnow() - timedelta(seconds=120))])
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(dispatcher.run(0.01, stop))
+        await asyncio.sleep(0.05)
+        stop.set()
+        await task
+
+    asyncio.run(run())
+
+    with session_factory() as db:
+        assert db.query(OutboxMessage).count() == 0
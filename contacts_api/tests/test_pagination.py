@@ -0,0 +1,29 @@
+import pytest
+from fastapi import HTTPException
+
+from src.repository.repository import decode_cursor, encode_cursor, get_contacts_page
+
+
+def test_keyset_pages_walk_every_contact_once(session, owner, other, make_contact):
+    for i in range(5):
+        make_contact(owner, email=f"c{i}@example.com")
+        make_contact(other, email=f"o{i}@example.com")
+
+    seen, cursor, pages = [], "", 0
+    while True:
+        contacts, cursor = get_contacts_page(session, owner, after=cursor, limit=2)
+        seen.extend(c.email for c in contacts)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert seen == [f"c{i}@example.com" for i in range(5)]
+    assert pages == 3
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor("") is None
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
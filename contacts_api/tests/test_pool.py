@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.database.pool import InstrumentedQueuePool, pool_status
+
+
+def test_pool_status_reports_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        busy = pool_status(engine.pool)
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    status = pool_status(engine.pool)
+    assert busy["checked_out"] == 1
+    assert status["checked_out"] == 0
+    assert status["checkouts"] == 1
+    assert status["checkout_timeouts"] == 1
+    assert sum(status["wait_ms"]["buckets"].values()) == 1
+    engine.dispose()
@@ -0,0 +1,47 @@
+import time
+from unittest.mock import MagicMock
+
+from sqlalchemy.orm import Session
+
+from src.auths.auth import create_access_token, get_current_user
+from src.auths.principal_cache import Principal, PrincipalCache, principal_cache
+from src.database.models import User
+
+
+def test_entries_expire_at_token_exp():
+    cache = PrincipalCache(maxsize=10, max_ttl=300)
+    cache.put("a.b.expired", Principal(1, "a@example.com", True), time.time() - 1)
+    cache.put("a.b.valid", Principal(1, "a@example.com", True), time.time() + 60)
+
+    assert cache.get("a.b.expired") is None
+    assert cache.get("a.b.valid").email == "a@example.com"
+
+
+def test_lru_eviction_and_user_invalidation():
+    cache = PrincipalCache(maxsize=2, max_ttl=300)
+    exp = time.time() + 60
+    cache.put("x.y.one", Principal(1, "one@example.com", True), exp)
+    cache.put("x.y.two", Principal(2, "two@example.com", True), exp)
+    cache.get("x.y.one")
+    cache.put("x.y.three", Principal(1, "one@example.com", True), exp)
+
+    assert cache.get("x.y.two") is None
+    assert len(cache) == 2
+
+    cache.invalidate_user(1)
+    assert len(cache) == 0
+
+
+def test_get_current_user_skips_database_on_cache_hit():
+    principal_cache.clear()
+    db = MagicMock(spec=Session)
+    db.query().filter().first.return_value = User(id=7, email="user@example.com", password="x", is_verified=True)
+    db.query.reset_mock()
+    token = create_access_token(data={"sub": "user@example.com"})
+
+    first = get_current_user(token, db)
+    second = get_current_user(token, db)
+
+    assert first == second == Principal(7, "user@example.com", True)
+    db.query.assert_called_once()
+    principal_cache.clear()
@@ -0,0 +1,84 @@
+import json
+import re
+import time
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from pyinstrument import Profiler
+from sqlalchemy import create_engine, text
+from starlette.concurrency import run_in_threadpool
+
+from src.auths.auth import create_access_token, decode_token
+from src.auths.hashing import hash_password
+from src.services.profiling import ProfilingMiddleware, serialization_time
+
+memory_engine = create_engine("sqlite://")
+
+
+def make_app(tmp_path, token="s3cret", sample_rate=0, keep=10):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, token=token, sample_rate=sample_rate, directory=str(tmp_path),
+                       keep=keep)
+
+    @app.get("/work/{n}")
+    async def work(n: int):
+        await run_in_threadpool(decode_token, create_access_token({"sub": "profile@example.com"}))
+        await run_in_threadpool(hash_password, "secret")
+        with memory_engine.connect() as conn:
+            conn.execute(text("WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r WHERE i < 100000) "
+                              "SELECT sum(i) FROM r"))
+        return {"n": n}
+
+    @app.get("/ping")
+    def ping():
+        return {}
+
+    return app
+
+
+def profiles(tmp_path):
+    return sorted(path.name for path in tmp_path.glob("*.speedscope.json"))
+
+
+def test_header_with_token_profiles_the_request(tmp_path):
+    with TestClient(make_app(tmp_path)) as client:
+        response = client.get("/work/1", headers={"X-Profile": "s3cret"})
+
+    profile_id = response.headers["x-profile-id"]
+    assert profiles(tmp_path) == [f"{profile_id}.speedscope.json"]
+    profile = json.loads((tmp_path / f"{profile_id}.speedscope.json").read_text())
+    assert profile["name"].startswith("GET /work/{n} 200 in ")
+    breakdown = {category: float(ms) for category, ms in re.findall(r"(\w+) ([\d.]+) ms", profile["name"])}
+    assert breakdown["db"] > 0 and breakdown["bcrypt"] > 0 and breakdown["jwt"] > 0
+    assert profile["profiles"][0]["type"] == "evented"
+
+
+def test_requests_without_the_token_are_not_profiled(tmp_path):
+    with TestClient(make_app(tmp_path)) as client:
+        plain = client.get("/ping")
+        forged = client.get("/ping", headers={"X-Profile": "guess"})
+
+    assert "x-profile-id" not in plain.headers and "x-profile-id" not in forged.headers
+    assert profiles(tmp_path) == []
+
+
+def test_one_request_in_n_is_sampled_and_old_profiles_are_pruned(tmp_path):
+    with TestClient(make_app(tmp_path, token="", sample_rate=3, keep=2)) as client:
+        sampled = []
+        for _ in range(9):
+            sampled.append("x-profile-id" in client.get("/ping").headers)
+            time.sleep(0.01)
+
+    assert sampled == [False, False, True] * 3
+    assert len(profiles(tmp_path)) == 2
+
+
+def test_serialization_time_is_read_from_the_samples():
+    rows = [{"id": i, "name": f"Contact {i}", "tags": ["a", "b"]} for i in range(20000)]
+    profiler = Profiler(interval=0.0005)
+    profiler.start()
+    jsonable_encoder(rows)
+    session = profiler.stop()
+
+    assert serialization_time(session.root_frame()) > 0.5 * session.duration
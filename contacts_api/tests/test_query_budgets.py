@@ -0,0 +1,147 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.auths.auth import create_access_token, create_verification_token
+from src.auths.principal_cache import principal_cache
+from src.conf.config import settings
+from src.database.instrumentation import QueryStatsMiddleware, assert_max_queries
+from src.database.models import Base, Contact, User
+from src.routes.router import router
+from src.services.avatars import LocalAvatarStorage, avatar_pipeline
+from tests.conftest import TestingSessionLocal, engine
+from tests.test_avatars import png_bytes
+
+OWNER = "budget-owner@example.com"
+
+
+def contact(n):
+    return {"first_name": "Budget", "last_name": f"Contact{n}", "email": f"budget{n}@example.com",
+            "phone_number": "+380000000000"}
+
+
+def new_contact_id(owner):
+    with TestingSessionLocal() as db:
+        row = Contact(user_id=owner["id"], **contact(f"temp{db.query(Contact).count()}"))
+        db.add(row)
+        db.commit()
+        return row.id
+
+
+def new_unverified_email():
+    with TestingSessionLocal() as db:
+        email = f"budget-unverified{db.query(User).count()}@example.com"
+        db.add(User(email=email, password="x"))
+        db.commit()
+    return email
+
+
+# Statement budgets of the router.py routes, measured with an unreachable Redis and a cold principal cache.
+ROUTES = {
+    ("PUT", "/users/me/avatar"): (2, lambda owner: {
+        "url": "/users/me/avatar", "headers": owner["headers"],
+        "files": {"file": ("a.png", png_bytes(), "image/png")}}),
+    ("GET", "/verify-email/"): (2, lambda owner: {
+        "url": "/verify-email/", "params": {"token": create_verification_token(new_unverified_email())}}),
+    ("POST", "/signup/"): (4, lambda owner: {
+        "url": "/signup/", "json": {"username": "budget", "email": "budget-signup@example.com",
+                                    "password": "secret1"}}),
+    ("POST", "/reset-password/"): (2, lambda owner: {"url": "/reset-password/", "params": {"email": OWNER}}),
+    ("POST", "/contacts/"): (4, lambda owner: {
+        "url": "/contacts/", "json": contact("new"), "headers": owner["headers"]}),
+    ("GET", "/contacts/"): (3, lambda owner: {"url": "/contacts/", "headers": owner["headers"]}),
+    ("GET", "/contacts/search/"): (2, lambda owner: {
+        "url": "/contacts/search/", "params": {"name": "Budget"}, "headers": owner["headers"]}),
+    ("GET", "/contacts/birthday/"): (2, lambda owner: {
+        "url": "/contacts/birthday/", "params": {"days": 30}, "headers": owner["headers"]}),
+    ("GET", "/contacts/export"): (2, lambda owner: {"url": "/contacts/export", "headers": owner["headers"]}),
+    ("POST", "/contacts/import"): (3, lambda owner: {
+        "url": "/contacts/import", "content": b"first_name,last_name,email,phone_number\nA,B,imported@example.com,1\n",
+        "headers": {**owner["headers"], "Content-Type": "text/csv"}}),
+    ("POST", "/contacts/bulk"): (4, lambda owner: {
+        "url": "/contacts/bulk", "headers": owner["headers"],
+        "json": {"update": [{"id": i, "changes": {"additional_info": "bulk"}} for i in owner["contact_ids"]]}}),
+    ("GET", "/contacts/{contact_id}"): (3, lambda owner: {
+        "url": f"/contacts/{owner['contact_ids'][0]}", "headers": owner["headers"]}),
+    ("PUT", "/contacts/{contact_id}"): (4, lambda owner: {
+        "url": f"/contacts/{new_contact_id(owner)}", "json": contact("put"), "headers": owner["headers"]}),
+    ("PATCH", "/contacts/{contact_id}"): (4, lambda owner: {
+        "url": f"/contacts/{owner['contact_ids'][1]}", "json": {"additional_info": "patched"},
+        "headers": owner["headers"]}),
+    ("DELETE", "/contacts/{contact_id}"): (4, lambda owner: {
+        "url": f"/contacts/{new_contact_id(owner)}", "headers": owner["headers"]}),
+}
+
+
+@pytest.fixture(scope="module")
+def owner(client):
+    Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as db:
+        user = User(email=OWNER, password="x", is_verified=True)
+        db.add(user)
+        db.flush()
+        contacts = [Contact(user_id=user.id, **contact(n)) for n in range(20)]
+        db.add_all(contacts)
+        db.commit()
+        owner = {"id": user.id, "contact_ids": [c.id for c in contacts],
+                 "headers": {"Authorization": f"Bearer {create_access_token(data={'sub': OWNER})}"}}
+    yield owner
+    with TestingSessionLocal() as db:
+        db.query(Contact).filter(Contact.user_id == owner["id"]).delete()
+        db.query(User).filter(User.email.like("budget%@example.com")).delete(synchronize_session=False)
+        db.commit()
+
+
+def test_every_router_route_has_a_budget():
+    assert set(ROUTES) == {(method, route.path) for route in router.routes for method in route.methods}
+
+
+@pytest.mark.parametrize("method, path", sorted(ROUTES))
+def test_route_stays_within_query_budget(client, owner, method, path, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    monkeypatch.setattr(avatar_pipeline, "storage", LocalAvatarStorage(str(tmp_path), "/media/avatars",
+                                                                       avatar_pipeline.sizes))
+    monkeypatch.setattr(avatar_pipeline, "workers", 0)
+    budget, build = ROUTES[(method, path)]
+    request = build(owner)
+    principal_cache.invalidate_user(owner["id"])
+
+    with assert_max_queries(budget):
+        response = client.request(method, **request)
+
+    assert response.status_code < 400, response.text
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+
+def test_assert_max_queries_lists_the_statements_over_budget():
+    memory_engine = create_engine("sqlite://")
+    with pytest.raises(AssertionError, match="2 statements executed, the budget is 1") as failure:
+        with assert_max_queries(1), memory_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    assert "SELECT 2" in str(failure.value)
+
+
+def test_middleware_reports_statements_in_header_and_log(caplog):
+    memory_engine = create_engine("sqlite://")
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, warn_statements=2)
+
+    @app.get("/queries/{count}")
+    def run_queries(count: int):
+        with memory_engine.connect() as conn:
+            for _ in range(count):
+                conn.execute(text("SELECT 1"))
+        return {}
+
+    with caplog.at_level(logging.DEBUG, logger="src.database.instrumentation"), TestClient(app) as client:
+        few = client.get("/queries/2")
+        many = client.get("/queries/3")
+
+    assert few.headers["server-timing"].endswith('desc="2 queries, 0 rows"')
+    assert many.headers["server-timing"].endswith('desc="3 queries, 0 rows"')
+    assert [record.levelno for record in caplog.records] == [logging.DEBUG, logging.WARNING]
+    assert "GET /queries/3 200: 3 queries" in caplog.records[1].getMessage()
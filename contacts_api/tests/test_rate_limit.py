@@ -0,0 +1,98 @@
+import asyncio
+
+from fakeredis import FakeAsyncRedis, FakeServer
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from src.database.cache import create_async_redis_client
+from src.services.rate_limit import RateLimit, RateLimiter, RateLimitPolicy
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def attempts(limiter, policy, count, key="client"):
+    async def run():
+        return [await limiter.acquire(policy, key) for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_limit_is_shared_by_workers():
+    server, clock = FakeServer(), Clock()
+    workers = [RateLimiter(FakeAsyncRedis(server=server), lease_fraction=0.2, clock=clock) for _ in range(2)]
+    policy = RateLimitPolicy("login", limit=10, window=60)
+
+    results = attempts(workers[0], policy, 4) + attempts(workers[1], policy, 6) + attempts(workers[0], policy, 3)
+
+    assert results[:10] == [None] * 10
+    assert all(retry_after > 0 for retry_after in results[10:])
+
+
+def test_most_decisions_are_local():
+    limiter = RateLimiter(FakeAsyncRedis(), lease_fraction=0.1, clock=Clock())
+    policy = RateLimitPolicy("contacts", limit=1000, window=60)
+
+    assert attempts(limiter, policy, 100) == [None] * 100
+
+    stats = limiter.stats()
+    assert (stats["redis_calls"], stats["local_decisions"]) == (1, 99)
+
+
+def test_window_slides():
+    clock = Clock(1000.0)
+    limiter = RateLimiter(FakeAsyncRedis(), lease_fraction=0, clock=clock)
+    policy = RateLimitPolicy("login", limit=4, window=10)
+
+    assert attempts(limiter, policy, 5)[4] == 10.0
+    clock.now = 1010.0
+    assert attempts(limiter, policy, 1) == [2.5]
+    clock.now = 1015.0
+    assert attempts(limiter, policy, 3) == [None, None, 2.5]
+    assert attempts(limiter, policy, 1, key="other") == [None]
+
+
+def test_falls_back_to_memory_when_redis_is_down():
+    limiter = RateLimiter(create_async_redis_client("redis://localhost:1/0"), lease_fraction=0, clock=Clock())
+    policy = RateLimitPolicy("login", limit=2, window=60)
+
+    results = attempts(limiter, policy, 3)
+
+    assert results[:2] == [None, None] and results[2] > 0
+    assert limiter.stats()["redis_errors"] == 1
+    assert limiter.stats()["fallback_active"]
+
+
+def test_memory_fallback_forgets_clients_whose_windows_ended():
+    clock = Clock()
+    limiter = RateLimiter(create_async_redis_client("redis://localhost:1/0"), lease_fraction=0, max_keys=50,
+                          clock=clock)
+    policy = RateLimitPolicy("login", limit=2, window=60)
+
+    for client in range(100):
+        attempts(limiter, policy, 1, key=f"client-{client}")
+    assert len(limiter._memory_counts) == 50
+
+    clock.now += 120
+    attempts(limiter, policy, 1, key="late")
+    assert list(limiter._memory_counts) == ["login:late"]
+
+
+def test_dependency_rejects_with_429():
+    limiter = RateLimiter(FakeAsyncRedis(), lease_fraction=0, clock=Clock(960.0))
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(RateLimit(RateLimitPolicy("login", limit=2, window=60), limiter))])
+    def login():
+        return {}
+
+    client = TestClient(app)
+    codes = [client.post("/login").status_code for _ in range(3)]
+    rejected = client.post("/login")
+
+    assert codes == [200, 200, 429]
+    assert rejected.headers["Retry-After"] == "60"
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import MagicMock, patch
 from datetime import datetime
 
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from src.repository.repository import create_contact, get_contacts, get_contact, update_contact, delete_contact
 from src.schemas import ContactCreate
@@ -22,14 +23,31 @@ class TestRepository(unittest.TestCase):
             phone_number="1234567890"
         )
 
+        self.db.scalars.return_value.first.return_value = Contact(email="johndoe@example.com", user_id=1)
+
         # Тестування створення нового контакту
-        contact = create_contact(contact_data, self.db)
+        contact = create_contact(contact_data, self.db, self.current_user)
 
-        self.db.add.assert_called_once()
+        self.db.scalars.assert_called_once()
         self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once_with(contact)
+        self.db.refresh.assert_not_called()
         self.assertEqual(contact.email, "johndoe@example.com")
 
+    def test_create_contact_conflict(self):
+        contact_data = ContactCreate(
+            first_name="John",
+            last_name="Doe",
+            email="johndoe@example.com",
+            phone_number="1234567890"
+        )
+        self.db.scalars.return_value.first.return_value = None
+
+        with self.assertRaises(HTTPException) as context:
+            create_contact(contact_data, self.db, self.current_user)
+
+        self.assertEqual(context.exception.status_code, 400)
+        self.db.commit.assert_not_called()
+
     def test_get_contacts(self):
         # Мокаємо результат запиту
         self.db.query().filter().offset().limit().all.return_value = [Contact(email="contact1@example.com"),
@@ -51,14 +69,14 @@ class TestRepository(unittest.TestCase):
         self.assertEqual(contact.email, "contact@example.com")
 
     def test_update_contact(self):
-        contact = Contact(email="old@example.com")
-        self.db.query().filter().first.return_value = contact
+        self.db.scalars.return_value.first.return_value = Contact(email="new@example.com")
 
         updated_data = {"email": "new@example.com"}
         updated_contact = update_contact(self.db, 1, updated_data, self.current_user)
 
+        self.db.scalars.assert_called_once()
         self.db.commit.assert_called_once()
-        self.db.refresh.assert_called_once_with(contact)
+        self.db.refresh.assert_not_called()
         self.assertEqual(updated_contact.email, "new@example.com")
 
     def test_delete_contact(self):
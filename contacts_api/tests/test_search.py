@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.database.models import Contact
+from src.repository.repository import search_contacts
+from src.repository.search import contact_search_statement
+
+
+@pytest.fixture()
+def contacts(owner, other, make_contact):
+    make_contact(owner, first_name="John", last_name="Doe", email="john@work.com")
+    make_contact(owner, first_name="Johanna", last_name="Smith", email="jo@home.org")
+    make_contact(owner, first_name="Ann", last_name="Johnson", email="ann@work.com")
+    make_contact(other, first_name="John", last_name="Other", email="john@other.com")
+
+
+@pytest.mark.usefixtures("contacts")
+def test_search_is_scoped_to_user_and_case_insensitive(session, owner):
+    contacts = search_contacts(session, owner, name="JOHN")
+
+    assert sorted(c.email for c in contacts) == ["ann@work.com", "john@work.com"]
+
+
+@pytest.mark.usefixtures("contacts")
+def test_search_combines_name_and_email_and_respects_limit(session, owner):
+    assert {c.email for c in search_contacts(session, owner, name="joh", email="work")} == \
+        {"john@work.com", "ann@work.com"}
+    assert len(search_contacts(session, owner, name="jo", limit=1)) == 1
+
+
+@pytest.mark.usefixtures("contacts")
+def test_fts_index_follows_updates_and_deletes(session, owner):
+    contact = session.query(Contact).filter(Contact.email == "jo@home.org").one()
+    contact.first_name = "Maria"
+    session.commit()
+
+    assert [c.email for c in search_contacts(session, owner, name="maria")] == ["jo@home.org"]
+
+    session.delete(contact)
+    session.commit()
+    assert search_contacts(session, owner, name="maria") == []
+
+
+def test_postgresql_search_ranks_by_trigram_similarity():
+    sql = str(contact_search_statement("postgresql", 1, name="john", limit=10)
+              .compile(dialect=postgresql.dialect()))
+
+    assert "ILIKE" in sql
+    assert "similarity(contacts.first_name" in sql
+    assert "contacts.user_id =" in sql
@@ -0,0 +1,40 @@
+import json
+from datetime import date
+from typing import List
+
+from pydantic import TypeAdapter
+
+import pytest
+
+from src.database.models import Contact
+from src.repository.repository import get_contacts, get_contacts_page
+from src.repository.projection import contact_records
+from src.routes.responses import FastJSONResponse
+from src.schemas import ContactResponse
+
+
+@pytest.fixture()
+def contacts(owner, make_contact):
+    make_contact(owner, first_name="John", last_name="Doe", email="john@example.com", phone_number="1",
+                 birthday=date(1990, 4, 1))
+    make_contact(owner, first_name="Ann", last_name="Lee", email="ann@example.com")
+
+
+@pytest.mark.usefixtures("contacts")
+def test_fast_path_matches_response_model_output(session, owner):
+    adapter = TypeAdapter(List[ContactResponse])
+    entities = session.query(Contact).order_by(Contact.id).all()
+    expected = adapter.dump_python(adapter.validate_python(entities, from_attributes=True), mode="json")
+
+    body = FastJSONResponse(contact_records(get_contacts(session, owner))).body
+
+    assert sorted(json.loads(body), key=lambda c: c["email"]) == sorted(expected, key=lambda c: c["email"])
+    assert b'"birthday":"1990-04-01"' in body
+
+
+@pytest.mark.usefixtures("contacts")
+def test_reads_do_not_touch_the_session(session, owner):
+    rows, _ = get_contacts_page(session, owner, limit=1)
+
+    assert not session.dirty
+    assert list(contact_records(rows)[0]) == list(ContactResponse.model_fields)
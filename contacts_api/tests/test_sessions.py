@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fakeredis import FakeRedis
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.auths.auth import decode_refresh_token
+from src.auths.sessions import DatabaseSessionStore, RedisSessionStore, SessionManager
+from src.database.cache import create_redis_client
+from src.database.models import RefreshSession
+
+
+def make_manager(backend, client=None):
+    return SessionManager(RedisSessionStore(client or FakeRedis()), DatabaseSessionStore(), backend, ttl=3600)
+
+
+@pytest.mark.parametrize("backend", ["redis", "database"])
+def test_rotation_and_reuse_revokes_family(session, owner, backend):
+    manager = make_manager(backend)
+    first = manager.open(session, owner.id, owner.email, "phone")
+    other_device = manager.open(session, owner.id, owner.email, "laptop")
+
+    email, second = manager.rotate(session, first)
+    assert email == owner.email
+    assert decode_refresh_token(second)["fam"] == decode_refresh_token(first)["fam"]
+    _, third = manager.rotate(session, second)
+
+    with pytest.raises(HTTPException) as reused:
+        manager.rotate(session, first)
+    assert "reuse" in reused.value.detail
+    with pytest.raises(HTTPException):
+        manager.rotate(session, third)
+
+    assert [s.device for s in manager.list(session, owner.id)] == ["laptop"]
+    manager.rotate(session, other_device)
+
+
+@pytest.mark.parametrize("backend", ["redis", "database"])
+def test_revoke_logs_one_device_out(session, owner, backend):
+    manager = make_manager(backend)
+    token = manager.open(session, owner.id, owner.email, "phone")
+    family = decode_refresh_token(token)["fam"]
+
+    assert not manager.revoke(session, owner.id + 1, family)
+    assert manager.revoke(session, owner.id, family)
+    assert not manager.revoke(session, owner.id, family)
+    with pytest.raises(HTTPException):
+        manager.rotate(session, token)
+
+
+def test_refresh_never_writes(session, owner):
+    manager = make_manager("redis")
+    token = manager.open(session, owner.id, owner.email, None)
+    statements = []
+
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    manager.rotate(session, token)
+
+    assert statements and all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert session.query(RefreshSession).count() == 0
+
+
+@pytest.mark.parametrize("backend", ["redis", "database"])
+def test_refresh_requires_the_user(session, owner, backend):
+    manager = make_manager(backend)
+    token = manager.open(session, owner.id, owner.email, None)
+    session.delete(owner)
+    session.commit()
+
+    with pytest.raises(HTTPException) as invalid:
+        manager.rotate(session, token)
+    assert invalid.value.status_code == 401
+
+
+def test_login_deletes_lapsed_database_families(session, owner):
+    manager = make_manager("database")
+    revoked = decode_refresh_token(manager.open(session, owner.id, owner.email, "phone"))["fam"]
+    expired = decode_refresh_token(manager.open(session, owner.id, owner.email, "tablet"))["fam"]
+    kept = decode_refresh_token(manager.open(session, owner.id, owner.email, "laptop"))["fam"]
+    manager.revoke(session, owner.id, revoked)
+    session.get(RefreshSession, expired).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.commit()
+
+    latest = decode_refresh_token(manager.open(session, owner.id, owner.email, "desktop"))["fam"]
+
+    assert sorted(row.family for row in session.query(RefreshSession)) == sorted([kept, latest])
+
+
+def test_login_falls_back_to_database_without_redis(session, owner):
+    manager = make_manager("redis", create_redis_client("redis://localhost:1/0"))
+
+    token = manager.open(session, owner.id, owner.email, "phone")
+    assert decode_refresh_token(token)["sst"] == "database"
+    _, token = manager.rotate(session, token)
+
+    assert session.query(RefreshSession).one().jti == decode_refresh_token(token)["jti"]
+    assert [s.device for s in manager.list(session, owner.id)] == ["phone"]
+
+
+def test_redis_family_is_unavailable_without_redis(session, owner):
+    token = make_manager("redis").open(session, owner.id, owner.email, None)
+
+    with pytest.raises(HTTPException) as unavailable:
+        make_manager("redis", create_redis_client("redis://localhost:1/0")).rotate(session, token)
+    assert unavailable.value.status_code == 503
@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.repository.repository import get_contacts_version, update_contact
+
+
+@pytest.fixture()
+def contact_id(owner, make_contact):
+    contact = make_contact(owner, first_name="John", last_name="Doe", email="john@example.com", phone_number="1")
+    make_contact(owner, first_name="Ann", last_name="Lee", email="ann@example.com")
+    return contact.id
+
+
+def test_partial_update_is_one_owner_scoped_statement(session, owner, other, contact_id):
+    session.refresh(owner)
+    statements = []
+    engine = session.get_bind()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        updated = update_contact(session, contact_id, {"birthday": "1990-04-01"}, owner)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert statements == ["UPDATE", "UPDATE"]
+    assert (updated.first_name, updated.birthday, updated.birth_md, updated.version) == \
+        ("John", date(1990, 4, 1), 401, 2)
+    assert update_contact(session, contact_id, {"first_name": "X"}, other) is None
+
+
+def test_unchanged_values_skip_the_write(session, owner, contact_id):
+    contact = update_contact(session, contact_id, {"first_name": "John", "phone_number": "1"}, owner)
+
+    assert contact.version == 1
+    assert get_contacts_version(session, owner.id) == 0
+
+
+def test_email_clash_maps_to_400(session, owner, contact_id):
+    with pytest.raises(HTTPException) as error:
+        update_contact(session, contact_id, {"email": "ann@example.com"}, owner)
+    assert error.value.status_code == 400
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from redis.exceptions import ConnectionError
+
+from src.auths.auth import create_access_token
+from src.conf.config import settings
+from src.database.cache import create_async_redis_client
+from src.database.models import Base, Contact, User
+from src.repository import async_repository, repository, versions
+from src.repository.versions import ContactsVersionCache, run_contacts_write
+from src.routes.conditional import contact_etag, match_contact_etag, parse_if_none_match
+from src.schemas import ContactCreate
+from tests.conftest import TestingSessionLocal, engine
+
+
+def record_offers(monkeypatch):
+    published = []
+
+    async def offer(user_id, version):
+        published.append((user_id, version))
+
+    monkeypatch.setattr(versions.contacts_version_cache, "publish", offer)
+    return published
+
+
+def write(sync_fn, async_fn, session, **kwargs):
+    return asyncio.run(run_contacts_write(sync_fn, async_fn, session, **kwargs))
+
+
+def test_writes_bump_collection_and_row_versions(session, monkeypatch, owner):
+    published = record_offers(monkeypatch)
+
+    contact = write(repository.create_contact, async_repository.create_contact, session,
+                    contact_data=ContactCreate(first_name="John", last_name="Doe", email="john@example.com",
+                                               phone_number="1"), current_user=owner)
+    assert contact.user_id == owner.id
+    assert repository.get_contacts_version(session, owner.id) == 1
+    assert published == [(owner.id, 1)]
+
+    updated = write(repository.update_contact, async_repository.update_contact, session, contact_id=contact.id,
+                    contact_data={"phone_number": "2"}, current_user=owner)
+    assert updated.version == 2
+    write(repository.delete_contact, async_repository.delete_contact, session, contact_id=contact.id,
+          current_user=owner)
+
+    assert repository.get_contacts_version(session, owner.id) == 3
+    assert published == [(owner.id, 1), (owner.id, 2), (owner.id, 3)]
+
+
+def test_versions_are_published_only_after_commit(session, monkeypatch, owner):
+    published = record_offers(monkeypatch)
+
+    repository.bump_contacts_version(session, owner.id)
+    asyncio.run(versions.publish_contacts_versions(session))
+    assert published == []
+
+    session.rollback()
+    session.commit()
+    asyncio.run(versions.publish_contacts_versions(session))
+    assert published == []
+
+    repository.bump_contacts_version(session, owner.id)
+    session.commit()
+    asyncio.run(versions.publish_contacts_versions(session))
+    assert published == [(owner.id, 1)]
+
+
+def test_import_batch_bumps_version_once(session, monkeypatch, owner):
+    record_offers(monkeypatch)
+    rows = [{"first_name": "A", "last_name": "B", "email": f"{i}@example.com", "user_id": owner.id} for i in range(3)]
+
+    repository.insert_contacts_batch(session, rows)
+
+    assert repository.get_contacts_version(session, owner.id) == 1
+    assert {c.version for c in session.query(Contact)} == {1}
+
+
+def test_cache_treats_unreachable_redis_as_miss():
+    cache = ContactsVersionCache(create_async_redis_client("redis://localhost:1/0"), ttl=60)
+
+    assert asyncio.run(cache.get(1)) is None
+    asyncio.run(cache.offer(1, 5))
+
+
+def test_failed_publish_deletes_the_cached_version():
+    cache = ContactsVersionCache(FakeAsyncRedis(), ttl=60)
+
+    async def run():
+        await cache.offer(1, 5)
+        cache._offer = fail
+        await cache.publish(1, 6)
+        return await cache.client.get(cache.key(1))
+
+    async def fail(**kwargs):
+        raise ConnectionError("down")
+
+    assert asyncio.run(run()) is None
+
+
+@pytest.fixture()
+def version_owner(client):
+    Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as db:
+        user = User(email="version-owner@example.com", password="x", is_verified=True)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    yield {"Authorization": f"Bearer {create_access_token(data={'sub': 'version-owner@example.com'})}"}
+    with TestingSessionLocal() as db:
+        db.query(Contact).filter(Contact.user_id == user_id).delete()
+        db.query(User).filter(User.id == user_id).delete()
+        db.commit()
+
+
+def test_unpublished_write_is_not_answered_with_304(client, version_owner, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    cache = ContactsVersionCache(FakeAsyncRedis(), ttl=60)
+    monkeypatch.setattr(versions, "contacts_version_cache", cache)
+    tag = client.get("/contacts/", headers=version_owner).headers["ETag"]
+    assert client.get("/contacts/", headers={**version_owner, "If-None-Match": tag}).status_code == 304
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(cache, "_offer", fail)
+    monkeypatch.setattr(cache.client, "delete", fail)
+    created = client.post("/contacts/", headers=version_owner, json={
+        "first_name": "Stale", "last_name": "Tag", "email": "stale@example.com", "phone_number": "1"})
+    assert created.status_code == 201
+
+    assert client.get("/contacts/", headers={**version_owner, "If-None-Match": tag}).status_code == 200
+
+
+def test_contact_etag_matching():
+    tags = parse_if_none_match(f'W/"{contact_etag(7, 2, 9)}", "other"')
+
+    assert match_contact_etag(tags, 7, collection_version=9) == "contact.7.2.9"
+    assert match_contact_etag(tags, 7, contact_version=2) == "contact.7.2.9"
+    assert match_contact_etag(tags, 7, collection_version=10) is None
+    assert match_contact_etag(tags, 8, contact_version=2) is None